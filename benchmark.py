@@ -0,0 +1,258 @@
+'''
+Benchmarks the Python analysis of a run (get_tables.py, table_diff.py, test_failures.py and inspect_result.py) on a
+synthetic Spark-Spark (ss) run, so no Spark or Hive is needed. The logs mimic the spark-sql and spark-shell output of
+the generated w_*/r_* scripts: prompts, "Time taken" lines, .show tables, exceptions with stack traces and some
+unrelated log4j noise.
+
+python3 benchmark.py --rows 10000 --formats parquet orc avro --exception_rate 0.1 --mismatch_rate 0.02 --noise 2
+python3 benchmark.py --rows 100000 --log_dir logs/bench/ --repeat 3   (keeps the generated run in logs/bench/)
+'''
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+write_interfaces = ["sql", "df"]
+read_interfaces = ["sql", "df"]
+noise_lines = [
+    "22/04/16 15:36:49 WARN ObjectStore: Failed to get database global_temp, returning NoSuchObjectException\n",
+    "22/04/16 15:36:50 WARN HiveConf: HiveConf of name hive.stats.jdbc.timeout does not exist\n",
+    "22/04/16 15:36:51 WARN SessionState: METASTORE_FILTER_HOOK will be ignored, since "
+    "hive.security.authorization.manager is set to instance of HiveAuthorizerFactory.\n",
+    "22/04/16 15:36:52 INFO SparkContext: Running Spark version 3.2.1\n",
+]
+stack_trace_lines = [
+    "\tat org.apache.spark.sql.catalyst.analysis.package$AnalysisErrorAt.failAnalysis(package.scala:42)\n",
+    "\tat org.apache.spark.sql.catalyst.analysis.CheckAnalysis.checkAnalysis$(CheckAnalysis.scala:91)\n",
+    "\tat org.apache.spark.sql.execution.QueryExecution.assertAnalyzed(QueryExecution.scala:73)\n",
+    "\tat org.apache.spark.sql.Dataset$.ofRows(Dataset.scala:98)\n",
+]
+type_names = ["INT", "DOUBLE", "DECIMAL(20,10)", "STRING", "TIMESTAMP", "MAP<STRING, DOUBLE>"]
+words = ["spark", "hive", "csi", "avro", "orc", "parquet", "lorem ipsum"]
+
+
+def gen_value(rand, type_name):
+    '''
+    Returns (SQL literal, spark-sql rendering, .show rendering) of a random value of the type.
+    '''
+    if type_name == "INT":
+        value = str(rand.randint(-2**31, 2**31 - 1))
+        return "cast(%s as int)" % value, value, value
+    if type_name == "DOUBLE":
+        value = rand.choice([repr(rand.uniform(-1e6, 1e6)), "3.141592653589793E-305", "NaN", "-0.0"])
+        return "cast('%s' as double)" % value, value, value
+    if type_name == "DECIMAL(20,10)":
+        value = "%.10f" % rand.uniform(-1e9, 1e9)
+        return "cast(%s as decimal(20,10))" % value, value, value
+    if type_name == "STRING":
+        value = rand.choice(words) + str(rand.randint(0, 999))
+        return "'%s'" % value, value, value
+    if type_name == "TIMESTAMP":
+        value = "2022-%02d-%02d %02d:%02d:%02d" % (rand.randint(1, 12), rand.randint(1, 28), rand.randint(0, 23),
+                                                   rand.randint(0, 59), rand.randint(0, 59))
+        return "timestamp'%s'" % value, value, value
+    key, value = rand.choice(words), repr(rand.uniform(-1e3, 1e3))
+    return ("map('%s', cast(%s as double))" % (key, value), '{"%s":%s}' % (key, value),
+            "{%s -> %s}" % (key, value))
+
+
+def gen_rows(rand, rows, exception_rate):
+    '''
+    [(type, SQL literal, spark-sql rendering, .show rendering, valid)]
+    '''
+    table_rows = []
+    for i in range(rows):
+        type_name = type_names[i * len(type_names) // rows]
+        literal, sql_value, df_value = gen_value(rand, type_name)
+        valid = rand.random() >= exception_rate
+        table_rows.append((type_name, literal, sql_value, df_value, valid))
+    return table_rows
+
+
+def write_noise(wf, rand, noise):
+    for _ in range(noise):
+        wf.write(rand.choice(noise_lines))
+
+
+def write_exception(wf, prefix, message):
+    wf.write("{0}{1}\n".format(prefix, message))
+    wf.writelines(stack_trace_lines)
+
+
+def show_table(row, value):
+    widths = [max(2, len(row)), max(2, len(value))]
+    border = "+" + "+".join("-" * width for width in widths) + "+\n"
+    return (border + "|c0" + " " * (widths[0] - 2) + "|c1" + " " * (widths[1] - 2) + "|\n" + border
+            + "|" + row.ljust(widths[0]) + "|" + value.ljust(widths[1]) + "|\n" + border)
+
+
+def write_sql_write_log(wf, rand, table_rows, format_type, noise):
+    wf.writelines(noise_lines)
+    for i, (type_name, literal, sql_value, _, valid) in enumerate(table_rows):
+        table_name = "ws" + str(i)
+        wf.write("spark-sql> drop table if exists %s;\nTime taken: 0.04 seconds\n" % table_name)
+        wf.write("spark-sql> select (%d, %s);\n" % (i, literal))
+        struct_value = '"%s"' % sql_value if type_name in ("STRING", "TIMESTAMP") else sql_value
+        wf.write('{"col1":%d,"col2":%s}\nTime taken: 0.05 seconds, Fetched 1 row(s)\n' % (i, struct_value))
+        wf.write("spark-sql> create table %s(c0 INT, c1 %s) stored as %s;\nTime taken: 0.2 seconds\n"
+                 % (table_name, type_name, format_type.upper()))
+        wf.write("spark-sql> insert into %s select %d, %s; \n" % (table_name, i, literal))
+        write_noise(wf, rand, noise)
+        if valid:
+            wf.write("Time taken: 0.8 seconds\n")
+        else:
+            write_exception(wf, "Error in query: ", "Cannot safely cast 'c1': string to %s" % type_name.lower())
+
+
+def write_df_write_log(wf, rand, table_rows, format_type, noise):
+    wf.writelines(noise_lines)
+    for i, (_, literal, _, df_value, valid) in enumerate(table_rows):
+        table_name = "ws" + str(i)
+        wf.write('scala> spark.sql("drop table if exists %s;")\nres%d: org.apache.spark.sql.DataFrame = []\n\n'
+                 % (table_name, i))
+        wf.write("scala> val rdd%d = sc.parallelize(Seq(Row(%d, %s)))\n" % (i, i, literal))
+        if not valid:
+            write_exception(wf, "java.lang.RuntimeException: ", "Error while encoding: java.lang.RuntimeException: "
+                                                                "%s is not a valid external type" % literal)
+            continue
+        wf.write("rdd%d: org.apache.spark.rdd.RDD[org.apache.spark.sql.Row] = ParallelCollectionRDD[%d]\n\n" % (i, i))
+        wf.write("scala> val df%d = spark.createDataFrame(rdd%d, schema%d)\n" % (i, i, i))
+        wf.write("df%d: org.apache.spark.sql.DataFrame = [c0: int, c1: string]\n\n" % i)
+        wf.write("scala> df%d.show(false)\n" % i)
+        wf.write(show_table(str(i), df_value) + "\n")
+        wf.write('scala> df%d.write.mode("overwrite").format("%s").saveAsTable("%s")\n' % (i, format_type, table_name))
+        write_noise(wf, rand, noise)
+        wf.write("\n")
+
+
+def write_read_log(wf, rand, table_rows, write_interface, read_interface, noise, mismatch_rate):
+    wf.writelines(noise_lines)
+    for i, (_, _, sql_value, df_value, valid) in enumerate(table_rows):
+        table_name = "ws" + str(i)
+        value = sql_value if read_interface == "sql" else df_value
+        if rand.random() < mismatch_rate:
+            # read back differently than written
+            value = "null"
+        if read_interface == "sql":
+            wf.write("spark-sql> select * from %s;\n" % table_name)
+        else:
+            wf.write('scala> spark.sql("select * from %s;").show(false)\n' % table_name)
+        write_noise(wf, rand, noise)
+        if not valid and write_interface == "df":
+            # the table was never created
+            write_exception(wf, "Error in query: " if read_interface == "sql" else "",
+                            "org.apache.spark.sql.AnalysisException: Table or view not found: %s;" % table_name)
+        elif read_interface == "sql":
+            wf.write("%d\t%s\n" % (i, value) if valid else "")
+            wf.write("Time taken: 0.3 seconds, Fetched %d row(s)\n" % int(valid))
+        else:
+            wf.write(show_table(str(i), value) + "\n" if valid else "+---+---+\n|c0 |c1 |\n+---+---+\n+---+---+\n\n")
+
+
+def make_run(log_dir, rows, formats, exception_rate, mismatch_rate, noise, seed):
+    '''
+    Writes the logs of a run and the t_original.json / t_expected of its inputs to log_dir.
+    '''
+    rand = random.Random(seed)
+    table_rows = gen_rows(rand, rows, exception_rate)
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, "t_original.json"), "w") as wf:
+        json.dump({i: {"value": [str(i), literal], "type": type_name, "valid": valid}
+                   for i, (type_name, literal, _, _, valid) in enumerate(table_rows)}, wf, indent=4)
+    with open(os.path.join(log_dir, "t_expected"), "w") as wf:
+        for i, (_, _, sql_value, _, valid) in enumerate(table_rows):
+            if valid:
+                wf.write("%d\t%s\n" % (i, sql_value))
+    write_log_fn = {"sql": write_sql_write_log, "df": write_df_write_log}
+    for format_type in formats:
+        for write_interface in write_interfaces:
+            with open(os.path.join(log_dir, "log_w_%s_%s" % (write_interface, format_type)), "w") as wf:
+                write_log_fn[write_interface](wf, rand, table_rows, format_type, noise)
+            for read_interface in read_interfaces:
+                with open(os.path.join(log_dir, "log_w_%s_r_%s_%s" % (write_interface, read_interface, format_type)),
+                          "w") as wf:
+                    write_read_log(wf, rand, table_rows, write_interface, read_interface, noise, mismatch_rate)
+
+
+def run_table_diff(log_dir, formats):
+    # diff of each read table against its write table (difft_*), and of each write table against the expected
+    # values (wr_*), as test_failures.py expects them
+    for format_type in formats:
+        for write_interface in write_interfaces:
+            write_table = os.path.join(log_dir, "t_w_%s_%s" % (write_interface, format_type))
+            with open(os.path.join(log_dir, "wr_%s_%s" % (write_interface, format_type)), "w") as outfile:
+                subprocess.run([sys.executable, os.path.join(script_dir, "table_diff.py"),
+                                os.path.join(log_dir, "t_expected"), write_table], stdout=outfile, check=True)
+            for read_interface in read_interfaces:
+                name = "w_%s_r_%s_%s" % (write_interface, read_interface, format_type)
+                with open(os.path.join(log_dir, "difft_" + name), "w") as outfile:
+                    subprocess.run([sys.executable, os.path.join(script_dir, "table_diff.py"), write_table,
+                                    os.path.join(log_dir, "t_" + name)], stdout=outfile, check=True)
+
+
+def get_stages(log_dir, formats, workers):
+    script = lambda name: os.path.join(script_dir, name)
+    get_tables_command = [sys.executable, script("get_tables.py"), "--log_dir", log_dir]
+    if workers is not None:
+        get_tables_command += ["--workers", str(workers)]
+    return [
+        ("get_tables", lambda: subprocess.run(get_tables_command, check=True)),
+        ("table_diff", lambda: run_table_diff(log_dir, formats)),
+        ("test_failures", lambda: subprocess.run([sys.executable, script("test_failures.py"), log_dir],
+                                                 stdout=subprocess.DEVNULL, check=True)),
+        ("inspect_result", lambda: subprocess.run([sys.executable, script("inspect_result.py"),
+                                                   os.path.join(log_dir, ""), "ss"], check=True)),
+    ]
+
+
+def clear_results(log_dir):
+    # outputs of the stages, so that every repetition starts from the logs only
+    for filename in os.listdir(log_dir):
+        if filename.startswith(("t_w_", "difft_", "wr_", "ss_")) or filename.endswith(".index.json"):
+            os.remove(os.path.join(log_dir, filename))
+
+
+def run_benchmark(log_dir, rows, formats, repeat, workers):
+    timings = dict()
+    for _ in range(repeat):
+        clear_results(log_dir)
+        for name, stage in get_stages(log_dir, formats, workers):
+            start = time.time()
+            stage()
+            timings[name] = min(timings.get(name, float("inf")), time.time() - start)
+    print("{0:<16}{1:>10}{2:>14}".format("stage", "seconds", "rows/second"))
+    for name, seconds in timings.items():
+        print("{0:<16}{1:>10.2f}{2:>14.0f}".format(name, seconds, rows / seconds))
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--formats', type=str, nargs='+', default=["parquet", "orc", "avro"])
+    parser.add_argument('--exception_rate', type=float, default=0.1)
+    parser.add_argument('--mismatch_rate', type=float, default=0.02)
+    parser.add_argument('--noise', type=int, default=1, help="log4j lines after each statement")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="the fastest of the repetitions is reported")
+    parser.add_argument('--workers', type=int, help="get_tables.py --workers")
+    parser.add_argument('--log_dir', type=str, help="keep the generated run here instead of a temporary directory")
+    args = parser.parse_args()
+
+    log_dir = args.log_dir if args.log_dir is not None else tempfile.mkdtemp(prefix="csi_benchmark_")
+    try:
+        start = time.time()
+        make_run(log_dir, args.rows, args.formats, args.exception_rate, args.mismatch_rate, args.noise, args.seed)
+        print("Generated {0} rows x {1} formats in {2:.1f} seconds".format(args.rows, len(args.formats),
+                                                                        time.time() - start))
+        run_benchmark(log_dir, args.rows, args.formats, args.repeat, args.workers)
+    finally:
+        if args.log_dir is None:
+            shutil.rmtree(log_dir)
@@ -0,0 +1,247 @@
+'''
+Canonical form of the values printed by spark-sql, spark-shell (.show) and the Hive CLI, so that equivalent
+renderings of a value compare equal with one hash lookup, e.g. all of
+
+{-2147483648:{"12831273.24":3.141592653589793E-305}}      spark-sql / Hive
+{-2147483648 -> {12831273.24 -> 3.141592653589793E-305}}   .show
+{-2147483648:{12831273.24 3.141592653589793E-305           Hive with the tab replaced (see convert_map)
+
+map to the same key. The declared type of the column (the "type" of t_original.json, e.g. MAP<INT, MAP<STRING,
+DOUBLE>>) decides how the scalars in a value compare: numbers of a numeric type, also as map keys, map values, array
+elements and struct fields, by value (8.88888888888889E9 and 8888888888.8888900000 are equal, -0.0 and 0.0 are not),
+everything else as written, so "007" and "7" of a STRING column stay different. The trailing spaces of a CHAR(n) are
+its fixed-width padding, not a difference: JSON rows (--json_rows) keep them, the CLIs' tables do not. Quoted and bare
+map keys are the same, and maps are compared regardless of their entry order. Without a type, no number is
+normalized.
+python3 canonical_value.py [--type <type>] <value> [<value> ...] prints the key of each value.
+'''
+
+import argparse
+import re
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+null_values = {"NULL", "null"}
+special_numbers = {"NaN": "NaN", "Infinity": "Infinity", "+Infinity": "Infinity", "-Infinity": "-Infinity",
+                   "inf": "Infinity", "-inf": "-Infinity"}
+numeric_types = {"BYTE", "TINYINT", "SHORT", "SMALLINT", "INT", "INTEGER", "LONG", "BIGINT", "FLOAT", "DOUBLE",
+                 "DECIMAL"}
+string_types = {"STRING", "CHAR", "VARCHAR"}
+number_regex = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+# end of a bare (unquoted) token: a map key ends at the key separator as well, which is " -> " in .show output and
+# ":" otherwise (so timestamps can be keys of .show maps)
+key_end_regex = {True: re.compile(r"->|[,{}\[\]]"), False: re.compile(r"[:,{}\[\]]")}
+value_end_regex = re.compile(r"[,}\]]")
+
+
+class CanonicalizeError(ValueError):
+    pass
+
+
+def split_type_args(args):
+    # the comma separated types in MAP<...> / STRUCT<...>, commas inside <> and () belong to the nested types
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(args):
+        if char in "<(":
+            depth += 1
+        elif char in ">)":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(args[start:i])
+            start = i + 1
+    parts.append(args[start:])
+    return [part.strip() for part in parts]
+
+
+@lru_cache(maxsize=None)
+def parse_type(type_name):
+    '''
+    Returns ("map", key type, value type), ("array", element type), ("struct", ((field name, type), ...)) or the
+    name of a scalar type without its arguments (DECIMAL for DECIMAL(20,10)), None for no type.
+    '''
+    if type_name is None:
+        return None
+    type_name = type_name.strip()
+    match = re.fullmatch(r"(\w+)\s*<(.*)>", type_name, re.DOTALL)
+    if match is None:
+        return re.sub(r"\(.*\)$", "", type_name).strip().upper()
+    kind, args = match.group(1).upper(), split_type_args(match.group(2))
+    if kind == "MAP" and len(args) == 2:
+        return ("map", parse_type(args[0]), parse_type(args[1]))
+    if kind == "ARRAY" and len(args) == 1:
+        return ("array", parse_type(args[0]))
+    if kind == "STRUCT":
+        fields = [field.split(":", 1) if ":" in field else field.split(None, 1) for field in args]
+        return ("struct", tuple((name.strip(), parse_type(field_type)) for name, field_type in fields))
+    return kind
+
+
+def scalar_key(token, scalar_type=None):
+    if token in null_values:
+        return ("null",)
+    if scalar_type in numeric_types:
+        number = token.strip()
+        if number in special_numbers:
+            return ("num", special_numbers[number])
+        if number_regex.fullmatch(number):
+            try:
+                return ("num", str(Decimal(number).normalize()))
+            except InvalidOperation:
+                pass
+    if scalar_type == "CHAR":
+        token = token.rstrip(" ")
+    # Spark SQL prints a backslash of a string as two
+    return ("str", token.replace("\\\\", "\\"))
+
+
+def skip_spaces(value, pos):
+    while pos < len(value) and value[pos].isspace():
+        pos += 1
+    return pos
+
+
+def parse_quoted(value, pos):
+    end = pos + 1
+    chars = []
+    while end < len(value) and value[end] != '"':
+        if value[end] == "\\" and end + 1 < len(value):
+            end += 1
+        chars.append(value[end])
+        end += 1
+    if end == len(value):
+        raise CanonicalizeError("unterminated string")
+    return "".join(chars), end + 1
+
+
+def parse_item(value, pos, end_regex, arrow):
+    '''
+    Parses the map, array, quoted string or bare token at pos and returns (item, position after it): a string for a
+    token, ("map", [(key, value), ...]), ("array", [item, ...]) or ("struct", [field, ...]), see typed_key.
+    '''
+    pos = skip_spaces(value, pos)
+    if pos == len(value):
+        raise CanonicalizeError("missing value")
+    if value[pos] == "{":
+        return parse_braces(value, pos + 1, arrow)
+    if value[pos] == "[":
+        return parse_array(value, pos + 1, arrow)
+    if value[pos] == '"':
+        return parse_quoted(value, pos)
+    match = end_regex.search(value, pos)
+    end = match.start() if match else len(value)
+    token = value[pos:end].strip()
+    if not token:
+        raise CanonicalizeError("empty token")
+    return token, end
+
+
+def parse_braces(value, pos, arrow):
+    # A map {k:v, ...} / {k -> v, ...}, or a .show struct {v1, v2}
+    separator = "->" if arrow else ":"
+    entries, fields = [], []
+    pos = skip_spaces(value, pos)
+    while pos < len(value) and value[pos] != "}":
+        key, pos = parse_item(value, pos, key_end_regex[arrow], arrow)
+        pos = skip_spaces(value, pos)
+        if value.startswith(separator, pos):
+            item, pos = parse_item(value, pos + len(separator), value_end_regex, arrow)
+            entries.append((key, item))
+        else:
+            fields.append(key)
+        pos = skip_spaces(value, pos)
+        if pos < len(value) and value[pos] == ",":
+            pos = skip_spaces(value, pos + 1)
+        elif pos < len(value) and value[pos] != "}":
+            raise CanonicalizeError("unexpected {0!r} at {1}".format(value[pos], pos))
+    if pos == len(value):
+        # Hive maps with the tab between key and value replaced and the closing braces cut off: {k v
+        for field in fields:
+            if not isinstance(field, str) or len(field.split(None, 1)) != 2:
+                raise CanonicalizeError("unterminated struct")
+            entries.append(tuple(field.split(None, 1)))
+        fields = []
+    else:
+        pos += 1
+    if entries and fields:
+        raise CanonicalizeError("mixed map and struct entries")
+    if fields:
+        return ("struct", fields), pos
+    return ("map", entries), pos
+
+
+def parse_array(value, pos, arrow):
+    items = []
+    pos = skip_spaces(value, pos)
+    while pos < len(value) and value[pos] != "]":
+        item, pos = parse_item(value, pos, value_end_regex, arrow)
+        items.append(item)
+        pos = skip_spaces(value, pos)
+        if pos < len(value) and value[pos] == ",":
+            pos += 1
+        elif pos < len(value) and value[pos] != "]":
+            raise CanonicalizeError("unexpected {0!r} at {1}".format(value[pos], pos))
+    pos = pos + 1 if pos < len(value) else pos
+    return ("array", items), pos
+
+
+def typed_key(item, item_type):
+    '''
+    The hashable key of a parsed item, the element types of a map, array or struct type applying to its elements.
+    A struct printed as a map (its field names as keys, as spark-sql does) gets the type of each field by name.
+    '''
+    if isinstance(item, str):
+        return scalar_key(item, item_type if not isinstance(item_type, tuple) else None)
+    kind, elements = item
+    type_kind = item_type[0] if isinstance(item_type, tuple) else None
+    if kind == "map":
+        if type_kind == "map":
+            key_type, value_type = item_type[1], item_type[2]
+            return ("map", frozenset((typed_key(k, key_type), typed_key(v, value_type)) for k, v in elements))
+        field_types = dict(item_type[1]) if type_kind == "struct" else dict()
+        return ("map", frozenset((typed_key(k, None), typed_key(v, field_types.get(k) if isinstance(k, str) else None))
+                                 for k, v in elements))
+    if kind == "array":
+        element_type = item_type[1] if type_kind == "array" else None
+        return ("array", tuple(typed_key(element, element_type) for element in elements))
+    field_types = [field_type for _, field_type in item_type[1]] if type_kind == "struct" else []
+    if len(field_types) != len(elements):
+        field_types = [None] * len(elements)
+    return ("struct", tuple(typed_key(field, field_type) for field, field_type in zip(elements, field_types)))
+
+
+@lru_cache(maxsize=None)
+def canonicalize(value, type_name=None):
+    '''
+    Returns a hashable key of a value of the declared type, equivalent renderings give equal keys. Values of a
+    map/array/struct type (or without a type) that do not parse as one are compared as scalars. String values keep
+    their whitespace, but for the padding of a CHAR.
+    '''
+    value_type = parse_type(type_name)
+    if value_type in string_types:
+        return scalar_key(value, value_type)
+    if isinstance(value_type, tuple) or value_type is None:
+        stripped = value.strip()
+        if stripped[:1] in ("{", "["):
+            try:
+                item, pos = parse_item(stripped, 0, value_end_regex, "->" in stripped)
+                if skip_spaces(stripped, pos) == len(stripped):
+                    return typed_key(item, value_type)
+            except CanonicalizeError:
+                pass
+        # without a type the value may be a string, which keeps its whitespace
+        return scalar_key(stripped if value_type is not None else value)
+    return scalar_key(value.strip(), value_type)
+
+
+def is_equivalent(value1, value2, type_name=None):
+    return value1 == value2 or canonicalize(value1, type_name) == canonicalize(value2, type_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--type', type=str, help="the declared type of the values, e.g. MAP<STRING, DOUBLE>")
+    parser.add_argument('values', type=str, nargs='+')
+    args = parser.parse_args()
+
+    for value in args.values:
+        print(value, canonicalize(value, args.type))
@@ -0,0 +1,194 @@
+'''
+Runs a generated DataFrame script (w_df_* / r_df_*) as one Spark application instead of feeding it to spark-shell.
+value_gen.py --df_app writes the script as a Scala object next to it (w_df_orc.scala); this compiles the object with
+the Scala compiler shipped in Spark's jars/ and runs it through spark-submit.
+
+Every row of the script (a "val rdd..." with the statements using it, or a single spark.sql(...) statement) is one
+step run in a Try, so a failing row prints its exception and the next row still runs. Within a step, every statement
+but the vals runs in a Try of its own, so a failing .show does not skip the saveAsTable after it, as in spark-shell; a
+failing val ends the step, the statements after it could not have run without it. Each statement is echoed as
+"scala> <statement>" before it runs, so the log reads like a spark-shell log for get_tables.py and inspect_result.py.
+Rows that do not compile are left out of the application and their compiler errors are printed in their place, as
+spark-shell would. The steps are split into methods of steps_per_part steps, in objects of parts_per_object methods
+that main calls in order, so large scripts stay within the JVM's 64 KB per method and 65535 constants per class.
+
+python3 df_app.py logs/…/w_df_orc.scala <spark_home>/bin/spark-submit --packages org.apache.spark:spark-avro_2.12:3.2.1
+'''
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+app_suffix = ".scala"
+max_compile_attempts = 10
+compile_error_regex = re.compile(r"^.*\.scala:(\d+): error: (.*)$")
+# statements starting a new step, the statements after them until the next one use their vals
+step_start_regex = re.compile(r"^(val rdd|spark\.sql\()")
+# a few hundred steps per method and under a thousand per class, each statement adds a closure and its echo
+steps_per_part = 200
+parts_per_object = 4
+
+app_header = '''{imports}
+import org.apache.spark.SparkContext
+import org.apache.spark.sql.functions._
+import scala.util.{{Failure, Try}}
+
+trait {name}_steps {{
+  def echo(statement: String): Unit = println("scala> " + statement)
+
+  def step(body: => Unit): Unit = Try(body) match {{
+    case Failure(e) => println(e)
+    case _ =>
+  }}
+
+  // a statement of a step, the vals are not wrapped so that the statements after them see them
+  def statement(body: => Unit): Unit = step(body)
+}}
+'''
+part_object_header = '''
+object {name}_{index} extends {name}_steps {{'''
+part_header = '''  def part_{index}(spark: SparkSession, sc: SparkContext): Unit = {{
+    import spark.implicits._'''
+main_header = '''
+object {name} {{
+  def main(args: Array[String]): Unit = {{
+    val spark = SparkSession.builder.enableHiveSupport().getOrCreate()
+    val sc = spark.sparkContext'''
+main_footer = '''    spark.stop()
+  }
+}
+'''
+
+
+def get_steps(script_lines):
+    '''
+    Splits the statements of a spark-shell script into (imports, [[statement, ...], ...]).
+    '''
+    imports, steps = [], []
+    for line in script_lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        if line.startswith("import "):
+            imports.append(line)
+        elif step_start_regex.match(line) or not steps:
+            steps.append([line])
+        else:
+            steps[-1].append(line)
+    return imports, steps
+
+
+def get_app_source(name, imports, steps, failed_steps=None):
+    '''
+    Returns the source of the application and the (first line, last line) of each step in it. failed_steps maps the
+    index of a step that does not compile to its compiler errors, such a step only echoes its statements and errors.
+    '''
+    failed_steps = failed_steps or dict()
+    lines = app_header.format(imports="\n".join(imports), name=name).split("\n")[:-1]
+    step_lines = []
+    parts = []
+    for part_start in range(0, len(steps), steps_per_part):
+        part = len(parts)
+        if part % parts_per_object == 0:
+            if part:
+                lines.append("}")
+            lines.extend(part_object_header.format(name=name, index=part // parts_per_object).split("\n"))
+        else:
+            lines.append("")
+        lines.extend(part_header.format(index=part).split("\n"))
+        for i in range(part_start, min(part_start + steps_per_part, len(steps))):
+            first_line = len(lines) + 1
+            lines.append("    step {")
+            for statement in steps[i]:
+                lines.append('      echo("""{0}""")'.format(statement))
+                if i in failed_steps:
+                    continue
+                if statement.startswith("val "):
+                    lines.append("      " + statement)
+                else:
+                    lines.append("      statement {{ {0} }}".format(statement))
+            for error in failed_steps.get(i, []):
+                lines.append('      println("""<console>: error: {0}""")'.format(error))
+            lines.append("    }")
+            step_lines.append((first_line, len(lines)))
+        lines.append("  }")
+        parts.append("    {0}_{1}.part_{2}(spark, sc)".format(name, part // parts_per_object, part))
+    if parts:
+        lines.append("}")
+    lines.extend(main_header.format(name=name).split("\n"))
+    lines.extend(parts)
+    return "\n".join(lines) + "\n" + main_footer, step_lines
+
+
+def write_app(script_path):
+    # Called by value_gen.py --df_app, writes <script>.scala
+    with open(script_path, "r") as infile:
+        imports, steps = get_steps(infile)
+    source, _ = get_app_source(os.path.basename(script_path), imports, steps)
+    with open(script_path + app_suffix, "w") as outfile:
+        outfile.write(source)
+
+
+def get_spark_jars(spark_submit):
+    spark_home = os.path.dirname(os.path.dirname(os.path.abspath(spark_submit)))
+    return sorted(glob.glob(os.path.join(spark_home, "jars", "*.jar")))
+
+
+def compile_app(app_path, jar_path, spark_jars):
+    '''
+    Compiles the application into jar_path, leaving out the steps that do not compile. Returns {step: errors}.
+    '''
+    name = os.path.basename(app_path)[:-len(app_suffix)]
+    with open(app_path[:-len(app_suffix)], "r") as infile:
+        imports, steps = get_steps(infile)
+    classpath = os.pathsep.join(spark_jars)
+    failed_steps = dict()
+    build_dir = tempfile.mkdtemp(prefix="df_app_")
+    try:
+        for _ in range(max_compile_attempts):
+            source, step_lines = get_app_source(name, imports, steps, failed_steps)
+            source_path = os.path.join(build_dir, name + app_suffix)
+            with open(source_path, "w") as outfile:
+                outfile.write(source)
+            result = subprocess.run(["java", "-cp", classpath, "scala.tools.nsc.Main", "-classpath", classpath,
+                                     "-nowarn", "-d", jar_path, source_path],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            if result.returncode == 0:
+                return failed_steps
+            new_failures = 0
+            for line in result.stdout.splitlines():
+                match = compile_error_regex.match(line)
+                if match is None:
+                    continue
+                error_line = int(match.group(1))
+                for i, (first_line, last_line) in enumerate(step_lines):
+                    if first_line <= error_line <= last_line and i not in failed_steps:
+                        failed_steps[i] = [match.group(2)]
+                        new_failures += 1
+                    elif first_line <= error_line <= last_line:
+                        failed_steps[i].append(match.group(2))
+            if new_failures == 0:
+                raise RuntimeError("Could not compile {0}:\n{1}".format(app_path, result.stdout))
+        raise RuntimeError("{0} still does not compile after leaving out {1} steps".format(app_path, len(failed_steps)))
+    finally:
+        shutil.rmtree(build_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('app', type=str, help="the <script>.scala written by value_gen.py --df_app")
+    parser.add_argument('spark_submit', type=str)
+    parser.add_argument('spark_args', nargs=argparse.REMAINDER, help="passed on to spark-submit")
+    args = parser.parse_args()
+
+    jar_path = args.app[:-len(app_suffix)] + ".jar"
+    failed_steps = compile_app(args.app, jar_path, get_spark_jars(args.spark_submit))
+    print("Compiled {0}, {1} steps left out".format(jar_path, len(failed_steps)), flush=True)
+    name = os.path.basename(args.app)[:-len(app_suffix)]
+    result = subprocess.run([args.spark_submit, "--class", name] + args.spark_args + [jar_path])
+    sys.exit(result.returncode)
@@ -0,0 +1,2286 @@
+'''
+A stand-in for spark-sql, spark-shell, the Hive CLI, the Hive metastore service and "hadoop fs -rm", so the drivers,
+get_tables.py and inspect_result.py can run end to end without Spark, Hive or HDFS (e.g. to benchmark the harness).
+
+It reads scripts from stdin and answers like the real CLIs: every statement is echoed after its prompt (spark-sql>,
+scala>, hive>), followed by its output, "Time taken" lines and exceptions in the engines' own formats. The generated
+w_*/r_* scripts are interpreted: SQL/HQL literals, casts, arithmetic, intervals, map/array/struct, the scalar Scala
+values of the DataFrame scripts (.toByte, BigInt, BigDecimal, Map, Array, to_timestamp/to_date) and the statements
+around them. Tables are kept in memory and written through to <home>/warehouse (data) and <home>/metastore_db
+(schemas), so a write and the later reads, also from the other system, see the same tables. It models the usual
+behaviour of the engines (non-ANSI casts, Spark's ANSI store assignment on insert, Hive's lenient inserts, the
+external types of DataFrame rows) rather than every corner of them, and --df_app runs are not supported.
+
+python3 fake_engine.py [--statement_latency S] [--stall_pattern REGEX] install <home> writes fake Spark, Hive and Hadoop
+homes to <home> and prints the environment to use them, e.g.
+    python3 fake_engine.py install /tmp/fake
+    export SPARK_HOME_E2E=/tmp/fake/spark SPARK_HOME_ONEWAY=/tmp/fake/spark HIVE_HOME=/tmp/fake/hive \
+        HADOOP_HOME=/tmp/fake/hadoop
+    ./spark_e2e.sh
+The launchers run python3 fake_engine.py --home <home> <spark-sql|spark-shell|spark-submit|hive|hadoop> <args>.
+With --stall_pattern, the CLIs hang on every statement the regex matches, to try the timeouts of step_watchdog.py.
+'''
+
+import argparse
+import base64
+import calendar
+import datetime
+import glob
+import json
+import math
+import os
+import pickle
+import re
+import shlex
+import shutil
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, ROUND_DOWN
+
+from value_gen import java_float_str
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+fake_version = "3.2.1"
+hive_exec_jar = "hive-exec-3.1.2.jar"
+# the HDFS warehouse of the drivers (parallel_formats.delete_table_data), mapped to <home>/warehouse
+hdfs_warehouse_dir = "/user/hive/warehouse"
+default_metastore_port = 9083
+default_database = "default"
+launchers = {
+    os.path.join("spark", "bin", "spark-sql"): "spark-sql",
+    os.path.join("spark", "bin", "spark-shell"): "spark-shell",
+    os.path.join("spark", "bin", "spark-submit"): "spark-submit",
+    os.path.join("hive", "bin", "hive"): "hive",
+    os.path.join("hadoop", "bin", "hadoop"): "hadoop",
+}
+launcher_template = '#!/bin/bash\nexec python3 {script} --home {home} {options} {system} "$@"\n'
+startup_noise = [
+    "WARN NativeCodeLoader: Unable to load native-hadoop library for your platform... using builtin-java classes "
+    "where applicable",
+    "WARN HiveConf: HiveConf of name hive.stats.jdbc.timeout does not exist",
+    "WARN ObjectStore: Failed to get database global_temp, returning NoSuchObjectException",
+]
+stack_trace = {
+    "spark": ["\tat org.apache.spark.sql.catalyst.analysis.CheckAnalysis.checkAnalysis$(CheckAnalysis.scala:91)",
+              "\tat org.apache.spark.sql.execution.QueryExecution.assertAnalyzed(QueryExecution.scala:73)",
+              "\tat org.apache.spark.sql.Dataset$.ofRows(Dataset.scala:98)"],
+    "scala": ["  at org.apache.spark.sql.catalyst.encoders.ExpressionEncoder$Serializer.apply("
+              "ExpressionEncoder.scala:213)",
+              "  at org.apache.spark.sql.SparkSession.$anonfun$createDataFrame$1(SparkSession.scala:372)",
+              "  ... 47 elided"],
+}
+
+integral_bits = {"tinyint": 8, "smallint": 16, "int": 32, "bigint": 64}
+fractional_types = {"float", "double"}
+string_types = {"string", "char", "varchar"}
+datetime_types = {"date", "timestamp"}
+# type names of CREATE TABLE / CAST and of the DataFrame schemas, to the names Spark prints
+sql_type_aliases = {"byte": "tinyint", "tinyint": "tinyint", "short": "smallint", "smallint": "smallint",
+                    "int": "int", "integer": "int", "long": "bigint", "bigint": "bigint", "float": "float",
+                    "real": "float", "double": "double", "decimal": "decimal", "dec": "decimal", "numeric": "decimal",
+                    "string": "string", "char": "char", "varchar": "varchar", "binary": "binary",
+                    "boolean": "boolean", "date": "date", "timestamp": "timestamp", "array": "array", "map": "map",
+                    "struct": "struct"}
+scala_type_names = {"ByteType": "tinyint", "ShortType": "smallint", "IntegerType": "int", "LongType": "bigint",
+                    "FloatType": "float", "DoubleType": "double", "StringType": "string", "BinaryType": "binary",
+                    "BooleanType": "boolean", "DateType": "date", "TimestampType": "timestamp",
+                    "DecimalType": "decimal", "CharType": "char", "VarcharType": "varchar", "ArrayType": "array",
+                    "MapType": "map"}
+# JVM classes a DataFrame row may hold for a column type
+external_types = {"tinyint": ["java.lang.Byte"], "smallint": ["java.lang.Short"], "int": ["java.lang.Integer"],
+                  "bigint": ["java.lang.Long"], "float": ["java.lang.Float"], "double": ["java.lang.Double"],
+                  "decimal": ["scala.math.BigDecimal", "java.math.BigDecimal"], "string": ["java.lang.String"],
+                  "char": ["java.lang.String"], "varchar": ["java.lang.String"], "binary": ["[B"],
+                  "boolean": ["java.lang.Boolean"], "date": ["java.sql.Date"], "timestamp": ["java.sql.Timestamp"]}
+max_decimal_precision = 38
+micros_per_second = 1000000
+micros_per_day = 86400 * micros_per_second
+interval_unit_micros = {"microsecond": 1, "millisecond": 1000, "second": micros_per_second,
+                        "minute": 60 * micros_per_second, "hour": 3600 * micros_per_second, "day": micros_per_day,
+                        "week": 7 * micros_per_day}
+interval_unit_months = {"year": 12, "month": 1}
+timestamp_regex = re.compile(r"^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2})(?:[ T](\d{1,2})(?::(\d{1,2})(?::(\d{1,2})"
+                             r"(?:\.(\d{1,9}))?)?)?)?)?)?\s*(Z|UTC|[+-]\d{1,2}(?::?\d{2})?)?$")
+date_regex = re.compile(r"^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2})(?:[ T].*)?)?)?$")
+java_timestamp_regex = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{1,2}):(\d{1,2})(?:\.(\d{1,9}))?$")
+java_integer_regex = re.compile(r"^[+-]?\d+$")
+java_double_regex = re.compile(r"^\s*[+-]?(?:NaN|Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[fFdD]?)\s*$")
+sql_number_regex = re.compile(r"^\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*$")
+sql_token_regex = re.compile(r"""\s*(?:(?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?(?i:BD|[YSLD](?!\w))?)"""
+                             r"""|(?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|(?P<ident>[A-Za-z_]\w*|`[^`]*`)"""
+                             r"""|(?P<op>\S))""", re.S)
+scala_token_regex = re.compile(r"""\s*(?:(?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[LlFfDd]?)"""
+                               r"""|(?P<str>"(?:[^"\\\n]|\\.)*")|(?P<unclosed>")|(?P<ident>[A-Za-z_$][\w$]*)"""
+                               r"""|(?P<op>->|=>|\S))""", re.S)
+sql_escapes = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", "b": "\b", "Z": "\x1a"}
+# Seq("2022").toDF("c").select(to_timestamp(col("c")).as("t")).first().getAs[java.sql.Timestamp](0), as one call
+scala_local_cast_regex = re.compile(r'Seq\(("(?:[^"\\]|\\.)*")\)\.toDF\("\w+"\)\.select\((to_timestamp|to_date)'
+                                    r'\(col\("\w+"\)\)\.as\("\w+"\)\)\.first\(\)\.getAs\[java\.sql\.\w+\]\(0\)')
+scala_statement_regexes = [
+    ("import", re.compile(r"^import\s+(.*)$")),
+    ("sql", re.compile(r'^spark\.sql\("((?:[^"\\]|\\.)*)"\)(.*)$')),
+    ("rdd", re.compile(r"^val (\w+) = sc\.parallelize\((.*)\)$")),
+    ("schema", re.compile(r"^val (\w+) = new StructType\(\)((?:\.add\(.*\))*)$")),
+    ("create_df", re.compile(r"^val (\w+) = spark\.createDataFrame\((\w+), (\w+)\)$")),
+    ("with_column", re.compile(r'^val (\w+) = (\w+)\.withColumn\("(\w+)", (.*)\)$')),
+    ("show", re.compile(r"^(\w+)\.show\((?:Int\.MaxValue, )?(?:false|true)?\)$")),
+    ("save", re.compile(r'^(\w+)\.write\.mode\("(\w+)"\)\.format\("(\w+)"\)\.saveAsTable\("([\w.]+)"\)$')),
+    ("println", re.compile(r'^println\(("(?:[^"\\]|\\.)*")\)$')),
+    ("refresh", re.compile(r'^scala\.util\.Try\(spark\.catalog\.refreshTable\("([\w.]+)"\)\)$')),
+]
+# the column of withColumn plus an interval: df("c1") + expr("..."), col("c1") - expr("...") or (...).cast(DateType)
+scala_interval_expr = r'\(?(?:\w+|col)\("(\w+)"\) ([+-]) expr\("((?:[^"\\]|\\.)*)"\)(?:\)\.cast\((\w+)\))?'
+scala_interval_regex = re.compile(r"^" + scala_interval_expr + r"$")
+# when(col("c0") === 1, <interval expr>).when(...).otherwise(col("c1")), each row of a batched DataFrame its own
+scala_when_regex = re.compile(r'^((?:when\(col\("\w+"\) === -?\d+, .*?\)\.)+)otherwise\(col\("(\w+)"\)\)$')
+scala_when_branch_regex = re.compile(r'when\(col\("(\w+)"\) === (-?\d+), ' + scala_interval_expr + r'\)(?:\.|$)')
+scala_show_suffix_regex = re.compile(r"^\.show\((?:Int\.MaxValue, )?(?:false|true)?\)$")
+# c1 is cast to a string but for maps, arrays and structs, see value_gen.read_df_statement
+scala_json_rows_suffix_regex = re.compile(r'^\.select\(to_json\(struct\(col\("c0"\), col\("c1"\)'
+                                          r'(?P<cast>\.cast\("string"\)\.as\("c1"\))?\)\)\)\.as\[String\]\.collect'
+                                          r'\.foreach\(r => println\("csi_row:" \+ r\)\)$')
+
+
+class EngineError(Exception):
+    '''
+    An error the engine reports for a statement: kind is "parse", "analysis", "runtime" (Spark / Hive) or "compile"
+    (the Scala REPL), exception the JVM class printed before the message.
+    '''
+
+    def __init__(self, kind, message, exception=None):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.exception = exception
+
+
+class Struct(tuple):
+    '''
+    A struct value, ((field name, value), ...).
+    '''
+
+
+# Types are tuples: ("int",), ("decimal", precision, scale), ("char", n), ("array", element type),
+# ("map", key type, value type), ("struct", ((name, type), ...)), ("void",) for NULL and ("interval",).
+
+
+def type_str(data_type):
+    name = data_type[0]
+    if name == "decimal":
+        return "decimal({0},{1})".format(data_type[1], data_type[2])
+    if name in ("char", "varchar"):
+        return "{0}({1})".format(name, data_type[1])
+    if name == "array":
+        return "array<{0}>".format(type_str(data_type[1]))
+    if name == "map":
+        return "map<{0},{1}>".format(type_str(data_type[1]), type_str(data_type[2]))
+    if name == "struct":
+        return "struct<{0}>".format(",".join("{0}:{1}".format(n, type_str(t)) for n, t in data_type[1]))
+    return "null" if name == "void" else name
+
+
+def is_numeric(data_type):
+    return data_type[0] in integral_bits or data_type[0] in fractional_types or data_type[0] == "decimal"
+
+
+def wrap_integral(value, bits):
+    # Java narrowing of an integer to the given width
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def fits_integral(value, bits):
+    return -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+
+
+def to_float32(value):
+    try:
+        return struct.unpack("f", struct.pack("f", value))[0]
+    except OverflowError:
+        return math.copysign(math.inf, value)
+
+
+def decimal_type_of(value):
+    digits, exponent = value.as_tuple()[1:]
+    scale = max(-exponent, 0)
+    precision = max(len(digits) + max(exponent, 0), scale, 1)
+    return ("decimal", precision, scale)
+
+
+def fit_decimal(value, precision, scale):
+    # the value rounded to the scale, None if it needs more than precision digits
+    if not value.is_finite():
+        return None
+    try:
+        value = value.quantize(Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+    return value if value.adjusted() < precision - scale else None
+
+
+def days_in_month(year, month):
+    return calendar.monthrange(year, month)[1]
+
+
+def parse_timestamp(text):
+    '''
+    Spark's string to timestamp: [ ]yyyy[-[m]m[-[d]d[( |T)[h]h[:[m]m[:[s]s[.f]]]]]][zone][ ], in UTC, or None.
+    '''
+    match = timestamp_regex.match(text.strip())
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    try:
+        value = datetime.datetime(int(year), int(month or 1), int(day or 1), int(hour or 0), int(minute or 0),
+                                  int(second or 0), int((fraction or "0").ljust(6, "0")[:6]))
+    except ValueError:
+        return None
+    if zone and zone not in ("Z", "UTC"):
+        sign = -1 if zone[0] == "-" else 1
+        digits = zone[1:].replace(":", "")
+        offset = datetime.timedelta(hours=int(digits[:-2] if len(digits) > 2 else digits),
+                                    minutes=int(digits[-2:]) if len(digits) > 2 else 0)
+        value -= sign * offset
+    return value
+
+
+def parse_date(text):
+    match = date_regex.match(text.strip())
+    if match is None:
+        return None
+    year, month, day = match.groups()
+    try:
+        return datetime.date(int(year), int(month or 1), int(day or 1))
+    except ValueError:
+        return None
+
+
+def add_interval(value, interval):
+    # a date plus an interval stays a date, the time the interval adds is truncated (non-ANSI DateAddInterval)
+    if not isinstance(value, datetime.datetime):
+        return add_interval(datetime.datetime(value.year, value.month, value.day), interval).date()
+    months, micros = interval
+    if months:
+        month_index = value.year * 12 + value.month - 1 + months
+        year, month = divmod(month_index, 12)
+        if not 1 <= year <= 9999:
+            raise EngineError("runtime", "long overflow", "java.lang.ArithmeticException")
+        value = value.replace(year=year, month=month + 1, day=min(value.day, days_in_month(year, month + 1)))
+    try:
+        return value + datetime.timedelta(microseconds=micros)
+    except OverflowError:
+        raise EngineError("runtime", "long overflow", "java.lang.ArithmeticException")
+
+
+def parse_interval(text, from_unit=None, to_unit=None, hive=False):
+    '''
+    (months, microseconds) of an interval literal: '<n> <unit> [<n> <unit> ...]', '<y>-<m>' year to month or
+    '<d> <h>[:<m>[:<s>]]' day to hour/minute/second.
+    '''
+    text = text.strip()
+    if from_unit is not None and to_unit is not None:
+        if from_unit == "year" and to_unit == "month":
+            match = re.match(r"^([+-]?)(\d+)-(\d+)$", text)
+            if match is None:
+                raise interval_error(text)
+            sign = -1 if match.group(1) == "-" else 1
+            return sign * (int(match.group(2)) * 12 + int(match.group(3))), 0
+        # day to hour: 'd h', day to minute: 'd h:m', day to second: 'd h:m:s[.f]'
+        units = ["hour", "minute", "second"]
+        match = re.match(r"^([+-]?)(\d+) (\d+)(?::(\d+))?(?::(\d+(?:\.\d+)?))?$", text)
+        if match is None or from_unit != "day" or to_unit not in units or \
+                [match.group(4), match.group(5)].count(None) != 2 - units.index(to_unit):
+            raise interval_error(text)
+        sign = -1 if match.group(1) == "-" else 1
+        micros = int(match.group(2)) * micros_per_day + int(match.group(3)) * 3600 * micros_per_second
+        micros += int(match.group(4) or 0) * 60 * micros_per_second
+        micros += int(Decimal(match.group(5) or 0) * micros_per_second)
+        return 0, sign * micros
+    if from_unit is not None:
+        text = text + " " + from_unit
+    parts = text.split()
+    if not parts or len(parts) % 2 or hive and len(parts) > 2:
+        raise interval_error(text)
+    months, days, micros = 0, 0, 0
+    for number, unit in zip(parts[::2], parts[1::2]):
+        unit = unit.lower().rstrip("s")
+        try:
+            number = Decimal(number)
+        except InvalidOperation:
+            raise interval_error(text)
+        if unit in interval_unit_months and number == number.to_integral_value():
+            months += int(number) * interval_unit_months[unit]
+        elif unit in ("day", "week") and number == number.to_integral_value():
+            days += int(number * interval_unit_micros[unit] // micros_per_day)
+        elif unit in interval_unit_micros:
+            micros += int(number * interval_unit_micros[unit])
+        else:
+            raise interval_error(text)
+    # months and days are ints of Spark's CalendarInterval, the rest a long of microseconds
+    if not fits_integral(months, 32) or not fits_integral(days, 32) or not fits_integral(micros, 64):
+        raise interval_error(text)
+    return months, days * micros_per_day + micros
+
+
+def interval_error(text):
+    return EngineError("parse", "Cannot parse the INTERVAL value: {0}".format(text))
+
+
+def parse_sql_string(token):
+    # a quoted SQL/HQL string literal without its quotes, escapes resolved
+    return re.sub(r"\\(.)", lambda m: sql_escapes.get(m.group(1), m.group(1)), token[1:-1], flags=re.S)
+
+
+def cast_value(value, from_type, to_type, hive=False):
+    '''
+    CAST(value AS to_type) with the non-ANSI semantics of Spark 3.2 (and Hive): a value that does not convert
+    becomes NULL, integers are narrowed like in Java. Raises an analysis error for casts between unrelated types.
+    '''
+    name = to_type[0]
+    if value is None:
+        return None
+    from_name = from_type[0]
+    if name in ("array", "map", "struct") or from_name in ("array", "map", "struct"):
+        if from_name != name:
+            if name in string_types:
+                return render_value(value, from_type, "show")
+            raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+        if name == "array":
+            return [cast_value(v, from_type[1], to_type[1], hive) for v in value]
+        if name == "map":
+            return {cast_value(k, from_type[1], to_type[1], hive): cast_value(v, from_type[2], to_type[2], hive)
+                    for k, v in value.items()}
+        return Struct((n, cast_value(v, ft, tt, hive)) for (n, v), (_, ft), (_, tt) in
+                      zip(value, from_type[1], to_type[1]))
+    if name in string_types:
+        text = render_value(value, from_type, "cli")
+        return text[:to_type[1]] if hive and name != "string" else text
+    if name in integral_bits:
+        bits = integral_bits[name]
+        if from_name in integral_bits:
+            return wrap_integral(value, bits)
+        if from_name == "boolean":
+            return int(value)
+        if from_name in fractional_types:
+            if math.isnan(value):
+                return 0
+            if math.isinf(value):
+                value = math.copysign(2 ** 63 - 1, value)
+            return wrap_integral(int(value), bits)
+        if from_name == "decimal":
+            integral = int(value.to_integral_value(rounding=ROUND_DOWN))
+            return integral if fits_integral(integral, bits) else None
+        if from_name in string_types:
+            text = value.strip()
+            if not sql_number_regex.match(text) or "e" in text.lower():
+                return None
+            integral = int(Decimal(text).to_integral_value(rounding=ROUND_DOWN))
+            return integral if fits_integral(integral, bits) else None
+        if from_name == "timestamp":
+            return wrap_integral(calendar.timegm(value.timetuple()), bits)
+        raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+    if name in fractional_types:
+        if from_name in string_types:
+            text = value.strip()
+            special = {"nan": math.nan, "infinity": math.inf, "-infinity": -math.inf, "inf": math.inf,
+                       "-inf": -math.inf, "+infinity": math.inf}
+            if text.lower() in special:
+                number = special[text.lower()]
+            elif sql_number_regex.match(text):
+                number = float(text)
+            else:
+                return None
+        elif is_numeric(from_type) or from_name == "boolean":
+            number = float(value)
+        elif from_name == "timestamp":
+            number = calendar.timegm(value.timetuple()) + value.microsecond / micros_per_second
+        else:
+            raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+        return to_float32(number) if name == "float" else number
+    if name == "decimal":
+        if from_name in string_types:
+            if not sql_number_regex.match(value):
+                return None
+            number = Decimal(value.strip())
+        elif from_name in fractional_types:
+            if math.isnan(value) or math.isinf(value):
+                return None
+            number = Decimal(repr(value))
+        elif is_numeric(from_type) or from_name == "boolean":
+            number = Decimal(int(value)) if from_name != "decimal" else value
+        else:
+            raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+        return fit_decimal(number, to_type[1], to_type[2])
+    if name == "boolean":
+        if from_name in string_types:
+            return {"t": True, "true": True, "y": True, "yes": True, "1": True, "f": False, "false": False,
+                    "n": False, "no": False, "0": False}.get(value.strip().lower())
+        if is_numeric(from_type):
+            return value != 0
+        if from_name == "boolean":
+            return value
+        raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+    if name == "timestamp":
+        if from_name in string_types:
+            return parse_timestamp(value)
+        if from_name == "date":
+            return datetime.datetime(value.year, value.month, value.day)
+        if from_name == "timestamp":
+            return value
+        if is_numeric(from_type):
+            try:
+                return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=float(value))
+            except (OverflowError, ValueError):
+                return None
+        raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+    if name == "date":
+        if from_name in string_types:
+            return parse_date(value)
+        if from_name == "timestamp":
+            return value.date()
+        if from_name == "date":
+            return value
+        raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+    if name == "binary":
+        if from_name in string_types:
+            return value.encode("utf-8")
+        if from_name in integral_bits:
+            return value.to_bytes(integral_bits[from_name] // 8, "big", signed=True)
+        if from_name == "binary":
+            return value
+        raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+    raise EngineError("analysis", "cannot cast {0} to {1}".format(type_str(from_type), type_str(to_type)))
+
+
+def can_store_assign(from_type, to_type):
+    # Spark's ANSI store assignment policy, the default of INSERT since Spark 3.0
+    from_name, name = from_type[0], to_type[0]
+    if from_name == "void":
+        return True
+    if is_numeric(from_type) and is_numeric(to_type):
+        return True
+    if from_name not in ("array", "map", "struct") and name in string_types:
+        return True
+    if from_name in datetime_types and name in datetime_types:
+        return True
+    if from_name == name == "array":
+        return can_store_assign(from_type[1], to_type[1])
+    if from_name == name == "map":
+        return can_store_assign(from_type[1], to_type[1]) and can_store_assign(from_type[2], to_type[2])
+    if from_name == name == "struct":
+        return len(from_type[1]) == len(to_type[1]) and \
+            all(can_store_assign(f, t) for (_, f), (_, t) in zip(from_type[1], to_type[1]))
+    return from_name == name
+
+
+def store_value(value, from_type, to_type, hive):
+    '''
+    The value an INSERT writes to a column: Hive casts implicitly, Spark checks the store assignment policy and fails
+    on overflow instead of producing NULL.
+    '''
+    if hive:
+        if from_type[0] in ("array", "map", "struct") and from_type[0] != to_type[0]:
+            raise EngineError("analysis", "Cannot convert column 1 from {0} to {1}.".format(
+                type_str(from_type), type_str(to_type)))
+        stored = cast_value(value, from_type, to_type, hive=True)
+        if to_type[0] == "char" and stored is not None:
+            stored = stored.ljust(to_type[1])
+        return stored
+    if not can_store_assign(from_type, to_type):
+        raise EngineError("analysis", "Cannot safely cast 'c1': {0} to {1}".format(type_str(from_type),
+                                                                                  type_str(to_type)))
+    if value is None:
+        return None
+    name = to_type[0]
+    if name in integral_bits and is_numeric(from_type):
+        number = value
+        if from_type[0] in fractional_types:
+            if math.isnan(value) or math.isinf(value):
+                raise overflow_error(value, from_type, to_type)
+            number = int(value)
+        elif from_type[0] == "decimal":
+            number = int(value.to_integral_value(rounding=ROUND_DOWN))
+        if not fits_integral(number, integral_bits[name]):
+            raise overflow_error(value, from_type, to_type)
+        return number
+    if name == "decimal" and is_numeric(from_type):
+        stored = cast_value(value, from_type, to_type)
+        if stored is None:
+            raise EngineError("runtime", "Decimal({0}) cannot be represented as Decimal({1}, {2}).".format(
+                render_value(value, from_type, "cli"), to_type[1], to_type[2]), "java.lang.ArithmeticException")
+        return stored
+    if name in ("char", "varchar"):
+        stored = cast_value(value, from_type, ("string",))
+        if len(stored.rstrip(" ") if name == "char" else stored) > to_type[1]:
+            raise EngineError("runtime", "Exceeds char/varchar type length limitation: {0}".format(to_type[1]),
+                              "java.lang.RuntimeException")
+        return stored.ljust(to_type[1]) if name == "char" else stored
+    return cast_value(value, from_type, to_type)
+
+
+def overflow_error(value, from_type, to_type):
+    return EngineError("runtime", "Casting {0} to {1} causes overflow".format(render_value(value, from_type, "cli"),
+                                                                              type_str(to_type)),
+                       "java.lang.ArithmeticException")
+
+
+def render_timestamp(value):
+    text = value.strftime("%Y-%m-%d %H:%M:%S")
+    if value.microsecond:
+        text += ("." + "{0:06d}".format(value.microsecond)).rstrip("0")
+    return text
+
+
+def render_value(value, data_type, style, nested=False):
+    '''
+    The text of a value as spark-sql / the Hive CLI print it ("cli"), as Dataset.show prints it ("show"), or as
+    JSON ("json", to_json and the structs printed by spark-sql).
+    '''
+    name = data_type[0]
+    if value is None:
+        return "null" if nested or style != "cli" else "NULL"
+    if name == "array":
+        separator = ", " if style == "show" else ","
+        return "[" + separator.join(render_value(v, data_type[1], style, True) for v in value) + "]"
+    if name == "map":
+        if style == "show":
+            return "{" + ", ".join("{0} -> {1}".format(render_value(k, data_type[1], style, True),
+                                                       render_value(v, data_type[2], style, True))
+                                   for k, v in value.items()) + "}"
+        key_style = "json_key" if style == "json" else style
+        return "{" + ",".join("{0}:{1}".format(render_value(k, data_type[1], key_style, True),
+                                               render_value(v, data_type[2], style, True))
+                              for k, v in value.items()) + "}"
+    if name == "struct":
+        if style == "show":
+            return "{" + ", ".join(render_value(v, t, style, True) for (_, v), (_, t) in zip(value, data_type[1])) + "}"
+        return "{" + ",".join('"{0}":{1}'.format(n, render_value(v, t, style, True))
+                              for (n, v), (_, t) in zip(value, data_type[1])) + "}"
+    if name == "boolean":
+        text = "true" if value else "false"
+    elif name in integral_bits:
+        text = str(value)
+    elif name in fractional_types:
+        text = java_float_str(value, name == "float")
+        if style in ("json", "json_key") and (math.isnan(value) or math.isinf(value)):
+            return '"' + text + '"'
+    elif name == "decimal":
+        text = "{0:f}".format(value)
+    elif name == "timestamp":
+        text = render_timestamp(value)
+    elif name == "date":
+        text = value.isoformat()
+    elif name == "binary":
+        if style == "show":
+            return "[" + " ".join("{0:02X}".format(b) for b in value) + "]"
+        text = value.decode("utf-8", errors="replace")
+    else:
+        text = value
+    quoted = name in string_types or name in datetime_types or name == "binary" or style == "json_key"
+    if nested and quoted and style != "show":
+        return json.dumps(text, ensure_ascii=False) if style.startswith("json") else '"' + text + '"'
+    return text
+
+
+class TableStore:
+    '''
+    The tables of the engine. Schemas live in <metastore>/<database>/<table>.pickle, rows in part files under
+    <warehouse>/<table> (<warehouse>/<database>.db/<table> for other databases than default), so removing a table's
+    data directory empties the table, like removing its HDFS directory. Parts are cached in memory by modification
+    time, a process sees the writes of the others.
+    '''
+
+    def __init__(self, metastore_dir, warehouse_dir):
+        self.metastore_dir = metastore_dir
+        self.warehouse_dir = warehouse_dir
+        self.database = default_database
+        self.part_cache = dict()
+        os.makedirs(os.path.join(metastore_dir, default_database), exist_ok=True)
+        os.makedirs(warehouse_dir, exist_ok=True)
+
+    def split_name(self, table_name):
+        database, _, table = table_name.lower().rpartition(".")
+        return database or self.database, table
+
+    def schema_path(self, table_name):
+        database, table = self.split_name(table_name)
+        return os.path.join(self.metastore_dir, database, table + ".pickle")
+
+    def data_dir(self, table_name):
+        database, table = self.split_name(table_name)
+        if database == default_database:
+            return os.path.join(self.warehouse_dir, table)
+        return os.path.join(self.warehouse_dir, database + ".db", table)
+
+    def database_exists(self, database):
+        return os.path.isdir(os.path.join(self.metastore_dir, database.lower()))
+
+    def create_database(self, database):
+        os.makedirs(os.path.join(self.metastore_dir, database.lower()), exist_ok=True)
+
+    def drop_database(self, database, cascade=False):
+        database = database.lower()
+        metastore_dir = os.path.join(self.metastore_dir, database)
+        if not cascade and os.listdir(metastore_dir):
+            raise EngineError("analysis", "Cannot drop a non-empty database: {0}. Use CASCADE option to drop a "
+                                          "non-empty database.".format(database),
+                              "org.apache.spark.sql.AnalysisException")
+        shutil.rmtree(metastore_dir, ignore_errors=True)
+        shutil.rmtree(os.path.join(self.warehouse_dir, database + ".db"), ignore_errors=True)
+        if self.database == database:
+            self.database = default_database
+
+    def use_database(self, database):
+        if not self.database_exists(database):
+            raise EngineError("analysis", "Database '{0}' not found".format(database),
+                              "org.apache.spark.sql.catalyst.analysis.NoSuchDatabaseException")
+        self.database = database.lower()
+
+    def get_schema(self, table_name):
+        try:
+            with open(self.schema_path(table_name), "rb") as infile:
+                return pickle.load(infile)
+        except FileNotFoundError:
+            return None
+
+    def create_table(self, table_name, columns, format_type, if_not_exists=False):
+        if self.get_schema(table_name) is not None:
+            if if_not_exists:
+                return
+            database, table = self.split_name(table_name)
+            raise EngineError("analysis", "Table {0}.{1} already exists".format(database, table),
+                              "org.apache.spark.sql.catalyst.analysis.TableAlreadyExistsException")
+        self.write_atomically(self.schema_path(table_name), {"columns": columns, "format": format_type})
+
+    def drop_table(self, table_name):
+        if os.path.exists(self.schema_path(table_name)):
+            os.remove(self.schema_path(table_name))
+        shutil.rmtree(self.data_dir(table_name), ignore_errors=True)
+
+    def read_rows(self, table_name):
+        rows = []
+        data_dir = self.data_dir(table_name)
+        if not os.path.isdir(data_dir):
+            return rows
+        for part in sorted(os.listdir(data_dir)):
+            path = os.path.join(data_dir, part)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            cached = self.part_cache.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, "rb") as infile:
+                    cached = (mtime, pickle.load(infile))
+                self.part_cache[path] = cached
+            rows.extend(cached[1])
+        return rows
+
+    def write_rows(self, table_name, rows, overwrite=False):
+        data_dir = self.data_dir(table_name)
+        if overwrite:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        os.makedirs(data_dir, exist_ok=True)
+        part = "part-{0:05d}-{1}.pickle".format(len(os.listdir(data_dir)), os.getpid())
+        self.write_atomically(os.path.join(data_dir, part), rows)
+
+    @staticmethod
+    def write_atomically(path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as outfile:
+            pickle.dump(data, outfile)
+        os.replace(tmp_path, path)
+
+
+class SqlParser:
+    '''
+    Recursive descent parser and evaluator of the SQL / HQL the generated scripts use. Expressions are evaluated
+    while parsing, to (type, value), with the columns of the current row in self.columns.
+    '''
+
+    def __init__(self, text, hive=False):
+        self.text = text
+        self.hive = hive
+        self.tokens = []
+        for match in sql_token_regex.finditer(text):
+            kind = match.lastgroup
+            self.tokens.append((kind, match.group(kind), match.start(kind)))
+        self.pos = 0
+        self.columns = dict()
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("end", "<EOF>", len(self.text))
+
+    def peek_word(self, offset=0):
+        kind, text, _ = self.peek(offset)
+        return text.lower() if kind == "ident" else None
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def error(self, expecting=None):
+        _, text, offset = self.peek()
+        if self.hive:
+            message = "line 1:{0} cannot recognize input near '{1}'".format(offset, text)
+        else:
+            message = "\nmismatched input '{0}' expecting {1}(line 1, pos {2})\n\n== SQL ==\n{3}\n{4}^^^\n".format(
+                text, expecting or "{<EOF>, ';'}", offset, self.text, "-" * offset)
+        return EngineError("parse", message)
+
+    def accept(self, text):
+        kind, token, _ = self.peek()
+        if kind in ("op", "ident") and token.lower() == text:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, text):
+        if not self.accept(text):
+            raise self.error("'{0}'".format(text))
+
+    def identifier(self):
+        kind, text, _ = self.next()
+        if kind != "ident":
+            self.pos -= 1
+            raise self.error("identifier")
+        return text.strip("`")
+
+    def table_name(self):
+        name = self.identifier()
+        while self.accept("."):
+            name += "." + self.identifier()
+        return name
+
+    def at_end(self):
+        return self.peek()[0] == "end" or self.peek()[1] == ";" and self.pos == len(self.tokens) - 1
+
+    # types
+
+    def data_type(self):
+        name = self.identifier().lower()
+        if name not in sql_type_aliases:
+            raise EngineError("parse", "\nDataType {0} is not supported.(line 1, pos {1})".format(
+                name, self.peek()[2]))
+        name = sql_type_aliases[name]
+        if name in ("decimal", "char", "varchar"):
+            args = []
+            if self.accept("("):
+                args.append(int(self.next()[1]))
+                if self.accept(","):
+                    args.append(int(self.next()[1]))
+                self.expect(")")
+            if name == "decimal":
+                precision, scale = (args + [10, 0][len(args):])[:2] if args else (10, 0)
+                if precision > max_decimal_precision or scale > precision:
+                    raise EngineError("analysis", "Decimal scale ({0}) cannot be greater than precision ({1}).".format(
+                        scale, precision))
+                return ("decimal", precision, scale)
+            if not args:
+                return ("string",)
+            return (name, args[0])
+        if name == "array":
+            self.expect("<")
+            element = self.data_type()
+            self.expect(">")
+            return ("array", element)
+        if name == "map":
+            self.expect("<")
+            key = self.data_type()
+            self.expect(",")
+            value = self.data_type()
+            self.expect(">")
+            return ("map", key, value)
+        if name == "struct":
+            self.expect("<")
+            fields = []
+            while True:
+                field = self.identifier()
+                self.expect(":")
+                fields.append((field, self.data_type()))
+                if not self.accept(","):
+                    break
+            self.expect(">")
+            return ("struct", tuple(fields))
+        return (name,)
+
+    # expressions
+
+    def expression(self):
+        left = self.term()
+        while self.peek()[1] in ("+", "-") and self.peek()[0] == "op":
+            operator = self.next()[1]
+            left = self.arithmetic(operator, left, self.term())
+        return left
+
+    def term(self):
+        left = self.unary()
+        while self.peek()[1] in ("*", "/", "%") and self.peek()[0] == "op":
+            operator = self.next()[1]
+            left = self.arithmetic(operator, left, self.unary())
+        return left
+
+    def unary(self):
+        if self.peek()[0] == "op" and self.peek()[1] in ("-", "+"):
+            operator = self.next()[1]
+            data_type, value = self.unary()
+            if operator == "+" or value is None:
+                return data_type, value
+            if data_type[0] == "interval":
+                return data_type, (-value[0], -value[1])
+            if not is_numeric(data_type):
+                raise EngineError("analysis", "cannot resolve '(- {0})' due to data type mismatch".format(
+                    render_value(value, data_type, "cli")))
+            if data_type[0] in integral_bits:
+                return data_type, wrap_integral(-value, integral_bits[data_type[0]])
+            return data_type, -value
+        return self.primary()
+
+    def arithmetic(self, operator, left, right):
+        (left_type, left_value), (right_type, right_value) = left, right
+        if "interval" in (left_type[0], right_type[0]) and operator in ("+", "-"):
+            if left_type[0] == "interval":
+                left_type, left_value, right_type, right_value = right_type, right_value, left_type, left_value
+            if left_type[0] in string_types:
+                left_type, left_value = ("timestamp",), cast_value(left_value, left_type, ("timestamp",))
+            if left_type[0] not in datetime_types:
+                raise EngineError("analysis", "cannot resolve '{0} {1} INTERVAL' due to data type mismatch".format(
+                    type_str(left_type), operator))
+            if left_value is None or right_value is None:
+                return left_type, None
+            interval = right_value if operator == "+" else (-right_value[0], -right_value[1])
+            return left_type, add_interval(left_value, interval)
+        for data_type in (left_type, right_type):
+            if data_type[0] in string_types and not self.hive:
+                # implicit cast of strings to double, like Spark's non-ANSI type coercion
+                continue
+            if not is_numeric(data_type) and data_type[0] != "void":
+                raise EngineError("analysis", "cannot resolve '({0} {1} {2})' due to data type mismatch: differing "
+                                  "types in '({0} {1} {2})' ({3} and {4}).".format(
+                                      render_value(left_value, left_type, "cli"), operator,
+                                      render_value(right_value, right_type, "cli"), type_str(left_type),
+                                      type_str(right_type)))
+        if left_type[0] in string_types:
+            left_type, left_value = ("double",), cast_value(left_value, left_type, ("double",))
+        if right_type[0] in string_types:
+            right_type, right_value = ("double",), cast_value(right_value, right_type, ("double",))
+        result_type = self.result_type(operator, left_type, right_type)
+        if left_value is None or right_value is None:
+            return result_type, None
+        name = result_type[0]
+        if name in fractional_types:
+            left_value, right_value = float(left_value), float(right_value)
+            if operator == "/" and right_value == 0:
+                return result_type, None
+            result = {"+": lambda: left_value + right_value, "-": lambda: left_value - right_value,
+                      "*": lambda: left_value * right_value, "/": lambda: left_value / right_value,
+                      "%": lambda: math.fmod(left_value, right_value) if right_value else None}[operator]()
+            return result_type, to_float32(result) if name == "float" and result is not None else result
+        if name == "decimal":
+            left_value, right_value = Decimal(left_value), Decimal(right_value)
+            if operator in ("/", "%") and right_value == 0:
+                return result_type, None
+            result = {"+": left_value + right_value, "-": left_value - right_value,
+                      "*": left_value * right_value}.get(operator)
+            if result is None:
+                result = left_value / right_value if operator == "/" else left_value % right_value
+            return result_type, fit_decimal(result, result_type[1], result_type[2])
+        if operator == "%" and right_value == 0:
+            return result_type, None
+        result = {"+": lambda: left_value + right_value, "-": lambda: left_value - right_value,
+                  "*": lambda: left_value * right_value,
+                  "%": lambda: int(math.fmod(left_value, right_value))}[operator]()
+        return result_type, wrap_integral(result, integral_bits[name])
+
+    def result_type(self, operator, left_type, right_type):
+        names = {left_type[0], right_type[0]} - {"void"}
+        if not names:
+            return ("double",) if operator == "/" else ("int",)
+        if names & fractional_types:
+            return ("double",) if "double" in names or names - {"float"} else ("float",)
+        if operator == "/" and not "decimal" in names:
+            return ("double",)
+        if "decimal" in names:
+            left = left_type if left_type[0] == "decimal" else decimal_type_for_integral(left_type)
+            right = right_type if right_type[0] == "decimal" else decimal_type_for_integral(right_type)
+            if operator == "*":
+                precision, scale = left[1] + right[1] + 1, left[2] + right[2]
+            elif operator == "/":
+                scale = max(6, left[2] + right[1] + 1)
+                precision = left[1] - left[2] + right[2] + scale
+            else:
+                scale = max(left[2], right[2])
+                precision = max(left[1] - left[2], right[1] - right[2]) + scale + 1
+            if precision > max_decimal_precision:
+                scale = max(min(scale, 6), scale - (precision - max_decimal_precision))
+                precision = max_decimal_precision
+            return ("decimal", precision, scale)
+        return max((left_type, right_type), key=lambda t: integral_bits.get(t[0], 32))
+
+    def primary(self):
+        kind, text, offset = self.next()
+        if kind == "num":
+            return self.number_literal(text)
+        if kind == "str":
+            value = parse_sql_string(text)
+            # adjacent string literals are concatenated
+            while self.peek()[0] == "str":
+                value += parse_sql_string(self.next()[1])
+            return ("string",), value
+        if kind == "op" and text == "(":
+            if self.peek_word() == "select":
+                raise self.error()
+            values = [self.expression()]
+            while self.accept(","):
+                values.append(self.expression())
+            self.expect(")")
+            if len(values) == 1:
+                return values[0]
+            return (("struct", tuple(("col{0}".format(i + 1), t) for i, (t, _) in enumerate(values))),
+                    Struct(("col{0}".format(i + 1), v) for i, (_, v) in enumerate(values)))
+        if kind != "ident":
+            self.pos -= 1
+            raise self.error("expression")
+        word = text.lower()
+        if word == "null":
+            return ("void",), None
+        if word in ("true", "false"):
+            return ("boolean",), word == "true"
+        if word == "interval":
+            return self.interval_literal()
+        if word in ("timestamp", "date", "x") and self.peek()[0] == "str":
+            literal = parse_sql_string(self.next()[1])
+            if word == "x":
+                try:
+                    return ("binary",), bytes.fromhex(literal if len(literal) % 2 == 0 else "0" + literal)
+                except ValueError:
+                    raise EngineError("parse", "contains illegal character for hexBinary: {0}".format(literal))
+            value = parse_timestamp(literal) if word == "timestamp" else parse_date(literal)
+            if value is None:
+                raise EngineError("parse", "Cannot parse the {0} value: {1}".format(word.upper(), literal))
+            return (word,), value
+        if self.accept("("):
+            return self.function(word, offset)
+        if text.strip("`") in self.columns:
+            return self.columns[text.strip("`")]
+        raise EngineError("analysis", "cannot resolve '{0}' given input columns: [{1}]; line 1 pos {2};".format(
+            text, ", ".join(self.columns), offset))
+
+    def number_literal(self, text):
+        suffix = re.search(r"(?i)(BD|[YSLD])$", text)
+        body = text[:suffix.start()] if suffix else text
+        suffix = suffix.group(1).upper() if suffix else ""
+        if suffix in ("Y", "S", "L"):
+            name = {"Y": "tinyint", "S": "smallint", "L": "bigint"}[suffix]
+            if not re.match(r"^\d+$", body):
+                raise EngineError("parse", "Invalid numeric literal: {0}".format(text))
+            value = int(body)
+            if not fits_integral(value, integral_bits[name]) and value != 1 << (integral_bits[name] - 1):
+                raise EngineError("parse", "Numeric literal {0} does not fit in range [{1}, {2}] for type {3}".format(
+                    body, -(1 << (integral_bits[name] - 1)), (1 << (integral_bits[name] - 1)) - 1, name))
+            return (name,), value
+        if suffix == "D" or re.search(r"[eE]", body):
+            return ("double",), float(body)
+        if suffix == "BD" or "." in body:
+            if self.hive and suffix != "BD":
+                return ("double",), float(body)
+            value = Decimal(body)
+            data_type = decimal_type_of(value)
+            if data_type[1] > max_decimal_precision:
+                return ("double",), float(body)
+            return data_type, value
+        value = int(body)
+        for name in ("int", "bigint"):
+            # the minimum of a type is a literal of the wider type negated
+            if value <= (1 << (integral_bits[name] - 1)) - 1:
+                return (name,), value
+        data_type = decimal_type_of(Decimal(value))
+        if data_type[1] > max_decimal_precision:
+            raise EngineError("parse", "Numeric literal {0} is out of range".format(text))
+        return data_type, Decimal(value)
+
+    def interval_literal(self):
+        kind = self.peek()[0]
+        if kind == "str":
+            literal = parse_sql_string(self.next()[1])
+        elif kind == "num":
+            literal = self.next()[1]
+        else:
+            raise self.error("interval value")
+        units = ["year", "month", "week", "day", "hour", "minute", "second", "millisecond", "microsecond"]
+        from_unit = self.peek_word()
+        from_unit = from_unit.rstrip("s") if from_unit and from_unit.rstrip("s") in units else None
+        if from_unit is None:
+            if kind == "num":
+                raise self.error("interval unit")
+            return ("interval",), parse_interval(literal, hive=self.hive)
+        self.pos += 1
+        to_unit = None
+        if self.peek_word() == "to":
+            self.pos += 1
+            to_unit = self.identifier().lower().rstrip("s")
+        interval = parse_interval(literal, from_unit, to_unit, self.hive)
+        # Spark reads "INTERVAL 1 second 2 seconds" as one interval
+        while not self.hive and to_unit is None and self.peek()[0] == "num" and \
+                (self.peek_word(1) or "").rstrip("s") in units:
+            number = self.next()[1]
+            more = parse_interval(number + " " + self.identifier())
+            interval = (interval[0] + more[0], interval[1] + more[1])
+        return ("interval",), interval
+
+    def arguments(self):
+        arguments = []
+        if not self.accept(")"):
+            arguments.append(self.expression())
+            while self.accept(","):
+                arguments.append(self.expression())
+            self.expect(")")
+        return arguments
+
+    def function(self, name, offset):
+        if name == "cast":
+            data_type, value = self.expression()
+            self.expect("as")
+            to_type = self.data_type()
+            self.expect(")")
+            if to_type[0] in ("char", "varchar") and not self.hive:
+                # Spark treats CHAR/VARCHAR as STRING outside of table schemas
+                to_type = ("string",)
+            return to_type, cast_value(value, data_type, to_type, self.hive)
+        if name == "extract":
+            raise EngineError("analysis", "Literals of type 'EPOCH' are currently not supported.")
+        arguments = self.arguments()
+        if name in ("pi", "e") and not arguments:
+            return ("double",), math.pi if name == "pi" else math.e
+        if name in sql_type_aliases and name not in ("array", "map", "struct", "char", "varchar") and \
+                len(arguments) == 1:
+            to_type = ("decimal", 10, 0) if sql_type_aliases[name] == "decimal" else (sql_type_aliases[name],)
+            (data_type, value), = arguments
+            return to_type, cast_value(value, data_type, to_type, self.hive)
+        if name == "array":
+            element_type = common_type([t for t, _ in arguments])
+            return ("array", element_type), [cast_value(v, t, element_type, self.hive) for t, v in arguments]
+        if name == "map":
+            if len(arguments) % 2:
+                raise EngineError("analysis", "cannot resolve 'map(...)' due to data type mismatch: map expects a "
+                                  "positive even number of arguments.")
+            key_type = common_type([t for t, _ in arguments[::2]])
+            value_type = common_type([t for t, _ in arguments[1::2]])
+            return ("map", key_type, value_type), {
+                cast_value(k, kt, key_type, self.hive): cast_value(v, vt, value_type, self.hive)
+                for (kt, k), (vt, v) in zip(arguments[::2], arguments[1::2])}
+        if name == "named_struct":
+            names = [v for _, v in arguments[::2]]
+            return (("struct", tuple(zip(names, [t for t, _ in arguments[1::2]]))),
+                    Struct(zip(names, [v for _, v in arguments[1::2]])))
+        if name == "struct":
+            names = ["col{0}".format(i + 1) for i in range(len(arguments))]
+            return (("struct", tuple(zip(names, [t for t, _ in arguments]))),
+                    Struct(zip(names, [v for _, v in arguments])))
+        if name == "concat":
+            if any(v is None for _, v in arguments):
+                return ("string",), None
+            return ("string",), "".join(cast_value(v, t, ("string",)) for t, v in arguments)
+        if name == "coalesce":
+            for data_type, value in arguments:
+                if value is not None:
+                    return data_type, value
+            return arguments[0][0] if arguments else ("void",), None
+        if name == "base64" and len(arguments) == 1:
+            (data_type, value), = arguments
+            return ("string",), None if value is None else base64.b64encode(
+                cast_value(value, data_type, ("binary",))).decode("ascii")
+        if name == "to_json" and len(arguments) == 1:
+            (data_type, value), = arguments
+            return ("string",), None if value is None else render_value(value, data_type, "json", True)
+        raise EngineError("analysis", "Undefined function: '{0}'. This function is neither a registered temporary "
+                          "function nor a permanent function registered in the database 'default'.; line 1 pos "
+                          "{1}".format(name, offset))
+
+
+def decimal_type_for_integral(data_type):
+    return ("decimal", {"tinyint": 3, "smallint": 5, "int": 10, "bigint": 20}.get(data_type[0], 10), 0)
+
+
+def common_type(types):
+    # the type the elements of an array / the keys or values of a map are widened to
+    types = [t for t in types if t[0] != "void"]
+    if not types:
+        return ("void",)
+    if all(t == types[0] for t in types):
+        return types[0]
+    if all(is_numeric(t) for t in types):
+        if any(t[0] in fractional_types for t in types):
+            return ("double",)
+        if any(t[0] == "decimal" for t in types):
+            return max((t if t[0] == "decimal" else decimal_type_for_integral(t) for t in types), key=lambda t: t[1])
+        return max(types, key=lambda t: integral_bits[t[0]])
+    if all(t[0] in string_types for t in types):
+        return ("string",)
+    raise EngineError("analysis", "cannot resolve due to data type mismatch: input to function should all be the "
+                      "same type, but it's [{0}]".format(", ".join(type_str(t) for t in types)))
+
+
+class SqlEngine:
+    '''
+    Runs SQL / HQL statements against the table store. run returns (column types, rows) for queries and None for
+    other statements; errors are raised as EngineError.
+    '''
+
+    def __init__(self, store, hive=False):
+        self.store = store
+        self.hive = hive
+        self.settings = dict()
+
+    def run(self, statement):
+        parser = SqlParser(statement, self.hive)
+        word = parser.peek_word()
+        if word == "select" or parser.peek()[1] == "(":
+            return self.query(parser)
+        if word == "drop":
+            parser.next()
+            if parser.accept("database"):
+                if_exists = parser.accept("if") and parser.accept("exists")
+                database = parser.identifier()
+                if database.lower() == default_database:
+                    raise EngineError("analysis", "Can not drop default database")
+                if not self.store.database_exists(database):
+                    if if_exists:
+                        return None
+                    raise EngineError("analysis", "Database '{0}' not found".format(database),
+                                      "org.apache.spark.sql.catalyst.analysis.NoSuchDatabaseException")
+                self.store.drop_database(database, parser.accept("cascade"))
+                return None
+            parser.expect("table")
+            if_exists = parser.accept("if") and parser.accept("exists")
+            table_name = parser.table_name()
+            if not if_exists and self.store.get_schema(table_name) is None:
+                raise self.table_not_found(table_name, 21)
+            self.store.drop_table(table_name)
+            return None
+        if word == "create":
+            parser.next()
+            if parser.accept("database"):
+                if_not_exists = parser.accept("if") and parser.accept("not") and parser.accept("exists")
+                database = parser.identifier()
+                if self.store.database_exists(database) and not if_not_exists:
+                    raise EngineError("analysis", "Database '{0}' already exists".format(database),
+                                      "org.apache.spark.sql.catalyst.analysis.DatabaseAlreadyExistsException")
+                self.store.create_database(database)
+                return None
+            parser.expect("table")
+            if_not_exists = parser.accept("if") and parser.accept("not") and parser.accept("exists")
+            table_name = parser.table_name()
+            parser.expect("(")
+            columns = []
+            while True:
+                columns.append((parser.identifier().lower(), parser.data_type()))
+                if not parser.accept(","):
+                    break
+            parser.expect(")")
+            format_type = "textfile" if self.hive else "parquet"
+            if parser.accept("stored"):
+                parser.expect("as")
+                format_type = parser.identifier().lower()
+            elif parser.accept("using"):
+                format_type = parser.identifier().lower()
+            self.store.create_table(table_name, columns, format_type, if_not_exists)
+            return None
+        if word == "insert":
+            inserts = [self.insert_target(parser)]
+            parser.expect("select")
+            inserts[0].append(self.select_rows(parser))
+            self.write_inserts(inserts)
+            return None
+        if word == "from":
+            # Spark's multi-insert: from (select 1) dual insert into t select ... insert into t select ...
+            parser.next()
+            parser.expect("(")
+            source = self.query_rows(parser)
+            parser.expect(")")
+            parser.identifier()
+            inserts = []
+            while parser.peek_word() == "insert":
+                target = self.insert_target(parser)
+                parser.expect("select")
+                target.append(self.select_rows(parser, source))
+                inserts.append(target)
+            if not inserts:
+                raise parser.error("'INSERT'")
+            self.write_inserts(inserts)
+            return None
+        if word == "set":
+            key, _, value = statement.strip().rstrip(";")[len("set"):].strip().partition("=")
+            self.settings[key.strip()] = value.strip()
+            return None
+        if word == "use":
+            parser.next()
+            self.store.use_database(parser.identifier())
+            return None
+        if word == "refresh":
+            return None
+        raise parser.error("{'ADD', 'ALTER', 'ANALYZE', 'CACHE', 'CLEAR', 'COMMENT', 'COMMIT', 'CREATE', 'DELETE', "
+                           "'DESC', 'DESCRIBE', 'DROP', 'EXPLAIN', 'FROM', 'INSERT', 'SELECT', 'SET', 'SHOW', 'USE', "
+                           "'WITH'}")
+
+    def table_not_found(self, table_name, pos):
+        if self.hive:
+            return EngineError("analysis", "[Error 10001]: Line 1:{0} Table not found '{1}'".format(pos, table_name))
+        return EngineError("analysis", "Table or view not found: {0}; line 1 pos {1};\n'UnresolvedRelation [{0}], "
+                                       "[], false\n".format(table_name, pos))
+
+    def insert_target(self, parser):
+        parser.expect("insert")
+        overwrite = parser.accept("overwrite")
+        if not overwrite:
+            parser.expect("into")
+        parser.accept("table")
+        pos = parser.peek()[2]
+        table_name = parser.table_name()
+        schema = self.store.get_schema(table_name)
+        if schema is None:
+            raise self.table_not_found(table_name, pos)
+        return [table_name, schema, overwrite]
+
+    def write_inserts(self, inserts):
+        # every insert is checked before any is written, a failing multi-insert writes nothing
+        writes = []
+        for table_name, schema, overwrite, (types, rows) in inserts:
+            columns = schema["columns"]
+            if len(types) != len(columns):
+                if self.hive:
+                    raise EngineError("analysis", "[Error 10044]: Line 1:12 Cannot insert into target table because "
+                                                  "column number/types are different '{0}'".format(table_name))
+                raise EngineError("analysis", "Cannot write to '{0}', not enough data columns; target table has {1} "
+                                              "column(s) but the inserted data has {2} column(s)".format(
+                                                  table_name, len(columns), len(types)))
+            stored = [[store_value(v, t, c, self.hive) for v, t, (_, c) in zip(row, types, columns)] for row in rows]
+            writes.append((table_name, stored, overwrite))
+        for table_name, rows, overwrite in writes:
+            self.store.write_rows(table_name, rows, overwrite)
+
+    def query(self, parser):
+        types, rows = self.query_rows(parser)
+        if not parser.at_end():
+            raise parser.error()
+        return types, rows
+
+    def query_rows(self, parser):
+        # select ... [union all select ...]
+        parser.expect("select")
+        types, rows = self.select_rows(parser)
+        while parser.accept("union"):
+            parser.accept("all")
+            parser.expect("select")
+            more_types, more_rows = self.select_rows(parser)
+            if len(more_types) != len(types):
+                raise EngineError("analysis", "Union can only be performed on tables with the same number of columns")
+            rows += more_rows
+        return types, rows
+
+    def select_rows(self, parser, source=None):
+        '''
+        The select list after "select", evaluated against the rows of its FROM (or of source, for multi-inserts):
+        (column types, rows). The select list is parsed again for every row.
+        '''
+        start = parser.pos
+        depth = 0
+        while parser.peek()[0] != "end":
+            kind, text, _ = parser.peek()
+            if kind == "op" and text == "(":
+                depth += 1
+            elif kind == "op" and text == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif depth == 0 and (kind == "ident" and text.lower() in ("from", "union", "insert")
+                                 or kind == "op" and text == ";"):
+                break
+            parser.pos += 1
+        end = parser.pos
+        if parser.accept("from"):
+            if parser.accept("("):
+                source = self.query_rows(parser)
+                parser.expect(")")
+                parser.identifier()
+            else:
+                pos = parser.peek()[2]
+                table_name = parser.table_name()
+                schema = self.store.get_schema(table_name)
+                if schema is None:
+                    raise self.table_not_found(table_name, pos)
+                source = ([t for _, t in schema["columns"]],
+                          [list(r) for r in self.store.read_rows(table_name)], [n for n, _ in schema["columns"]])
+        if start == end:
+            raise parser.error("expression")
+        if source is None:
+            source = ([], [[]])
+        source_types, source_rows = source[0], source[1]
+        names = source[2] if len(source) > 2 else ["col{0}".format(i + 1) for i in range(len(source_types))]
+        after = parser.pos
+        types, rows = None, []
+        for source_row in source_rows:
+            parser.columns = {n: (t, v) for n, t, v in zip(names, source_types, source_row)}
+            parser.pos = start
+            if parser.peek()[1] == "*" and parser.pos + 1 == end:
+                row = list(zip(source_types, source_row))
+                parser.pos = end
+            else:
+                row = [parser.expression()]
+                while parser.accept(","):
+                    row.append(parser.expression())
+                if parser.pos != end:
+                    raise parser.error()
+            types = types or [t for t, _ in row]
+            rows.append([v for _, v in row])
+        parser.pos = after
+        if types is None:
+            # no rows: the select list is only checked
+            types = list(source_types) if parser.tokens[start][1] == "*" else [("string",)] * 2
+        return types, rows
+
+
+class ScalaEngine:
+    '''
+    The spark-shell statements of the generated DataFrame scripts: spark.sql(...), RDDs of Rows, StructType schemas,
+    DataFrames, the intervals withColumn adds to them (to every row, or per row with when / otherwise) and their
+    show / saveAsTable.
+    '''
+
+    def __init__(self, store):
+        self.store = store
+        self.sql = SqlEngine(store)
+        self.values = dict()
+        self.result_count = 0
+        self.rdd_count = 0
+
+    def next_result(self):
+        name = "res{0}".format(self.result_count)
+        self.result_count += 1
+        return name
+
+    def run(self, line):
+        '''
+        The output of a line of the REPL, as a list of lines.
+        '''
+        for kind, regex in scala_statement_regexes:
+            match = regex.match(line)
+            if match is not None:
+                return getattr(self, "run_" + kind)(*match.groups())
+        if line.startswith(":quit"):
+            raise EOFError()
+        raise scala_compile_error(line, "not found: value {0}".format(re.match(r"^\W*(\w*)", line).group(1) or
+                                                                      line.split()[0]))
+
+    def run_import(self, imported):
+        return ["import " + imported]
+
+    def run_sql(self, statement, suffix):
+        statement = statement.replace('\\"', '"').replace("\\\\", "\\")
+        result = self.sql.run(statement)
+        types, rows = result if result is not None else ([], [])
+        json_rows = scala_json_rows_suffix_regex.match(suffix)
+        if json_rows is not None:
+            return ["csi_row:" + self.json_row(types, row, json_rows.group("cast") is not None) for row in rows]
+        if scala_show_suffix_regex.match(suffix):
+            return show_table(["c{0}".format(i) for i in range(len(types))] if types else [], types, rows)
+        if suffix:
+            raise scala_compile_error(suffix, "value {0} is not a member of org.apache.spark.sql.DataFrame".format(
+                suffix.lstrip(".").split("(")[0]))
+        return ["{0}: org.apache.spark.sql.DataFrame = [{1}]".format(self.next_result(), ", ".join(
+            "c{0}: {1}".format(i, type_str(t)) for i, t in enumerate(types)))]
+
+    @staticmethod
+    def json_row(types, row, cast=True):
+        fields = ['"c0":' + render_value(row[0], types[0], "json", True)]
+        if row[1] is not None and cast:
+            fields.append('"c1":' + render_value(cast_value(row[1], types[1], ("string",)), ("string",), "json", True))
+        elif row[1] is not None:
+            fields.append('"c1":' + render_value(row[1], types[1], "json", True))
+        return "{" + ",".join(fields) + "}"
+
+    def run_rdd(self, name, body):
+        if not body.startswith("Seq(") or not body.endswith(")"):
+            raise scala_compile_error(body, "type mismatch")
+        rows = ScalaParser(scala_local_cast_regex.sub(r"__\2(\1)", body[len("Seq("):-1]), self.values).row_list()
+        self.rdd_count += 1
+        self.values[name] = ("rdd", rows)
+        return ["{0}: org.apache.spark.rdd.RDD[org.apache.spark.sql.Row] = ParallelCollectionRDD[{1}] at "
+                "parallelize at <console>:27".format(name, self.rdd_count)]
+
+    def run_schema(self, name, adds):
+        fields = []
+        for field_name, field_type in re.findall(r'\.add\(StructField\("(\w+)", (.*?), (?:true|false)\)\)', adds):
+            fields.append((field_name, parse_scala_type(field_type, adds)))
+        self.values[name] = ("schema", fields)
+        return ["{0}: org.apache.spark.sql.types.StructType = StructType({1})".format(name, ", ".join(
+            "StructField({0},{1},true)".format(n, scala_type_str(t)) for n, t in fields))]
+
+    def get_value(self, name, kind, line):
+        if name not in self.values:
+            raise scala_compile_error(line, "not found: value {0}".format(name))
+        value_kind, value = self.values[name]
+        if value_kind != kind:
+            raise scala_compile_error(line, "type mismatch;\n found   : {0}\n required: {1}".format(value_kind, kind))
+        return value
+
+    def run_create_df(self, name, rdd_name, schema_name):
+        line = "val {0} = spark.createDataFrame({1}, {2})".format(name, rdd_name, schema_name)
+        rows = self.get_value(rdd_name, "rdd", line)
+        fields = self.get_value(schema_name, "schema", line)
+        self.values[name] = ("df", (fields, rows, []))
+        return [df_description(name, fields)]
+
+    def run_with_column(self, name, df_name, column, body):
+        line = "val {0} = {1}.withColumn(...)".format(name, df_name)
+        fields, rows, operations = self.get_value(df_name, "df", line)
+        match = scala_interval_regex.match(body)
+        if match is not None:
+            branches = [(None,) + match.groups()]
+        else:
+            match = scala_when_regex.match(body)
+            if match is None or match.group(2) != column:
+                raise scala_compile_error(body, "type mismatch;\n found   : String\n required: "
+                                                "org.apache.spark.sql.Column")
+            branches = [((condition, int(value)),) + tuple(rest) for condition, value, *rest in
+                        scala_when_branch_regex.findall(match.group(1))]
+        column_types = dict(fields)
+        when, result_type = [], None
+        for condition, expression_column, operator, expression, cast_type in branches:
+            if expression_column != column or (condition is not None and condition[0] not in column_types):
+                raise EngineError("analysis", "cannot resolve '{0}' given input columns: [{1}]".format(
+                    condition[0] if expression_column == column else expression_column, ", ".join(column_types)),
+                                  "org.apache.spark.sql.AnalysisException")
+            data_type, interval = SqlParser(expression).expression()
+            if data_type[0] != "interval":
+                raise EngineError("analysis", "cannot resolve '(c1 {0} {1})' due to data type mismatch".format(
+                    operator, expression), "org.apache.spark.sql.AnalysisException")
+            if column_types.get(column, ("void",))[0] not in datetime_types:
+                raise EngineError("analysis", "cannot resolve '({0} + {1})' due to data type mismatch: argument 1 "
+                                              "requires timestamp type".format(column, expression),
+                                  "org.apache.spark.sql.AnalysisException")
+            if operator == "-":
+                interval = (-interval[0], -interval[1])
+            if cast_type:
+                cast_type = parse_scala_type(cast_type, line)
+                result_type = result_type or cast_type
+            when.append((condition, interval, cast_type or None))
+        self.values[name] = ("df", (fields, rows, operations + [(column, when, result_type)]))
+        if result_type is not None:
+            fields = [(n, result_type if n == column else t) for n, t in fields]
+        return [df_description(name, fields)]
+
+    def collect(self, df_name, line):
+        # encodes the rows of the DataFrame with its schema, as an action (show, save) does
+        fields, rows, operations = self.get_value(df_name, "df", line)
+        encoded = [[encode_external(v, t) for v, (_, t) in zip(row, fields)] for row in rows]
+        names = [n for n, _ in fields]
+        for column, when, result_type in operations:
+            index = names.index(column)
+            data_type = fields[index][1]
+            for row in encoded:
+                # the first branch whose condition holds, the rows of none (otherwise) keep their value
+                branch = next(((interval, cast_type) for condition, interval, cast_type in when
+                               if condition is None or row[names.index(condition[0])] == condition[1]), None)
+                if row[index] is None:
+                    continue
+                if branch is not None:
+                    row[index] = add_interval(row[index], branch[0])
+                cast_type = branch[1] if branch is not None else None
+                if cast_type is not None or result_type is not None:
+                    row[index] = cast_value(row[index], data_type, cast_type or result_type)
+            if result_type is not None:
+                fields = fields[:index] + [(column, result_type)] + fields[index + 1:]
+        return fields, encoded
+
+    def run_show(self, df_name):
+        fields, rows = self.collect(df_name, "{0}.show(false)".format(df_name))
+        return show_table([n for n, _ in fields], [t for _, t in fields], rows)
+
+    def run_save(self, df_name, mode, format_type, table_name):
+        fields, rows = self.collect(df_name, "{0}.write.saveAsTable(...)".format(df_name))
+        for value, (_, data_type) in zip(rows[0] if rows else [], fields):
+            if data_type[0] in ("char", "varchar") and value is not None and len(value) > data_type[1]:
+                raise EngineError("runtime", "Exceeds char/varchar type length limitation: {0}".format(data_type[1]),
+                                  "java.lang.RuntimeException")
+        schema = self.store.get_schema(table_name)
+        if mode == "overwrite" or schema is None:
+            self.store.drop_table(table_name)
+            self.store.create_table(table_name, [(n, t) for n, t in fields], format_type)
+            self.store.write_rows(table_name, rows, overwrite=True)
+        elif mode == "append":
+            self.store.write_rows(table_name, rows)
+        else:
+            raise EngineError("analysis", "Table `{0}` already exists.".format(table_name),
+                              "org.apache.spark.sql.AnalysisException")
+        return []
+
+    def run_println(self, literal):
+        return [ScalaParser(literal, self.values).expression()[1]]
+
+    def run_refresh(self, table_name):
+        return ["{0}: scala.util.Try[Unit] = Success(())".format(self.next_result())]
+
+
+def df_description(name, fields):
+    return "{0}: org.apache.spark.sql.DataFrame = [{1}]".format(name, ", ".join(
+        "{0}: {1}".format(n, type_str(t)) for n, t in fields))
+
+
+def show_table(names, types, rows):
+    '''
+    Dataset.show(false): every cell left-aligned, at least 3 characters wide.
+    '''
+    cells = [[render_value(v, t, "show") for v, t in zip(row, types)] for row in rows]
+    widths = [max([3, len(n)] + [len(r[i]) for r in cells]) for i, n in enumerate(names)]
+    border = "+" + "+".join("-" * w for w in widths) + "+"
+    lines = [border, "|" + "|".join(n.ljust(w) for n, w in zip(names, widths)) + "|", border]
+    lines += ["|" + "|".join(c.ljust(w) for c, w in zip(row, widths)) + "|" for row in cells]
+    lines += [border, ""]
+    return lines
+
+
+def parse_scala_type(text, line):
+    parser = ScalaParser(text, dict())
+    data_type = parser.scala_type()
+    if parser.peek()[0] != "end":
+        raise scala_compile_error(line, "')' expected but '{0}' found.".format(parser.peek()[1]))
+    return data_type
+
+
+def scala_type_str(data_type):
+    names = {v: k for k, v in scala_type_names.items()}
+    name = data_type[0]
+    if name == "decimal":
+        return "DecimalType({0},{1})".format(data_type[1], data_type[2])
+    if name in ("char", "varchar"):
+        return "{0}({1})".format(names[name], data_type[1])
+    if name == "array":
+        return "ArrayType({0},true)".format(scala_type_str(data_type[1]))
+    if name == "map":
+        return "MapType({0},{1},true)".format(scala_type_str(data_type[1]), scala_type_str(data_type[2]))
+    return names.get(name, "NullType")
+
+
+def jvm_class(value):
+    return None if value is None else value[0]
+
+
+def encode_external(value, data_type):
+    '''
+    The value a DataFrame column holds for a JVM value of a Row, or the RuntimeException Spark's encoder throws.
+    '''
+    if value is None:
+        return None
+    jvm_type, python_value = value
+    name = data_type[0]
+    valid = jvm_type in external_types.get(name, [])
+    if name == "map":
+        valid = jvm_type.startswith("scala.collection.immutable.") and "Map" in jvm_type
+    elif name == "array":
+        valid = jvm_type.startswith("[") or jvm_type.startswith("scala.collection.")
+    if not valid:
+        raise EngineError("runtime", "Error while encoding: java.lang.RuntimeException: {0} is not a valid external "
+                                     "type for schema of {1}".format(jvm_type, type_str(data_type)),
+                          "java.lang.RuntimeException")
+    if name == "map":
+        return {encode_external(k, data_type[1]): encode_external(v, data_type[2]) for k, v in python_value.items()}
+    if name == "array":
+        return [encode_external(v, data_type[1]) for v in python_value]
+    if name == "decimal":
+        fitted = fit_decimal(python_value, data_type[1], data_type[2])
+        if fitted is None:
+            raise EngineError("runtime", "Error while encoding: java.lang.ArithmeticException: Decimal precision {0} "
+                                         "exceeds max precision {1}".format(decimal_type_of(python_value)[1],
+                                                                             data_type[1]),
+                              "java.lang.RuntimeException")
+        return fitted
+    return python_value
+
+
+class ScalaParser:
+    '''
+    Evaluates the Scala values of the DataFrame scripts to (JVM class, value).
+    '''
+
+    def __init__(self, text, values):
+        self.text = text
+        self.values = values
+        self.tokens = []
+        for match in scala_token_regex.finditer(text):
+            if match.lastgroup == "unclosed":
+                raise scala_compile_error(text, "unclosed string literal")
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        self.pos = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("end", "<EOF>")
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def accept(self, text):
+        if self.peek()[1] == text and self.peek()[0] != "str":
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, text):
+        if not self.accept(text):
+            kind, found = self.peek()
+            raise scala_compile_error(self.text, "'{0}' expected but {1} found.".format(
+                text, {"ident": "identifier", "num": "integer literal", "str": "string literal",
+                       "end": "eof"}.get(kind, "'{0}'".format(found))))
+
+    def arguments(self):
+        self.expect("(")
+        arguments = []
+        if not self.accept(")"):
+            arguments.append(self.expression())
+            while self.accept(","):
+                arguments.append(self.expression())
+            self.expect(")")
+        return arguments
+
+    def row_list(self):
+        rows = []
+        while True:
+            if self.next() != ("ident", "Row"):
+                raise scala_compile_error(self.text, "type mismatch;\n found   : Any\n required: org.apache.spark."
+                                                     "sql.Row")
+            rows.append(self.arguments())
+            if not self.accept(","):
+                break
+        if self.peek()[0] != "end":
+            raise scala_compile_error(self.text, "')' expected but {0} found.".format(
+                "identifier" if self.peek()[0] == "ident" else "'{0}'".format(self.peek()[1])))
+        return rows
+
+    def scala_type(self):
+        name = self.next()[1]
+        if name not in scala_type_names:
+            raise scala_compile_error(self.text, "not found: value {0}".format(name))
+        data_type = scala_type_names[name]
+        if data_type in ("decimal", "char", "varchar"):
+            arguments = [int(v) for _, v in self.arguments()]
+            return (data_type, *arguments) if data_type != "decimal" or len(arguments) == 2 else ("decimal", 10, 0)
+        if data_type == "array":
+            self.expect("(")
+            element = self.scala_type()
+            if self.accept(","):
+                self.next()
+            self.expect(")")
+            return ("array", element)
+        if data_type == "map":
+            self.expect("(")
+            key = self.scala_type()
+            self.expect(",")
+            value = self.scala_type()
+            if self.accept(","):
+                self.next()
+            self.expect(")")
+            return ("map", key, value)
+        return (data_type,)
+
+    def expression(self):
+        left = self.term()
+        while self.peek()[1] in ("+", "-") and self.peek()[0] == "op":
+            left = self.arithmetic(self.next()[1], left, self.term())
+        return left
+
+    def term(self):
+        left = self.unary()
+        while self.peek()[1] in ("*", "/", "%") and self.peek()[0] == "op":
+            left = self.arithmetic(self.next()[1], left, self.unary())
+        return left
+
+    def unary(self):
+        if self.accept("-"):
+            jvm_type, value = self.unary()
+            if jvm_type == "java.lang.Integer":
+                return jvm_type, wrap_integral(-value, 32)
+            if jvm_type in ("java.lang.Long", "java.lang.Double", "java.lang.Float"):
+                return jvm_type, -value
+            raise scala_compile_error(self.text, "value unary_- is not a member of {0}".format(jvm_type))
+        return self.postfix(self.primary())
+
+    def arithmetic(self, operator, left, right):
+        order = ["java.lang.Integer", "java.lang.Long", "java.lang.Float", "java.lang.Double"]
+        if left[0] not in order or right[0] not in order:
+            raise scala_compile_error(self.text, "value {0} is not a member of {1}".format(operator, left[0]))
+        jvm_type = order[max(order.index(left[0]), order.index(right[0]))]
+        if jvm_type in ("java.lang.Integer", "java.lang.Long"):
+            if operator in ("/", "%") and right[1] == 0:
+                raise EngineError("runtime", "/ by zero", "java.lang.ArithmeticException")
+            result = {"+": lambda a, b: a + b, "-": lambda a, b: a - b, "*": lambda a, b: a * b,
+                      "/": lambda a, b: int(a / b), "%": lambda a, b: int(math.fmod(a, b))}[operator](left[1], right[1])
+            return jvm_type, wrap_integral(result, 32 if jvm_type == "java.lang.Integer" else 64)
+        a, b = float(left[1]), float(right[1])
+        if operator == "/":
+            result = a / b if b else (math.nan if a == 0 or math.isnan(a) else math.copysign(math.inf, a) *
+                                      math.copysign(1, b))
+        else:
+            result = {"+": a + b, "-": a - b, "*": a * b, "%": math.fmod(a, b) if b else math.nan}[operator]
+        return jvm_type, to_float32(result) if jvm_type == "java.lang.Float" else result
+
+    def primary(self):
+        kind, text = self.next()
+        if kind == "num":
+            return self.number_literal(text)
+        if kind == "str":
+            return "java.lang.String", parse_scala_string(text)
+        if text == "(":
+            value = self.expression()
+            self.expect(")")
+            return value
+        if kind != "ident":
+            raise scala_compile_error(self.text, "illegal start of simple expression")
+        if text in ("true", "false"):
+            return "java.lang.Boolean", text == "true"
+        if text == "null":
+            return None
+        if text == "math" and self.accept("."):
+            constant = self.next()[1]
+            if constant not in ("Pi", "E"):
+                raise scala_compile_error(self.text, "value {0} is not a member of object math".format(constant))
+            return "java.lang.Double", math.pi if constant == "Pi" else math.e
+        if text == "Map":
+            return self.map_literal()
+        if text in ("Float", "Double") and self.accept("."):
+            constant = self.next()[1]
+            values = {"PositiveInfinity": math.inf, "NegativeInfinity": -math.inf, "NaN": math.nan,
+                      "MaxValue": 3.4028234663852886e38 if text == "Float" else sys.float_info.max,
+                      "MinPositiveValue": 1.401298464324817e-45 if text == "Float" else 5e-324}
+            if constant not in values:
+                raise scala_compile_error(self.text, "value {0} is not a member of object {1}".format(constant, text))
+            return "java.lang." + text, values[constant]
+        if text in ("Array", "Seq", "BigInt", "BigDecimal", "__to_timestamp", "__to_date"):
+            arguments = self.arguments()
+            return getattr(self, "call_" + text.lstrip("_"))(arguments)
+        if text == "java" and self.peek()[1] == ".":
+            path = text
+            while self.accept("."):
+                path += "." + self.next()[1]
+            if path in ("java.sql.Timestamp.valueOf", "java.sql.Date.valueOf"):
+                argument, = self.arguments()
+                return self.value_of(path, argument)
+            raise scala_compile_error(self.text, "object {0} is not a member of package java".format(path))
+        raise scala_compile_error(self.text, "not found: value {0}".format(text))
+
+    def number_literal(self, text):
+        suffix = text[-1].upper() if text[-1] in "LlFfDd" else ""
+        body = text[:-1] if suffix else text
+        if suffix in ("F", "D") or "." in body or "e" in body.lower():
+            value = float(body)
+            return ("java.lang.Float", to_float32(value)) if suffix == "F" else ("java.lang.Double", value)
+        value = int(body)
+        if suffix == "L":
+            if value > (1 << 63):
+                raise scala_compile_error(self.text, "integer number too large")
+            return "java.lang.Long", value
+        if value > (1 << 31):
+            raise scala_compile_error(self.text, "integer number too large")
+        return "java.lang.Integer", value
+
+    def postfix(self, value):
+        while self.peek()[1] == "." and self.peek(1)[0] == "ident":
+            self.pos += 1
+            method = self.next()[1]
+            if self.peek()[1] == "(" and self.peek(1)[1] == ")":
+                self.pos += 2
+            value = self.method(value, method)
+        return value
+
+    def method(self, value, method):
+        jvm_type = jvm_class(value)
+        if jvm_type == "java.lang.String" and method in ("toByte", "toShort", "toInt", "toLong"):
+            text = value[1]
+            bits = {"toByte": 8, "toShort": 16, "toInt": 32, "toLong": 64}[method]
+            if not java_integer_regex.match(text):
+                raise EngineError("runtime", 'For input string: "{0}"'.format(text),
+                                  "java.lang.NumberFormatException")
+            number = int(text)
+            if not fits_integral(number, bits):
+                message = 'Value out of range. Value:"{0}" Radix:10'.format(text) if bits < 32 else \
+                    'For input string: "{0}"'.format(text)
+                raise EngineError("runtime", message, "java.lang.NumberFormatException")
+            return {8: "java.lang.Byte", 16: "java.lang.Short", 32: "java.lang.Integer", 64: "java.lang.Long"}[bits], \
+                number
+        if jvm_type == "java.lang.String" and method in ("toFloat", "toDouble"):
+            text = value[1]
+            if not java_double_regex.match(text):
+                raise EngineError("runtime", 'For input string: "{0}"'.format(text),
+                                  "java.lang.NumberFormatException")
+            number = float(text.strip().rstrip("fFdD").replace("Infinity", "inf"))
+            return ("java.lang.Float", to_float32(number)) if method == "toFloat" else ("java.lang.Double", number)
+        if jvm_type == "scala.math.BigInt":
+            if method == "toByteArray":
+                number = value[1]
+                length = max(1, (number + (number < 0)).bit_length() // 8 + 1)
+                return "[B", number.to_bytes(length, "big", signed=True)
+            bits = {"toByte": 8, "toShort": 16, "toInt": 32, "toLong": 64}.get(method)
+            if bits is not None:
+                return {8: "java.lang.Byte", 16: "java.lang.Short", 32: "java.lang.Integer",
+                        64: "java.lang.Long"}[bits], wrap_integral(value[1], bits)
+        method = {"byteValue": "toByte", "shortValue": "toShort", "intValue": "toInt", "longValue": "toLong",
+                  "floatValue": "toFloat", "doubleValue": "toDouble"}.get(method, method)
+        if jvm_type in ("java.lang.Integer", "java.lang.Long", "java.lang.Float", "java.lang.Double") and \
+                method in ("toByte", "toShort", "toInt", "toLong", "toFloat", "toDouble"):
+            number = value[1]
+            if method in ("toFloat", "toDouble"):
+                return ("java.lang.Float", to_float32(float(number))) if method == "toFloat" else \
+                    ("java.lang.Double", float(number))
+            bits = {"toByte": 8, "toShort": 16, "toInt": 32, "toLong": 64}[method]
+            if isinstance(number, float):
+                number = 0 if math.isnan(number) else int(max(min(number, 2 ** 63 - 1), -2 ** 63))
+            return {8: "java.lang.Byte", 16: "java.lang.Short", 32: "java.lang.Integer",
+                    64: "java.lang.Long"}[bits], wrap_integral(number, bits)
+        raise scala_compile_error(self.text, "value {0} is not a member of {1}".format(method, jvm_type))
+
+    def map_literal(self):
+        # Map(k -> v, ...), the class of Scala's immutable maps depends on their size
+        self.expect("(")
+        pairs = dict()
+        if not self.accept(")"):
+            while True:
+                key = self.expression()
+                self.expect("->")
+                pairs[key] = self.expression()
+                if not self.accept(","):
+                    break
+            self.expect(")")
+        jvm_type = "scala.collection.immutable.Map$Map{0}".format(len(pairs)) if len(pairs) <= 4 else \
+            "scala.collection.immutable.HashMap$HashTrieMap"
+        return jvm_type, pairs
+
+    def call_Array(self, arguments):
+        classes = {jvm_class(v) for v in arguments}
+        primitive = {"java.lang.Double": "[D", "java.lang.Integer": "[I", "java.lang.Long": "[J",
+                     "java.lang.Float": "[F"}
+        if len(classes) == 1 and classes.issubset(primitive):
+            return primitive[classes.pop()], arguments
+        if len(classes) == 1 and next(iter(classes), "").startswith("["):
+            return "[" + classes.pop(), arguments
+        return "[Ljava.lang.Object;", arguments
+
+    def call_Seq(self, arguments):
+        return "scala.collection.immutable.$colon$colon", arguments
+
+    def call_BigInt(self, arguments):
+        text = self.string_argument("BigInt", arguments)
+        if not java_integer_regex.match(text):
+            raise EngineError("runtime", 'For input string: "{0}"'.format(text) if text else
+                              "Zero length BigInteger", "java.lang.NumberFormatException")
+        return "scala.math.BigInt", int(text)
+
+    def call_BigDecimal(self, arguments):
+        if len(arguments) == 1 and jvm_class(arguments[0]) in ("java.lang.Double", "java.lang.Integer",
+                                                               "java.lang.Long"):
+            return "scala.math.BigDecimal", Decimal(repr(arguments[0][1]))
+        text = self.string_argument("BigDecimal", arguments)
+        if not sql_number_regex.match(text) or text != text.strip():
+            bad = next((c for c in text if not (c.isdigit() or c in ".eE+-")), text[:1])
+            raise EngineError("runtime", 'Character {0} is neither a decimal digit number, decimal point, nor "e" '
+                                         'notation exponential mark.'.format(bad), "java.lang.NumberFormatException")
+        return "scala.math.BigDecimal", Decimal(text)
+
+    def call_to_timestamp(self, arguments):
+        value = parse_timestamp(self.string_argument("to_timestamp", arguments))
+        return None if value is None else ("java.sql.Timestamp", value)
+
+    def call_to_date(self, arguments):
+        value = parse_date(self.string_argument("to_date", arguments))
+        return None if value is None else ("java.sql.Date", value)
+
+    def value_of(self, path, argument):
+        text = jvm_class(argument) == "java.lang.String" and argument[1]
+        if path.endswith("Timestamp.valueOf"):
+            match = java_timestamp_regex.match(text or "")
+            value = parse_timestamp(text) if match else None
+            if value is None:
+                raise EngineError("runtime", "Timestamp format must be yyyy-mm-dd hh:mm:ss[.fffffffff]",
+                                  "java.lang.IllegalArgumentException")
+            return "java.sql.Timestamp", value
+        value = parse_date(text) if re.match(r"^\d{4}-\d{1,2}-\d{1,2}$", text or "") else None
+        if value is None:
+            raise EngineError("runtime", "", "java.lang.IllegalArgumentException")
+        return "java.sql.Date", value
+
+    def string_argument(self, function, arguments):
+        if len(arguments) != 1 or jvm_class(arguments[0]) != "java.lang.String":
+            raise scala_compile_error(self.text, "overloaded method value apply with alternatives ... cannot be "
+                                                 "applied to ({0})".format(", ".join(str(jvm_class(a))
+                                                                                      for a in arguments)))
+        return arguments[0][1]
+
+
+def parse_scala_string(token):
+    escapes = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "\\": "\\", '"': '"', "'": "'"}
+    return re.sub(r"\\(u[0-9a-fA-F]{4}|.)", lambda m: chr(int(m.group(1)[1:], 16)) if m.group(1)[0] == "u" and
+                  len(m.group(1)) == 5 else escapes.get(m.group(1), m.group(1)), token[1:-1])
+
+
+def scala_compile_error(line, message):
+    return EngineError("compile", "<console>:23: error: {0}\n       {1}\n       ^".format(message, line))
+
+
+def timestamp_prefix():
+    return time.strftime("%y/%m/%d %H:%M:%S")
+
+
+def format_seconds(seconds):
+    return "{0:.3f}".format(seconds).rstrip("0").rstrip(".") if seconds >= 0.001 else "0.0"
+
+
+def split_statements(command):
+    statements, quote, escaped, start = [], None, False, 0
+    for i, char in enumerate(command):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif quote is not None:
+            quote = None if char == quote else quote
+        elif char in ("'", '"'):
+            quote = char
+        elif char == ";":
+            statements.append(command[start:i])
+            start = i + 1
+    statements.append(command[start:])
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+class Cli:
+    '''
+    The REPL loop shared by the three CLIs: reads statements from stdin, echoes them after the prompt and prints
+    their output. Output is flushed after every statement, for spark_session.py.
+    '''
+
+    prompt = None
+    continuation_prompt = None
+    # statements matching it never finish, see --stall_pattern
+    stall_regex = None
+
+    def __init__(self, store, statement_latency=0.0):
+        self.store = store
+        self.statement_latency = statement_latency
+        self.out = sys.stdout
+
+    def write(self, lines):
+        for line in lines:
+            self.out.write(line + "\n")
+
+    def commands(self, infile):
+        '''
+        Yields (statements, text) per command. Like the CLIs, lines are collected until one ends with ';', and the
+        command is then split at the ';' outside of quotes, an unclosed quote running to the end of the command.
+        '''
+        buffer = ""
+        for line in infile:
+            buffer += line
+            if line.strip().endswith(";"):
+                yield split_statements(buffer), buffer
+                buffer = ""
+        if buffer.strip():
+            yield None, buffer
+
+    def main(self, infile):
+        self.startup()
+        for statements, text in self.commands(infile):
+            lines = text.strip("\n").split("\n")
+            self.out.write("{0} {1}\n".format(self.prompt, lines[0]))
+            for line in lines[1:]:
+                self.out.write("{0} {1}\n".format(self.continuation_prompt, line))
+            if statements is None:
+                break
+            for statement in statements:
+                if statement.lower() in ("quit", "exit"):
+                    self.out.flush()
+                    return
+                if self.stall_regex is not None and self.stall_regex.search(statement):
+                    self.out.flush()
+                    while True:
+                        time.sleep(60)
+                start = time.time()
+                if self.statement_latency:
+                    time.sleep(self.statement_latency)
+                self.run_statement(statement, start)
+            self.out.flush()
+        self.out.write(self.prompt + " \n")
+        self.out.flush()
+
+    def startup(self):
+        for noise in startup_noise:
+            sys.stderr.write("{0} {1}\n".format(timestamp_prefix(), noise))
+        sys.stderr.flush()
+
+
+class SparkSqlCli(Cli):
+    prompt = "spark-sql>"
+    continuation_prompt = "         >"
+
+    def __init__(self, store, statement_latency=0.0):
+        super().__init__(store, statement_latency)
+        self.engine = SqlEngine(store)
+
+    def run_statement(self, statement, start):
+        if not statement:
+            return
+        try:
+            result = self.engine.run(statement)
+        except EngineError as e:
+            if e.kind == "runtime":
+                self.write(["{0} ERROR SparkSQLDriver: Failed in [{1}]".format(timestamp_prefix(), statement),
+                            "{0}: {1}".format(e.exception, e.message)] + stack_trace["spark"])
+            else:
+                self.write(["Error in query: " + e.message])
+            return
+        if result is None:
+            self.write(["Time taken: {0} seconds".format(format_seconds(time.time() - start))])
+            return
+        types, rows = result
+        self.write(["\t".join(render_value(v, t, "cli") for v, t in zip(row, types)) for row in rows])
+        self.write(["Time taken: {0} seconds, Fetched {1} row(s)".format(format_seconds(time.time() - start),
+                                                                          len(rows))])
+
+
+class HiveCli(Cli):
+    prompt = "hive>"
+    continuation_prompt = "    >"
+
+    def __init__(self, store, statement_latency=0.0):
+        super().__init__(store, statement_latency)
+        self.engine = SqlEngine(store, hive=True)
+
+    def run_statement(self, statement, start):
+        if not statement:
+            return
+        try:
+            result = self.engine.run(statement)
+        except EngineError as e:
+            kind = {"parse": "ParseException", "analysis": "SemanticException"}.get(e.kind)
+            if kind is None:
+                self.write(["{0}: {1}".format(e.exception, e.message),
+                            "FAILED: Execution Error, return code 2 from org.apache.hadoop.hive.ql.exec.mr.MapRedTask"])
+            else:
+                self.write(["FAILED: {0} {1}".format(kind, e.message.strip())])
+            return
+        if statement.lower().startswith("set "):
+            return
+        self.write(["OK"])
+        if result is None:
+            self.write(["Time taken: {0} seconds".format(format_seconds(time.time() - start))])
+            return
+        types, rows = result
+        self.write(["\t".join(render_value(v, t, "cli") for v, t in zip(row, types)) for row in rows])
+        self.write(["Time taken: {0} seconds, Fetched: {1} row(s)".format(format_seconds(time.time() - start),
+                                                                           len(rows))])
+
+
+class SparkShellCli(Cli):
+    prompt = "scala>"
+    continuation_prompt = "     |"
+
+    def __init__(self, store, statement_latency=0.0):
+        super().__init__(store, statement_latency)
+        self.engine = ScalaEngine(store)
+
+    def commands(self, infile):
+        # one statement per line
+        for line in infile:
+            if line.strip():
+                yield [line.strip()], line
+
+    def startup(self):
+        super().startup()
+        self.write(["Spark context Web UI available at http://localhost:4040",
+                    "Spark context available as 'sc' (master = local[*], app id = local-0).",
+                    "Spark session available as 'spark'.",
+                    "Welcome to Spark version {0} (fake engine)".format(fake_version), ""])
+
+    def main(self, infile):
+        try:
+            super().main(infile)
+        except EOFError:
+            self.out.flush()
+
+    def run_statement(self, statement, start):
+        try:
+            self.write(self.engine.run(statement))
+        except EngineError as e:
+            if e.kind == "compile":
+                self.write([e.message])
+            elif e.kind == "analysis" or e.kind == "parse":
+                exception = e.exception or ("org.apache.spark.sql.catalyst.parser.ParseException" if e.kind == "parse"
+                                            else "org.apache.spark.sql.AnalysisException")
+                self.write(["{0}: {1}".format(exception, e.message)] + stack_trace["scala"])
+            else:
+                self.write(["{0}: {1}".format(e.exception, e.message)] + stack_trace["scala"])
+        self.write([""])
+
+
+def parse_confs(arguments):
+    '''
+    --conf key=value and --hiveconf key=value of a command line; other options and their values are ignored.
+    '''
+    confs = dict()
+    for option, value in zip(arguments, arguments[1:] + [None]):
+        if option in ("--conf", "--hiveconf") and value is not None:
+            key, _, conf_value = value.partition("=")
+            confs[key] = conf_value
+    return confs
+
+
+def resolve_packages(home, packages, ivy_dir):
+    # what Ivy leaves in <spark.jars.ivy>/jars for --packages group:artifact:version,... (one empty jar per package)
+    jars_dir = os.path.join(ivy_dir or os.path.join(home, "ivy2"), "jars")
+    os.makedirs(jars_dir, exist_ok=True)
+    for package in packages.split(","):
+        group, artifact, version = package.split(":")
+        open(os.path.join(jars_dir, "{0}_{1}-{2}.jar".format(group, artifact, version)), "a").close()
+
+
+def get_local_path(home, path):
+    # file://<path> is <path>, the HDFS warehouse (hdfs://<namenode>/user/hive/warehouse/...) is <home>/warehouse/...
+    path = re.sub(r"^(?:file://|hdfs://[^/]*)", "", path)
+    if path == hdfs_warehouse_dir or path.startswith(hdfs_warehouse_dir + "/"):
+        return os.path.join(home, "warehouse") + path[len(hdfs_warehouse_dir):]
+    return path
+
+
+def get_store(home, confs):
+    warehouse_dir = get_local_path(home, confs.get("spark.sql.warehouse.dir", ""))
+    connection_url = confs.get("spark.hadoop.javax.jdo.option.ConnectionURL", "")
+    match = re.search(r"databaseName=([^;]+)", connection_url)
+    return TableStore(match.group(1) if match else os.path.join(home, "metastore_db"),
+                      warehouse_dir or os.path.join(home, "warehouse"))
+
+
+def metastore_reachable(uri):
+    match = re.match(r"^thrift://([^:]+):(\d+)$", uri)
+    if match is None:
+        return True
+    try:
+        socket.create_connection((match.group(1), int(match.group(2))), timeout=5).close()
+        return True
+    except OSError:
+        return False
+
+
+def run_metastore(port):
+    # accepts and closes connections, which is all hive_metastore_is_up in run_experiments.py checks
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("localhost", port))
+    server.listen(16)
+    print("Starting Hive Metastore Server on port {0}".format(port), flush=True)
+    while True:
+        connection, _ = server.accept()
+        connection.close()
+
+
+def run_hadoop(home, arguments):
+    '''
+    hadoop fs -rm [-r] <path> ..., for the paths under /user/hive/warehouse.
+    '''
+    if arguments[:2] != ["fs", "-rm"]:
+        sys.stderr.write("fake hadoop only supports fs -rm\n")
+        return 1
+    status = 0
+    for path in arguments[2:]:
+        if path.startswith("-"):
+            continue
+        matches = sorted(glob.glob(get_local_path(home, path)))
+        if not matches:
+            sys.stderr.write("rm: `{0}': No such file or directory\n".format(path))
+            status = 1
+        for match in matches:
+            if os.path.isdir(match):
+                shutil.rmtree(match)
+            else:
+                os.remove(match)
+            print("Deleted {0}".format(os.path.join(hdfs_warehouse_dir, os.path.relpath(
+                match, os.path.join(home, "warehouse")))))
+    return status
+
+
+def install(home, statement_latency, stall_pattern=None):
+    home = os.path.abspath(home)
+    options = ["--statement_latency", str(statement_latency)]
+    if stall_pattern:
+        options += ["--stall_pattern", stall_pattern]
+    for launcher, system in launchers.items():
+        path = os.path.join(home, launcher)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as outfile:
+            outfile.write(launcher_template.format(script=os.path.join(script_dir, "fake_engine.py"), home=home,
+                                                   options=shlex.join(options), system=system))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    # what result_cache.py reads as the engine versions, and the jar value_gen.py puts on Spark's class path
+    with open(os.path.join(home, "spark", "RELEASE"), "w") as outfile:
+        outfile.write("Spark {0} (fake engine)\n".format(fake_version))
+    os.makedirs(os.path.join(home, "spark", "jars"), exist_ok=True)
+    os.makedirs(os.path.join(home, "hive", "lib"), exist_ok=True)
+    open(os.path.join(home, "hive", "lib", hive_exec_jar), "a").close()
+    os.makedirs(os.path.join(home, "warehouse"), exist_ok=True)
+    print("export SPARK_HOME_E2E={0} SPARK_HOME_ONEWAY={0} HIVE_HOME={1} HADOOP_HOME={2}".format(
+        os.path.join(home, "spark"), os.path.join(home, "hive"), os.path.join(home, "hadoop")))
+
+
+def main(args, arguments):
+    confs = parse_confs(arguments)
+    if args.system == "hadoop":
+        return run_hadoop(args.home, arguments)
+    if args.system == "spark-submit":
+        sys.stderr.write("The fake engine cannot run compiled applications (--df_app)\n")
+        return 1
+    if args.system == "hive":
+        if "--service" in arguments:
+            run_metastore(int(confs.get("hive.metastore.port", default_metastore_port)))
+            return 0
+        uri = confs.get("hive.metastore.uris", "")
+        if uri and not metastore_reachable(uri):
+            print("Exception in thread \"main\" java.lang.RuntimeException: org.apache.hadoop.hive.ql.metadata."
+                  "HiveException: java.lang.RuntimeException: Unable to instantiate org.apache.hadoop.hive.ql."
+                  "metadata.SessionHiveMetaStoreClient")
+            return 1
+        cli_class = HiveCli
+    else:
+        if "--packages" in arguments[:-1]:
+            resolve_packages(args.home, arguments[arguments.index("--packages") + 1], confs.get("spark.jars.ivy"))
+        cli_class = SparkSqlCli if args.system == "spark-sql" else SparkShellCli
+    cli = cli_class(get_store(args.home, confs), args.statement_latency)
+    if args.stall_pattern:
+        cli.stall_regex = re.compile(args.stall_pattern)
+    cli.main(sys.stdin)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--home', type=str, help="the directory given to install")
+    parser.add_argument('--statement_latency', type=float, default=0.0,
+                        help="seconds every statement takes on top of its interpretation")
+    parser.add_argument('--stall_pattern', type=str, metavar='REGEX', help="statements that hang the CLI")
+    parser.add_argument('system', choices=["install"] + sorted(set(launchers.values())))
+    parser.add_argument('arguments', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.system == "install":
+        if len(args.arguments) != 1:
+            parser.error("install <home>")
+        install(args.arguments[0], args.statement_latency, args.stall_pattern)
+    elif args.home is None:
+        parser.error("--home is required")
+    else:
+        sys.exit(main(args, args.arguments))
@@ -1,33 +1,178 @@
+'''
+Extracts the tables printed in a spark-sql / spark-shell / Hive CLI log.
+
+python3 get_tables.py <log> <table> <system> [--rt], e.g. python3 get_tables.py logs/…/log_w_sql_orc logs/…/t_w_sql_orc spark-sql --rt
+python3 get_tables.py --log_dir <log_dir> [--workers N] [--combined t_combined.json] extracts every log_* of a run at once,
+the system and --rt are inferred from the log names, e.g. log_w_df_orc is a spark-shell write (--rt) and
+log_w_df_r_hql_orc a Hive read.
+
+Read scripts generated with value_gen.py --json_rows print every row as one line "csi_row:{"c0":0,"c1":...}". Those
+lines are copied to the table as the JSON object, whatever the system, and parse_json_row turns them back into
+(row, value) for the oracle.
+'''
+
 import argparse
+import base64
+import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+interface_system_dict = {"sql": "spark-sql", "df": "scala", "hql": "hive"}
+# log_w_<write interface>_<format> or log_w_<write interface>_r_<read interface>_<format>
+log_file_regex = re.compile(r"^log_w_(sql|df|hql)(?:_r_(sql|df|hql))?_([a-z]+)$")
+
+statement_regex = re.compile(r"select |\.show\(")
+# statements whose output is a table, for write logs (--rt) and read logs
+table_statement_regex = {True: re.compile(r"df|select \("), False: re.compile(r"select \*|\.show\(")}
+json_row_split_regex = re.compile('":|,"')
+row_id_split_regex = re.compile(r"[\t|]")
+# prefix of the rows printed by read scripts generated with value_gen.py --json_rows
+json_row_tag = "csi_row:"
+
+
+class JsonNumber(str):
+    '''
+    A number of a JSON row, kept as the text the engine printed (3.141592653589793E-305 stays as is).
+    '''
+
+
+def get_json_row(line):
+    '''
+    Hive has no to_json, its rows carry the value base64 encoded in c1_base64 (see value_gen.py), decode it here.
+    '''
+    record = line[len(json_row_tag):].rstrip("\n")
+    if '"c1_base64":' in record:
+        record = json.loads(record)
+        value = record.pop("c1_base64")
+        record["c1"] = None if value is None else base64.b64decode(value).decode("utf-8", errors="replace")
+        record = json.dumps(record, separators=(",", ":"))
+    return record + "\n"
+
+
+def json_value2str(value, nested=False):
+    '''
+    Renders a value of a JSON row the way the CLIs print it: strings as is at the top level, maps and arrays
+    as {"k":v} and [v1,v2].
+    '''
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, dict):
+        return "{" + ",".join(json_value2str(k, True) + ":" + json_value2str(v, True) for k, v in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + ",".join(json_value2str(v, True) for v in value) + "]"
+    if nested and not isinstance(value, JsonNumber):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def parse_json_row(line):
+    # to_json leaves out null fields, a missing c1 is a null value
+    record = json.loads(line, parse_float=JsonNumber, parse_int=JsonNumber, parse_constant=JsonNumber)
+    return str(record["c0"]), json_value2str(record.get("c1"))
+
+
+def get_ql_row(line):
+    if line[0].isdigit() and line.split("\t")[0].isdigit():
+        return line
+    if line[0] == '{':
+        w_line = '\t'.join([x for x in json_row_split_regex.split(line) if "col" not in x])
+        return w_line.replace("}", "").replace('"', "")
+    return None
 
-parser = argparse.ArgumentParser()
-parser.add_argument('input_file', type=str)
-parser.add_argument('output_file', type=str)
-parser.add_argument('--rt', action='store_true')
-parser.add_argument('system', type=str)
-args = parser.parse_args()
-args.system += ">"
 
-with open(args.input_file, 'r') as rf:
-    with open(args.output_file, 'w') as wf:
+def get_df_row(line):
+    if line[0] == "|" and line[1] != "c":
+        w_line = '\t'.join([x for x in line.split(' ') if x != ''])
+        return w_line[1:]
+    return None
+
+
+system_row_fn = {"spark-sql>": get_ql_row, "hive>": get_ql_row, "scala>": get_df_row}
+
+
+def extract_table(input_file, output_file, system, rt):
+    '''
+    Writes the rows of the tables in the log to the table file and returns them. A table starts at a statement
+    printing one (select / .show) and ends at the next prompt.
+    '''
+    prompt = system + ">"
+    get_row = system_row_fn[prompt]
+    table_start_regex = table_statement_regex[rt]
+    rows = []
+    with open(input_file, 'r') as rf:
         table = False
         for line in rf:
-            if "select " in line or ".show(false)" in line:
-                if ("df" in line or "select (" in line) and args.rt:
+            if line.startswith(json_row_tag):
+                rows.append(get_json_row(line))
+                continue
+            if statement_regex.search(line):
+                if table_start_regex.search(line):
                     table = True
-                elif ("select *" in line or ".show(false)" in line) and not args.rt:
-                    table = True
-            elif args.system in line:
+            elif prompt in line:
                 table = False
-            if args.system not in line and table:
-                if args.system in ["spark-sql>", "hive>"]:
-                    if line[0].isdigit() and line.split("\t")[0].isdigit():
-                        wf.write(line)
-                    elif line[0] == '{':
-                        w_line = '\t'.join([x for x in re.split('":|,"', line) if "col" not in x])
-                        wf.write(w_line.replace("}", "").replace('"', ""))
-                if args.system == "scala>":
-                    if line[0] == "|" and line[1] != "c":
-                        w_line = '\t'.join([x for x in line.split(' ') if x != ''])
-                        wf.write(w_line[1:])
+            if table and prompt not in line:
+                row = get_row(line)
+                if row is not None:
+                    rows.append(row)
+    with open(output_file, 'w') as wf:
+        wf.writelines(rows)
+    return rows
+
+
+def get_log_table(log_dir, log_file):
+    '''
+    Returns (log, table, system, rt) of a log of a run, None if it holds no table. The log need not exist yet.
+    '''
+    match = log_file_regex.match(log_file)
+    if match is None:
+        return None
+    write_interface, read_interface, _ = match.groups()
+    rt = read_interface is None
+    system = interface_system_dict[write_interface if rt else read_interface]
+    return os.path.join(log_dir, log_file), os.path.join(log_dir, "t_" + log_file[len("log_"):]), system, rt
+
+
+def get_log_tables(log_dir):
+    '''
+    Returns (log, table, system, rt) for every log of a run that holds a table.
+    '''
+    log_tables = [get_log_table(log_dir, log_file) for log_file in sorted(os.listdir(log_dir))]
+    return [log_table for log_table in log_tables if log_table is not None]
+
+
+def extract_log_dir(log_dir, workers=None, combined_file=None):
+    log_tables = get_log_tables(log_dir)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tables = list(executor.map(extract_table, *zip(*log_tables))) if log_tables else []
+    if combined_file is not None:
+        # {row: {table: row in that table}}
+        combined = dict()
+        for (_, table_file, _, _), rows in zip(log_tables, tables):
+            for row in rows:
+                row_id = parse_json_row(row)[0] if row.startswith("{") else row_id_split_regex.split(row, 1)[0].strip()
+                combined.setdefault(row_id, dict())[os.path.basename(table_file)] = row.rstrip("\n")
+        with open(os.path.join(log_dir, combined_file), 'w') as wf:
+            json.dump(combined, wf, indent=4)
+    return log_tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input_file', type=str, nargs='?')
+    parser.add_argument('output_file', type=str, nargs='?')
+    parser.add_argument('system', type=str, nargs='?')
+    parser.add_argument('--rt', action='store_true')
+    parser.add_argument('--log_dir', type=str)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--combined', type=str)
+    args = parser.parse_args()
+
+    if args.log_dir is not None:
+        extract_log_dir(args.log_dir, args.workers, args.combined)
+    elif args.system is None:
+        parser.error("either <input_file> <output_file> <system> or --log_dir is required")
+    else:
+        extract_table(args.input_file, args.output_file, args.system, args.rt)
@@ -2,43 +2,67 @@
 python3 inspect_result.py logs_dir (with \)
 e.g. python3 inspect_result.py logs/2022.04.16-15.36.49/ ss
 
+Rows whose statement was killed by step_watchdog.py are reported as timed out rather than as an exception, and
+only in <ifc>_timeouts.json, not in the error handling and write-read results. Likewise, in batched runs the rows of
+a multi-row insert that failed, which may have failed for another row of the batch, are reported as batch failed in
+<ifc>_batch_failures.json.
+
 python3 inspect_result.py logs/ss/ ss
 python3 inspect_result.py logs/hs/ hs
 python3 inspect_result.py logs/sh/ sh
+
+Runs split with value_gen.py --shards are checked shard by shard and merged into one report in <log_dir>:
+python3 inspect_result.py logs/merged/ ss --merge logs/shard0/ logs/shard1/
 '''
 
 import argparse, os, json
-import copy
+import bisect
 from collections import defaultdict
 import re
 
+import result_cache
+from canonical_value import canonicalize
+from get_tables import parse_json_row
+from step_watchdog import timeout_marker
+
 interface = "ss"
 table_prefix, hs_table_prefix, difft_prefix, eh_prefix, wr_prefix = "t_" , "t_r_", "difft_", "eh_", "wr_"
 # prefixed with: log_dir
-expected_table_file, original_table_file = "t_expected", "t_original.json"
+expected_table_file, original_table_file, batches_file = "t_expected", "t_original.json", "t_batches.json"
+shard_file = "t_shard.json"
 
 exception_line_patterns = ["error:", "Exception:", "InsertIntoStatement", "mismatched input", "safely cast", 
-"unresolvedalias", "Cannot", "Error parsing", "not supported", "Can only", "does not match", "Table not found", "illegal character"]
+"unresolvedalias", "Cannot", "Error parsing", "not supported", "Can only", "does not match", "Table not found", "illegal character",
+timeout_marker]
 interface_split_symbol_dict = {"sql": "\t", "df": "|", "hql": "\t"}
 interface_offset_dict = {"sql": None, "df": -1, "hql": None}
 no_output_place_holder = "No output"
+timed_out_place_holder = "timed out"
+batch_failed_place_holder = "batch failed"
 write_interfaces_dict = {"hs": ["hql"], "ss": ["sql", "df"], "sh": ["sql", "df"]}
 format_types = ["avro", "orc", "parquet"]
 
 
 convert_map = {"NULL": "null", "\t": " ", "\\\\": "\\"}
 
-equivalence_classes = [
-    {"NULL", "null"},
-    {"{-2147483648:{12831273.24:3.141592653589793E-305}}", "{-2147483648 -> {12831273.24 -> 3.141592653589793E-305}}", "{-2147483648:{\"12831273.24\":3.141592653589793E-305}}", "{-2147483648:{12831273.24 3.141592653589793E-305"},
-    {"{12831273.24:3.141592653589793E-305}", "{12831273.24 -> 3.141592653589793E-305}", "{\"12831273.24\":3.141592653589793E-305}", "{12831273.24 3.141592653589793E-305"},
-    {"[[3.141592653589793E-305], [3.141592653589793E-305, 3.142E-320]]", "[[3.141592653589793E-305],[3.141592653589793E-305,3.142E-320]]"},
-    {"^fo\\\\o$", "^fo\\o$"},
-    {"8.88888888888889E9", "8888888888.8888900000"}
-]
+exception_line_regex = re.compile("|".join(re.escape(pattern) for pattern in exception_line_patterns))
+# Statements in the logs that belong to a row (wsN, rddN, dfN) or to a batched table (wsbN), the leftmost match wins.
+# "stop" statements belong to neither and only end the search window of the statement before them.
+log_marker_regex = re.compile(
+    r"(?:from \(select 1\) dual insert into |insert into (?=wsb\d+ select \* from \())(?P<batch_insert>wsb\d+) |val rdd_(?P<batch_df_insert>wsb\d+) "
+    r"|from (?P<batch_select>wsb\d+);"
+    r"|insert into wsb\d+ select (?P<batch_row_insert>\d+), |insert into ws(?P<insert>\d+) |val rdd(?P<rdd>\d+) "
+    r"|df(?P<show>\d+)\.show|from ws(?P<select>\d+);|(?P<stop>drop table if exists |select \()")
+log_index_suffix = ".index.json"
+# "(write) log_w_sql_orc (line 12)"
+log_location_regex = re.compile(r"^\((?P<log_type>\w+)\) (?P<logfile>.+) \(line (?P<line>\d+)\)$")
 
 newlines_to_search = 30
 log_start_line = 1 # sql 880 / df 1382
+# row -> table it was written to, only set for batched runs (value_gen.py --batched)
+row_table_dict = dict()
+# logfile -> {statement key: [statement line, exception line, exception]}
+log_index_dict = dict()
 
 
 def _decode(o):
@@ -57,37 +81,104 @@ def _decode(o):
 
 def get_write_values(write_table_files):
     '''
-    "0": {
-        "sql":
-            {"avro": "null"}
-    }
+    {("0", "sql", "avro"): "null", ...}, a missing (row, write interface, format) has no output
     '''
-    write_val_dict = defaultdict(lambda: defaultdict(dict))
-    initial_dict = defaultdict(lambda: defaultdict(dict))
-
-    for write_interface in write_interfaces_dict[interface]:
-        initial_dict[write_interface] = {}
-        for format_type in format_types:
-            initial_dict[write_interface][format_type] = no_output_place_holder
-    for row in original_dict:
-        write_val_dict[row] = copy.deepcopy(initial_dict)
+    write_val_dict = dict()
     for table_file in write_table_files:
         _, _, write_interface, format_type = table_file.split("_")
-        split_symbol = interface_split_symbol_dict[write_interface]
         with open(log_dir + table_file, "r") as infile:
             content = infile.read().split('\n')
             for line in content:
                 if len(line) == 0:
                     break
-                row = line.split(split_symbol)[0].strip()
-                val = line[line.index(split_symbol)+1: interface_offset_dict[write_interface]].strip()
-                for key in convert_map:
-                    val = val.replace(key, convert_map[key])
-                write_val_dict[row][write_interface][format_type] = val
-    # print(json.dumps(write_val_dict, indent=4, separators=(',', ':')))
+                row, val = get_table_row(line, write_interface)
+                write_val_dict[(row, write_interface, format_type)] = val
     return write_val_dict
 
 
+class Observation:
+    '''
+    What was read back and written for one row through one (write interface, read interface, format). Kept as
+    a record for the analysis and turned into the JSON dict by to_dict only when the results are written.
+    '''
+    __slots__ = ("write_interface", "read_interface", "format_type", "read_value", "write_value", "log_location")
+
+    def __init__(self, write_interface, read_interface, format_type, read_value=no_output_place_holder,
+                 write_value=no_output_place_holder, log_location=None):
+        self.write_interface = write_interface
+        self.read_interface = read_interface
+        self.format_type = format_type
+        self.read_value = read_value
+        self.write_value = write_value
+        self.log_location = log_location
+
+    def to_dict(self):
+        observation = {
+            "write_interface": self.write_interface,
+            "read_interface": self.read_interface,
+            "format_type": self.format_type,
+            "read_value": self.read_value,
+            "write_value": self.write_value
+            }
+        if self.log_location is not None:
+            observation["log_location"] = self.log_location
+        return observation
+
+    @classmethod
+    def from_dict(cls, observation):
+        return cls(**observation)
+
+
+class TestResult:
+    __slots__ = ("observation", "passed")
+
+    def __init__(self, observation, passed):
+        self.observation = observation
+        self.passed = passed
+
+    def to_dict(self):
+        test_result = self.observation.to_dict()
+        test_result["pass"] = self.passed
+        return test_result
+
+
+def dump_results(results, outfile, compact_row=None):
+    '''
+    Writes the same as json.dump(results, outfile, indent=4, separators=(',', ':')), one row at a time, so records
+    are only turned into dicts while their row is written and the JSON text of a row is written with one call.
+    compact_row can rewrite the JSON text of each row.
+    '''
+    outfile.write("{")
+    for i, (row, row_results) in enumerate(results.items()):
+        row_json = json.dumps(row_results, indent=4, separators=(',', ':'), default=lambda record: record.to_dict())
+        row_json = row_json.replace("\n", "\n    ")
+        if compact_row is not None:
+            row_json = compact_row(row_json)
+        outfile.write("{0}\n    {1}:{2}".format("," if i else "", json.dumps(row), row_json))
+    outfile.write("\n}" if results else "}")
+
+
+def compact_difft_row(row_json):
+    # one line per test in the "output" lists
+    return row_json.replace('{\n                    "write_interface":"', '{"write_interface":"').replace('\n                    "read_interface":"','  "read_interface":"').replace('\n                    "format_type":"', ' "format_type":"').replace('\n                    "log_location":"', '  "log_location":"').replace('\n                }', '}')
+
+
+def get_table_row(line, table_interface):
+    '''
+    Returns (row, value) of a table line, either a JSON row (value_gen.py --json_rows) or a line scraped from the
+    CLI output of the table's interface.
+    '''
+    if line.startswith("{"):
+        row, val = parse_json_row(line)
+    else:
+        split_symbol = interface_split_symbol_dict[table_interface]
+        row = line.split(split_symbol)[0].strip()
+        val = line[line.index(split_symbol)+1: interface_offset_dict[table_interface]].strip()
+    for key in convert_map:
+        val = val.replace(key, convert_map[key])
+    return row, val
+
+
 def parse_table_filename(table_file):
     _, _, write_interface, _, read_interface, format_type = table_file.split("_")
     return write_interface, read_interface, format_type
@@ -99,99 +190,261 @@ def get_table_log_files(table_file):
     return w_log_filename, r_log_filename
 
 
-def analyze_input_behaviour_across_interfaces(test_inputs):
+def get_log_line_key(line):
+    '''
+    Returns the key of the statement starting at a log line: the row id, "<table>" for the select of a batched table,
+    "<table>/insert" for its multi-row insert, "" for statements that only end the previous one, None otherwise.
+    '''
+    match = log_marker_regex.search(line)
+    if match is None:
+        return None
+    if match.lastgroup == "stop":
+        return ""
+    if match.lastgroup in ("batch_insert", "batch_df_insert"):
+        return match.group(match.lastgroup) + "/insert"
+    return match.group(match.lastgroup)
+
+
+def build_log_index(logfile):
+    '''
+    Scans a log once and records for each statement key the first exception line within newlines_to_search lines
+    of one of its statements, before the statement of another key starts:
+    {"5": [12, 14, "Error in query: ..."], "wsb0/insert": [40, 41, "..."]}
+    '''
+    markers, exception_lines, exceptions = [], [], []
+    with open(log_dir + logfile, "r") as infile:
+        for i, line in enumerate(infile):
+            if i < log_start_line:
+                continue
+            key = get_log_line_key(line)
+            if key is not None:
+                markers.append((i, key))
+            if exception_line_regex.search(line):
+                exception_lines.append(i)
+                exceptions.append(line.strip())
+    log_index = dict()
+    window_end = float("inf")
+    for idx in range(len(markers) - 1, -1, -1):
+        i, key = markers[idx]
+        if idx + 1 < len(markers) and markers[idx + 1][1] != key:
+            window_end = markers[idx + 1][0]
+        if key == "":
+            continue
+        exception_idx = bisect.bisect_right(exception_lines, i)
+        if exception_idx < len(exception_lines) and exception_lines[exception_idx] < min(i + newlines_to_search, window_end):
+            # scanning backwards, so the earliest statement with an exception is written last
+            log_index[key] = [i, exception_lines[exception_idx], exceptions[exception_idx]]
+    return log_index
+
+
+def get_log_index(logfile):
+    '''
+    Returns the index of a log, reusing the sidecar <logfile>.index.json if the log has not changed since it was built.
+    '''
+    if logfile in log_index_dict:
+        return log_index_dict[logfile]
+    log_stat = os.stat(log_dir + logfile)
+    log_signature = [log_stat.st_size, log_stat.st_mtime_ns, newlines_to_search, log_start_line,
+                     log_marker_regex.pattern, exception_line_regex.pattern]
+    index_path = log_dir + logfile + log_index_suffix
+    log_index = None
+    if os.path.exists(index_path):
+        with open(index_path, "r") as infile:
+            sidecar = json.load(infile)
+        if sidecar["signature"] == log_signature:
+            log_index = sidecar["index"]
+    if log_index is None:
+        log_index = build_log_index(logfile)
+        with open(index_path, "w") as outfile:
+            json.dump({"signature": log_signature, "index": log_index}, outfile)
+    log_index_dict[logfile] = log_index
+    return log_index
+
+
+def find_row_exception(row, logfile):
+    '''
+    Returns (line index, exception, whether it is the exception of a multi-row insert) of the first exception
+    following a statement of the row in the log, or None. In batched runs rows share a table, so a row is also
+    attributed the exceptions of the select of its table and, if it was written by it, of the multi-row insert of
+    its table.
+    '''
+    log_index = get_log_index(logfile)
+    keys = [row]
+    if row in row_table_dict:
+        keys.append(row_table_dict[row])
+        if original_dict[row]["valid"]:
+            keys.append(row_table_dict[row] + "/insert")
+    found = [log_index[key] + [key] for key in keys if key in log_index]
+    if not found:
+        return None
+    _, exception_line, exception, key = min(found)
+    return exception_line, exception, key.endswith("/insert")
+
+
+def get_row_tables(log_dir):
+    with open(log_dir + batches_file, "r") as infile:
+        batches = json.load(infile)
+    return {str(row): table_name for table_name, rows in batches.items() for row in rows}
+
+
+def analyze_input_behaviour_across_interfaces(test_inputs, log_prefix=""):
     input_behaviour_across_interfaces = dict()
-    row_initial_dict = dict()
     write_val_dict = get_write_values(write_table_files)
-    for table_file in read_table_files:
-        write_interface, read_interface, format_type = parse_table_filename(table_file)
-        row_dict = {
-            "write_interface": write_interface,
-            "read_interface": read_interface,
-            "format_type": format_type,
-            "read_value": no_output_place_holder,
-            "write_value": no_output_place_holder
-            }
-        row_initial_dict[table_file] = row_dict
+    table_file_interfaces = {table_file: parse_table_filename(table_file) for table_file in read_table_files}
+
+    def get_row_observations(row):
+        observations = dict()
+        for table_file, (write_interface, read_interface, format_type) in table_file_interfaces.items():
+            write_value = write_val_dict.get((row, write_interface, format_type), no_output_place_holder)
+            observations[table_file] = Observation(write_interface, read_interface, format_type,
+                                                   write_value=write_value)
+        return observations
+
     # insert write values
     for row in test_inputs:
-        input_behaviour_across_interfaces[row] = copy.deepcopy(row_initial_dict)
-        for table_file in read_table_files:
-            write_interface, read_interface, format_type = parse_table_filename(table_file)
-            input_behaviour_across_interfaces[row][table_file]["write_value"] = write_val_dict[row][write_interface][format_type]
-    for table_file in read_table_files:
-        write_interface, read_interface, format_type = parse_table_filename(table_file)
-        split_symbol = interface_split_symbol_dict[read_interface]
+        input_behaviour_across_interfaces[row] = get_row_observations(row)
+    for table_file, (write_interface, read_interface, format_type) in table_file_interfaces.items():
         with open(log_dir + table_file, "r") as infile:
             content = infile.read().split('\n')
             for line in content:
                 if len(line) == 0:
                     break
-                row = line.split(split_symbol)[0].strip()
+                row, val = get_table_row(line, read_interface)
                 if row not in test_inputs:
                     # This is not a valid test input, currently we perform WR for ALL inputs
                     # in the spark_hive_oneway.sh & hive_spark_oneway.sh, this has to be changed
                     # there. Till then, we should make sure our oracle is smart enough to filter out
                     # unwanted inputs.
                     continue
-                val = line[line.index(split_symbol)+1: interface_offset_dict[read_interface]].strip()
-                for key in convert_map:
-                    val = val.replace(key, convert_map[key])
                 if row not in input_behaviour_across_interfaces:
-                    input_behaviour_across_interfaces[row] = copy.deepcopy(row_initial_dict)
-                input_behaviour_across_interfaces[row][table_file]["read_value"] = val
+                    input_behaviour_across_interfaces[row] = get_row_observations(row)
+                input_behaviour_across_interfaces[row][table_file].read_value = val
     # check exceptions
     for row, row_dict in input_behaviour_across_interfaces.items():
-        for table_file in row_dict:
-            w_log_filename, r_log_filename = get_table_log_files(table_file)            
-            file_type_dict = {w_log_filename: "write", r_log_filename: "read"}
-            for logfile in [w_log_filename, r_log_filename]:
-                target_value = f"{file_type_dict[logfile]}_value"
-                if no_output_place_holder in row_dict[table_file]["read_value"]:
-                    previous_line_patterns = [f"insert into ws{row} ", f"val rdd{row} ", f"df{row}.show", f"select * from ws{row};"]
-                    next_row_patterns = [f"insert into ws{int(row)+1} ", f"val rdd{int(row)+1} ", f"df{int(row)+1}.show", f"select * from ws{int(row)+1};"]
-                    found = False
-                    with open(log_dir + logfile, "r") as infile:
-                        lines = infile.readlines()
-                        stopFlag = False
-                        for i in range(log_start_line, len(lines)):
-                            if any(pattern in lines[i] for pattern in previous_line_patterns):
-                                j = i + 1
-                                while j < len(lines) and j < i + newlines_to_search and not found and not any(pattern in lines[j] for pattern in next_row_patterns):
-                                    if any (exception in lines[j] for exception in exception_line_patterns):
-                                        found = True
-                                        row_dict[table_file][target_value] += ", find exception: {}".format(lines[j].strip())
-                                        row_dict[table_file]["log_location"] = "({}) {} (line {})".format(file_type_dict[logfile], logfile, j+1)
-                                        break
-                                    j += 1
-                            if stopFlag:
-                                break
-    with open(log_dir + interface + "_ungrouped_results.json", "w") as outfile:
-        json.dump(input_behaviour_across_interfaces, outfile, indent=4, separators=(',', ':'))
+        for table_file, observation in row_dict.items():
+            if no_output_place_holder not in observation.read_value:
+                continue
+            w_log_filename, r_log_filename = get_table_log_files(table_file)
+            for logfile, log_type in [(w_log_filename, "write"), (r_log_filename, "read")]:
+                found = find_row_exception(row, logfile)
+                if found is not None:
+                    exception_line, exception, batch_insert = found
+                    if exception.startswith(timeout_marker):
+                        outcome = timed_out_place_holder
+                    elif batch_insert:
+                        # the insert of the whole batch failed, maybe for another row of it
+                        outcome = batch_failed_place_holder
+                    else:
+                        outcome = "find exception"
+                    if log_type == "write":
+                        observation.write_value += ", {}: {}".format(outcome, exception)
+                    else:
+                        observation.read_value += ", {}: {}".format(outcome, exception)
+                    observation.log_location = "({}) {}{} (line {})".format(log_type, log_prefix, logfile,
+                                                                            exception_line+1)
     return input_behaviour_across_interfaces
 
 
+def timed_out(observation):
+    return ", {}: ".format(timed_out_place_holder) in observation.read_value + observation.write_value
+
+
+def batch_failed(observation):
+    return ", {}: ".format(batch_failed_place_holder) in observation.read_value + observation.write_value
+
+
+def dump_ungrouped_results(input_behaviour_dict):
+    with open(log_dir + interface + "_ungrouped_results.json", "w") as outfile:
+        dump_results(input_behaviour_dict, outfile)
+
+
+def rebase_log_location(observation, from_dir, to_dir=None):
+    '''
+    Returns the observation dict with its log path, relative to from_dir, made relative to to_dir (absolute if None).
+    '''
+    match = log_location_regex.match(observation.get("log_location") or "")
+    if match is None:
+        return observation
+    logfile = os.path.abspath(os.path.join(from_dir, match.group("logfile")))
+    if to_dir is not None:
+        logfile = os.path.relpath(logfile, to_dir)
+    return dict(observation, log_location="({}) {} (line {})".format(match.group("log_type"), logfile,
+                                                                      match.group("line")))
+
+
+def batch_has_exception(row, table_files):
+    '''
+    Whether a statement of the row's batched table (its multi-row insert or createDataFrame, or its select) found an
+    exception in the logs of the table files. Such an exception is attributed to every row of the batch, whatever
+    the row's own value, see find_row_exception.
+    '''
+    if row not in row_table_dict:
+        return False
+    keys = [row_table_dict[row], row_table_dict[row] + "/insert"]
+    for table_file in table_files:
+        for logfile in get_table_log_files(table_file):
+            if os.path.exists(log_dir + logfile) and any(key in get_log_index(logfile) for key in keys):
+                return True
+    return False
+
+
+def apply_result_cache(input_behaviour_dict, report_dir):
+    '''
+    For runs generated with value_gen.py --cache (t_cache.json in the log directory): fills in the observations of
+    the inputs that were left out of the scripts from the result cache, and stores the fresh observations of the
+    others. A format is only stored if some of its tables have rows, so a run that failed to start does not fill
+    the cache with missing outputs. In batched runs the rows of a batch whose shared statements found an exception
+    are not stored, their outcome depends on the other rows of the batch. Log locations are relative to report_dir,
+    and absolute in the cache.
+    '''
+    if not os.path.exists(log_dir + result_cache.cache_file):
+        return
+    with open(log_dir + result_cache.cache_file, "r") as infile:
+        cache = json.load(infile)
+    format_table_files = defaultdict(list)
+    for table_file in read_table_files:
+        format_table_files[parse_table_filename(table_file)[2]].append(table_file)
+    for format_type, format_cache in cache["formats"].items():
+        hits = set(format_cache["hits"])
+        complete = any(os.path.getsize(log_dir + table_file) > 0 for table_file in format_table_files[format_type])
+        for row, key in format_cache["keys"].items():
+            if row not in input_behaviour_dict:
+                continue
+            if row in hits:
+                entry = result_cache.load_entry(cache["cache_dir"], key)
+                for table_file, observation in (entry or dict()).items():
+                    input_behaviour_dict[row][table_file] = Observation.from_dict(
+                        rebase_log_location(observation, "/", report_dir))
+            elif complete and not any(timed_out(observation) for observation in input_behaviour_dict[row].values()) \
+                    and not batch_has_exception(row, format_table_files[format_type]):
+                # a statement that timed out says nothing about the value, it runs again next time
+                result_cache.store_entry(cache["cache_dir"], key, {
+                    table_file: rebase_log_location(input_behaviour_dict[row][table_file].to_dict(), report_dir)
+                    for table_file in format_table_files[format_type]})
+
+
 def perform_error_handling_testing(input_behaviour_dict):
     all_eh = defaultdict(dict)
     failed_eh = defaultdict(dict)
     for _input, input_behaviour in input_behaviour_dict.items():
         if not original_dict[_input]['valid']:
             for ifc_format_combo, _input_behaviour in input_behaviour.items():
-                test_result = copy.deepcopy(_input_behaviour)
-                if "No output" not in _input_behaviour["read_value"]:
-                    test_result["pass"] = False
+                if timed_out(_input_behaviour) or batch_failed(_input_behaviour):
+                    continue
+                if "No output" not in _input_behaviour.read_value:
+                    test_result = TestResult(_input_behaviour, False)
                     failed_eh[_input][ifc_format_combo] = test_result
                 else:
-                    test_result["pass"] = True
+                    test_result = TestResult(_input_behaviour, True)
                 all_eh[_input][ifc_format_combo] = test_result
 
     # Dumping all EH tests to <ifc>_eh_all.json
     with open(log_dir + interface + "_eh_all.json", "w") as outfile:
-        json.dump(all_eh, outfile, indent=4, separators=(',', ':'))
+        dump_results(all_eh, outfile)
 
     # Dumping the failed EH tests to <ifc>_eh_failed.json
     with open(log_dir + interface + "_eh_failed.json", "w") as outfile:
-        json.dump(failed_eh, outfile, indent=4, separators=(',', ':'))
+        dump_results(failed_eh, outfile)
 
 
 def perform_differential_testing(input_behaviour_dict):
@@ -199,35 +452,26 @@ def perform_differential_testing(input_behaviour_dict):
     failed_difft_tests = dict()
     for row, row_dict in input_behaviour_dict.items():
         tests = defaultdict(list)
-        for table_file in row_dict:
-            table_file_dict = row_dict[table_file]
-            actual_val = table_file_dict["read_value"]
+        for observation in row_dict.values():
+            actual_val = observation.read_value
             # canonicalize the data values
             test_metadata = {
-                "write_interface": table_file_dict["write_interface"],
-                "read_interface": table_file_dict["read_interface"],
-                "format_type": table_file_dict["format_type"],
+                "write_interface": observation.write_interface,
+                "read_interface": observation.read_interface,
+                "format_type": observation.format_type,
             }
-            if "log_location" in table_file_dict:
-                test_metadata["log_location"] = table_file_dict["log_location"]
+            if observation.log_location is not None:
+                test_metadata["log_location"] = observation.log_location
 
             tests[actual_val].append(test_metadata)
 
         if len(tests) == 1:
             has_pass = True
         else:
-            no_output_count = equivalent_class_count = regular_count = 0
-            for val in tests:
-                if "No output" in val:
-                    no_output_count = 1
-                elif any(val in equivalence_class for equivalence_class in equivalence_classes):
-                    equivalent_class_count = 1
-                else:
-                    regular_count += 1
-            if no_output_count + equivalent_class_count + regular_count > 1:
-                has_pass = False
-            else:
-                has_pass = True
+            # all outputs must be equivalent, or all missing
+            no_output_count = int(any("No output" in val for val in tests))
+            canonical_values = {canonicalize(val, original_dict[row]["type"]) for val in tests if "No output" not in val}
+            has_pass = no_output_count + len(canonical_values) <= 1
 
         test_result = {
             "original_value": original_dict[row]["value"],
@@ -241,15 +485,12 @@ def perform_differential_testing(input_behaviour_dict):
             failed_difft_tests[row] = test_result
 
     # Dumping all the DiffT tests to <ifc>_difft_row_compact.json
-    difft_row_compact_json = json.dumps(difft_row_compact, indent=4, separators=(',', ':'))
-    # TODO replace with regex
-    difft_row_compact_json = difft_row_compact_json.replace('{\n                    "write_interface":"', '{"write_interface":"').replace('\n                    "read_interface":"','  "read_interface":"').replace('\n                    "format_type":"', ' "format_type":"').replace('\n                    "log_location":"', '  "log_location":"').replace('\n                }', '}')
     with open(log_dir + interface + "_difft_all.json", "w") as outfile:
-        outfile.write(difft_row_compact_json)
+        dump_results(difft_row_compact, outfile, compact_difft_row)
 
     # Dumping the failed DiffT tests to <ifc>_difft_failed.json
     with open(log_dir + interface + "_difft_failed.json", "w") as outfile:
-        json.dump(failed_difft_tests, outfile, indent=4, separators=(',', ':'))
+        dump_results(failed_difft_tests, outfile)
 
     return difft_row_compact
 
@@ -259,25 +500,57 @@ def perform_write_read_testing(input_behaviour_dict):
     failed_wr = defaultdict(dict)
     for _input, input_behaviour in input_behaviour_dict.items():
         if original_dict[str(_input)]['valid'] == True:
+            # values compare by the declared type of the input, see canonical_value.py
+            value_type = original_dict[str(_input)]['type']
             for ifc_format_combo, _input_behaviour in input_behaviour.items():
-                test_result = copy.deepcopy(_input_behaviour)
-                read_value = _input_behaviour["read_value"]
-                write_value = _input_behaviour["write_value"]
+                if timed_out(_input_behaviour) or batch_failed(_input_behaviour):
+                    continue
+                read_value = _input_behaviour.read_value
+                write_value = _input_behaviour.write_value
                 if read_value != write_value and not (no_output_place_holder in read_value and no_output_place_holder in write_value) \
-                    and not any(read_value in equivalence_class and write_value in equivalence_class for equivalence_class in equivalence_classes):
-                    test_result["pass"] = False
+                    and canonicalize(read_value, value_type) != canonicalize(write_value, value_type):
+                    test_result = TestResult(_input_behaviour, False)
                     failed_wr[str(_input)][ifc_format_combo] = test_result
                 else:
-                    test_result["pass"] = True
+                    test_result = TestResult(_input_behaviour, True)
                 all_wr[str(_input)][ifc_format_combo] = test_result
 
     # Dumping all wr tests to <ifc>_wr_all.json
     with open(log_dir + interface + "_wr_all.json", "w") as outfile:
-        json.dump(all_wr, outfile, indent=4, separators=(',', ':'))
+        dump_results(all_wr, outfile)
 
     # Dumping the failed wr tests to <ifc>_wr_failed.json
     with open(log_dir + interface + "_wr_failed.json", "w") as outfile:
-        json.dump(failed_wr, outfile, indent=4, separators=(',', ':'))
+        dump_results(failed_wr, outfile)
+
+
+def report_timeouts(input_behaviour_dict):
+    timeouts = defaultdict(dict)
+    for row, row_dict in input_behaviour_dict.items():
+        for ifc_format_combo, observation in row_dict.items():
+            if timed_out(observation):
+                timeouts[row][ifc_format_combo] = observation
+
+    # Dumping the observations of the statements step_watchdog.py killed to <ifc>_timeouts.json
+    with open(log_dir + interface + "_timeouts.json", "w") as outfile:
+        dump_results(timeouts, outfile)
+    if timeouts:
+        print("{0} rows timed out, see {1}{2}_timeouts.json".format(len(timeouts), log_dir, interface))
+
+
+def report_batch_failures(input_behaviour_dict):
+    batch_failures = defaultdict(dict)
+    for row, row_dict in input_behaviour_dict.items():
+        for ifc_format_combo, observation in row_dict.items():
+            if batch_failed(observation):
+                batch_failures[row][ifc_format_combo] = observation
+
+    # Dumping the observations of the rows of failed multi-row inserts to <ifc>_batch_failures.json
+    with open(log_dir + interface + "_batch_failures.json", "w") as outfile:
+        dump_results(batch_failures, outfile)
+    if batch_failures:
+        print("{0} rows are in a batch whose insert failed, see {1}{2}_batch_failures.json, run them without "
+              "--batched to test them".format(len(batch_failures), log_dir, interface))
 
 
 def get_expected_vals(log_dir):
@@ -297,37 +570,98 @@ def get_original_vals(log_dir):
     return original_dict
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument('log_dir', type=str)
-    parser.add_argument('interface', type=str)
-    parser.add_argument('--dry_run', action='store_true')
-    args = parser.parse_args()
-    log_dir = args.log_dir
-    interface = args.interface
+def load_log_dir(run_log_dir):
+    '''
+    Points the analysis at the tables, logs and inputs of one run, or of one shard of a run.
+    '''
+    global log_dir, write_table_files, read_table_files, original_dict, row_table_dict, log_index_dict
+    log_dir = os.path.join(run_log_dir, "")
     log_files = os.listdir(log_dir)
     write_table_files = list(filter(lambda x: (x.startswith(table_prefix) and "_w_" in x and "_r_" not in x), log_files))
     read_table_files = list(filter(lambda x: (x.startswith(table_prefix) and "_r_" in x), log_files))
+    original_dict = get_original_vals(log_dir)
+    row_table_dict = get_row_tables(log_dir) if os.path.exists(log_dir + batches_file) else dict()
+    # the shards of a run have logs of the same names
+    log_index_dict = dict()
 
-    original_dict = get_original_vals(args.log_dir)
-    # expected_dict = get_expected_vals(args.log_dir)
 
-    test_inputs = None
+def get_test_inputs():
     if interface in ['sh', 'hs']:
         #  We only consider valid inputs for Spark-Hive & Hive-Spark oneway testing, because it is a test of
         # interoperability. Injecting invalid values only makes sense if one is testing an interface in isolation.
-        test_inputs = {input_idx: input_metadata for input_idx, input_metadata
-                       in original_dict.items() if input_metadata.get('valid', True)}
-    else:
-        test_inputs = original_dict
+        return {input_idx: input_metadata for input_idx, input_metadata
+                in original_dict.items() if input_metadata.get('valid', True)}
+    return original_dict
+
+
+def load_ungrouped_results():
+    with open(log_dir + interface + "_ungrouped_results.json", "r") as infile:
+        return {row: {table_file: Observation.from_dict(observation) for table_file, observation in row_dict.items()}
+                for row, row_dict in json.load(infile).items()}
+
+
+def merge_log_dirs(merged_log_dir, shard_log_dirs, dry_run=False):
+    '''
+    Analyzes the shards of a run (value_gen.py --shards) one after the other and points the analysis at
+    merged_log_dir, with the inputs and observations of all shards ordered by row id. Log locations are given
+    relative to merged_log_dir. Returns the merged observations.
+    '''
+    global log_dir, original_dict
+    merged_original_dict, merged_behaviour_dict, shard_indexes, shards = dict(), dict(), set(), 1
+    for shard_log_dir in shard_log_dirs:
+        load_log_dir(shard_log_dir)
+        if os.path.exists(log_dir + shard_file):
+            with open(log_dir + shard_file, "r") as infile:
+                shard = json.load(infile)
+            shards = shard["shards"]
+            shard_indexes.add(shard["shard_index"])
+        merged_original_dict.update(original_dict)
+        if not dry_run:
+            log_prefix = os.path.join(os.path.relpath(log_dir, merged_log_dir), "")
+            shard_behaviour_dict = analyze_input_behaviour_across_interfaces(get_test_inputs(), log_prefix)
+            apply_result_cache(shard_behaviour_dict, merged_log_dir)
+            merged_behaviour_dict.update(shard_behaviour_dict)
+    if shard_indexes != set(range(shards)):
+        print("Merging shards {0} of {1}, the report misses the others".format(sorted(shard_indexes), shards))
+
+    def by_row(item):
+        return int(item[0])
+
+    log_dir = os.path.join(merged_log_dir, "")
+    original_dict = dict(sorted(merged_original_dict.items(), key=by_row))
+    if dry_run:
+        return load_ungrouped_results()
+    merged_behaviour_dict = dict(sorted(merged_behaviour_dict.items(), key=by_row))
+    dump_ungrouped_results(merged_behaviour_dict)
+    return merged_behaviour_dict
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log_dir', type=str)
+    parser.add_argument('interface', type=str)
+    parser.add_argument('--dry_run', action='store_true')
+    parser.add_argument('--merge', type=str, nargs='+', metavar='shard_log_dir',
+                        help="merge the shards of a run (value_gen.py --shards) into one report in log_dir")
+    args = parser.parse_args()
+    interface = args.interface
 
-    if args.dry_run:
-        with open(log_dir + interface + "_ungrouped_results.json", "r") as infile:
-            input_behaviour_dict = json.load(infile)
+    if args.merge:
+        os.makedirs(args.log_dir, exist_ok=True)
+        input_behaviour_dict = merge_log_dirs(args.log_dir, args.merge, args.dry_run)
     else:
-        input_behaviour_dict = analyze_input_behaviour_across_interfaces(test_inputs)
+        load_log_dir(args.log_dir)
+        # expected_dict = get_expected_vals(args.log_dir)
+        if args.dry_run:
+            input_behaviour_dict = load_ungrouped_results()
+        else:
+            input_behaviour_dict = analyze_input_behaviour_across_interfaces(get_test_inputs())
+            apply_result_cache(input_behaviour_dict, log_dir)
+            dump_ungrouped_results(input_behaviour_dict)
 
     perform_differential_testing(input_behaviour_dict)
     perform_write_read_testing(input_behaviour_dict)
+    report_timeouts(input_behaviour_dict)
+    report_batch_failures(input_behaviour_dict)
     if interface == 'ss':
         perform_error_handling_testing(input_behaviour_dict)
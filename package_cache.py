@@ -0,0 +1,101 @@
+'''
+Offline cache of the --packages of the Spark CLIs. "resolve" runs spark-sql once with the packages and an Ivy
+directory of its own, and records the resolved jars in packages.json with their checksums, the packages and the Spark
+release they were resolved for. run_experiments.py then passes the jars with --jars instead of --packages, which
+saves the Ivy resolution every spark-sql, spark-shell and spark-submit launch does otherwise. A cache whose packages,
+Spark release or jars no longer match is stale, and the run stops before its first step.
+
+python3 package_cache.py resolve [--cache_dir package_cache] [--packages org.apache.spark:spark-avro_2.12:3.2.1 ...]
+python3 package_cache.py check [--cache_dir package_cache] [--packages ...] exits with 1 if the cache is stale
+'''
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from result_cache import get_engine_version
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+default_cache_dir = os.path.join(script_dir, "package_cache")
+default_packages = ["org.apache.spark:spark-avro_2.12:3.2.1"]
+manifest_file = "packages.json"
+# the Spark the packages are resolved for, the one the drivers launch spark-sql and spark-shell from
+spark_home_variable = "SPARK_HOME_E2E"
+
+
+def get_jar_checksum(jar_path):
+    checksum = hashlib.sha256()
+    with open(jar_path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def resolve(cache_dir, packages, spark_home):
+    '''
+    Resolves the packages into <cache_dir>/ivy/jars and writes the manifest, returns the jars.
+    '''
+    cache_dir = os.path.abspath(cache_dir)
+    ivy_dir = os.path.join(cache_dir, "ivy")
+    os.makedirs(cache_dir, exist_ok=True)
+    command = [os.path.join(spark_home, "bin", "spark-sql"), "--packages", ",".join(packages),
+               "--conf", "spark.jars.ivy=" + ivy_dir]
+    with open(os.path.join(cache_dir, "log_resolve"), "w") as outfile:
+        result = subprocess.run(command, input="select 1;\n", stdout=outfile, stderr=subprocess.STDOUT, text=True)
+    jars = sorted(glob.glob(os.path.join(ivy_dir, "jars", "*.jar")))
+    if result.returncode != 0 or not jars:
+        sys.exit("Resolving {0} failed, see {1}".format(" ".join(packages), os.path.join(cache_dir, "log_resolve")))
+    manifest = {"packages": packages, "spark": get_engine_version(spark_home),
+                "jars": {os.path.relpath(jar, cache_dir): get_jar_checksum(jar) for jar in jars}}
+    with open(os.path.join(cache_dir, manifest_file), "w") as outfile:
+        json.dump(manifest, outfile, indent=4)
+    return jars
+
+
+def get_stale_reason(cache_dir, packages, spark_home):
+    '''
+    Returns why the cache does not hold the packages for this Spark, None if it does.
+    '''
+    manifest_path = os.path.join(cache_dir, manifest_file)
+    if not os.path.isfile(manifest_path):
+        return "{0} is missing".format(manifest_path)
+    with open(manifest_path, "r") as infile:
+        manifest = json.load(infile)
+    if manifest["packages"] != packages:
+        return "it holds {0}".format(" ".join(manifest["packages"]))
+    if manifest["spark"] != get_engine_version(spark_home):
+        return "it was resolved for {0}".format(manifest["spark"])
+    for jar, checksum in manifest["jars"].items():
+        jar_path = os.path.join(cache_dir, jar)
+        if not os.path.isfile(jar_path) or get_jar_checksum(jar_path) != checksum:
+            return "{0} changed".format(jar_path)
+    return None
+
+
+def get_jars(cache_dir):
+    with open(os.path.join(cache_dir, manifest_file), "r") as infile:
+        return [os.path.join(os.path.abspath(cache_dir), jar) for jar in json.load(infile)["jars"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=["resolve", "check"])
+    parser.add_argument('--cache_dir', type=str, default=default_cache_dir)
+    parser.add_argument('--packages', type=str, nargs='+', default=default_packages)
+    args = parser.parse_args()
+
+    spark_home = os.environ.get(spark_home_variable, "")
+    if not os.path.isdir(spark_home):
+        sys.exit("Set {0} to a VALID DIRECTORY before resolving the packages!".format(spark_home_variable))
+    if args.command == "resolve":
+        for jar in resolve(args.cache_dir, args.packages, spark_home):
+            print(jar)
+    else:
+        stale_reason = get_stale_reason(args.cache_dir, args.packages, spark_home)
+        if stale_reason is not None:
+            sys.exit("The package cache in {0} is stale: {1}".format(args.cache_dir, stale_reason))
+        print("The package cache in {0} is up to date".format(args.cache_dir))
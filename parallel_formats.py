@@ -0,0 +1,38 @@
+'''
+Isolation of the formats of spark_e2e.sh --parallel_formats=<n>, which run_experiments.py runs concurrently. Every
+format gets its own warehouse directory and embedded Derby metastore under <log_dir>/formats/<format>, so the formats
+do not use the shared metastore or /user/hive/warehouse at all. The scripts still write into the database of the
+run (value_gen.py --database).
+'''
+
+import os
+import shutil
+
+
+def get_format_dir(log_dir, format_type):
+    return os.path.abspath(os.path.join(log_dir, "formats", format_type))
+
+
+def get_isolation_confs(format_dir):
+    warehouse_dir = os.path.join(format_dir, "warehouse")
+    metastore_dir = os.path.join(format_dir, "metastore_db")
+    confs = {
+        "spark.sql.warehouse.dir": "file://" + warehouse_dir,
+        # an empty URI makes Spark use an embedded metastore instead of the shared thrift one in hive-site.xml
+        "spark.hadoop.hive.metastore.uris": "",
+        "spark.hadoop.javax.jdo.option.ConnectionURL": "jdbc:derby:;databaseName={0};create=true".format(metastore_dir),
+        "spark.hadoop.datanucleus.schema.autoCreateAll": "true",
+        "spark.hadoop.hive.metastore.schema.verification": "false",
+    }
+    spark_args = []
+    for key, value in confs.items():
+        spark_args += ["--conf", "{0}={1}".format(key, value)]
+    return spark_args
+
+
+def delete_table_data(format_dir, database_name):
+    # the metastore of the format is not shared, only the table data is removed at the end of the run
+    database_dir = os.path.join(format_dir, "warehouse", database_name + ".db")
+    if os.path.isdir(database_dir):
+        for table_dir in os.listdir(database_dir):
+            shutil.rmtree(os.path.join(database_dir, table_dir))
@@ -0,0 +1,78 @@
+'''
+Local cache of the observations of each input, so inputs whose results are known are not run again.
+
+An entry is keyed by a hash of the engine versions, the format, the systems of the run (ss, sh, hs), the options
+that change what the scripts do and the statement text of the input (column types and values through every
+interface, without the row id). It holds the observations of the input through every (write interface, read
+interface) of that format, as inspect_result.py records them: read value, write value and the exception found for
+them. value_gen.py --cache <dir> leaves the inputs with an entry out of the scripts of that format and lists the keys
+of every input in t_cache.json; inspect_result.py fills in the observations of those inputs from the cache and
+stores the fresh ones.
+
+Entries are JSON files <dir>/<first two characters of the key>/<key>.json, removing the directory clears the cache.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+# bump when the statements value_gen.py writes around the values, or the way observations are recorded, change
+# (2: batched rows whose batch found an exception are no longer stored)
+cache_version = 2
+cache_file = "t_cache.json"
+# the engine homes of the drivers, see validate_environment_variables in run_experiments.py
+engine_home_variables = ["SPARK_HOME_E2E", "SPARK_HOME_ONEWAY", "HIVE_HOME"]
+
+
+def get_engine_version(engine_home):
+    '''
+    The first line of Spark's RELEASE file ("Spark 3.2.1 built for Hadoop 3.3.1"), or the name of the engine's core
+    jar for distributions without one (Hive: "hive-exec-3.1.2.jar").
+    '''
+    release_file = os.path.join(engine_home, "RELEASE")
+    if os.path.isfile(release_file):
+        with open(release_file, "r") as infile:
+            return infile.readline().strip()
+    jars = glob.glob(os.path.join(engine_home, "jars", "spark-core_*.jar")) + \
+        glob.glob(os.path.join(engine_home, "lib", "hive-exec-*.jar"))
+    return ",".join(sorted(os.path.basename(jar) for jar in jars))
+
+
+def get_engine_versions():
+    return {variable: get_engine_version(os.environ[variable]) for variable in engine_home_variables
+            if os.environ.get(variable)}
+
+
+def get_key(engine_versions, format_type, systems, options, statement):
+    key = json.dumps([cache_version, engine_versions, format_type, systems, sorted(options), statement],
+                     sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + ".json")
+
+
+def has_entry(cache_dir, key):
+    return os.path.isfile(get_entry_path(cache_dir, key))
+
+
+def load_entry(cache_dir, key):
+    # {table file: observation dict}, or None if the entry is not cached
+    try:
+        with open(get_entry_path(cache_dir, key), "r") as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return None
+
+
+def store_entry(cache_dir, key, entry):
+    # written to a temporary file first, so concurrent runs (e.g. shards) never read half an entry
+    entry_path = get_entry_path(cache_dir, key)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix=".tmp")
+    with os.fdopen(fd, "w") as outfile:
+        json.dump(entry, outfile)
+    os.replace(tmp_path, entry_path)
@@ -0,0 +1,526 @@
+'''
+Runs the experiments as one graph of steps: value_gen.py, then for every format the writes and the reads of the
+tables they wrote, the table extraction of every log as soon as the log is complete, and inspect_result.py and
+timing_report.py once all logs of an experiment are in. Steps whose inputs are ready run concurrently, at most
+--max_workers at a time. spark_e2e.sh (ss), spark_hive_oneway.sh (sh) and hive_spark_oneway.sh (hs) run their
+experiment through this; several experiments given at once share one scheduler and one Hive metastore.
+
+Every format of an experiment writes its tables into a database of its own, csi_<ts>_<experiment>_<format> (see
+value_gen.py --database), which the first write of each group of steps recreates and drop_databases drops at the end,
+so the formats and experiments, and other runs sharing the metastore, run concurrently. Within a format, groups of
+steps using the same tables (a write and the steps after it, see spark_session.get_step_groups) run one after the
+other, the reads of a write's tables run concurrently with each other and a step that writes into those tables (the
+one-way w_hql / w_sql steps) waits for them. With --parallel_formats every format of ss also has its own warehouse
+and metastore (see parallel_formats.py), and its steps run one at a time since the embedded Derby metastore takes one
+JVM.
+
+The CLIs of the write and read steps run under step_watchdog.py: a statement showing no prompt after it within
+--statement_timeout seconds is killed and the step goes on from the statement after it, a step running longer than
+--session_timeout seconds fails.
+
+Each experiment logs to logs/<driver>/<ts> (<ts>_shard<i> for a shard) as before, and writes the status and duration
+of every step to step_durations.json there.
+
+python3 run_experiments.py <ss|sh|hs> ... [--max_workers N] [--persistent_session] [--parallel_formats=N] [--df_app]
+    [--package_cache <dir>] [--resume=<log_dir>] [--statement_timeout S] [--session_timeout S] [value_gen.py options]
+e.g. python3 run_experiments.py ss sh hs --max_workers 4 --batched
+'''
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from get_tables import extract_table, get_log_table
+from package_cache import default_cache_dir, default_packages, get_jars, get_stale_reason
+from parallel_formats import delete_table_data, get_format_dir, get_isolation_confs
+from spark_session import e2e_steps, get_step_groups, get_step_name
+from step_manifest import log_prefix, record_step, steps_completed
+from step_watchdog import run_watched
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ts_format = "%Y.%m.%d-%H.%M.%S"
+durations_file = "step_durations.json"
+# the formats of an experiment, in the order they run in
+experiment_formats = {"ss": ["parquet", "orc", "avro"], "sh": ["parquet", "orc", "avro"],
+                      "hs": ["orc", "avro", "parquet"]}
+env_variables = ["SPARK_HOME_E2E", "SPARK_HOME_ONEWAY", "HIVE_HOME", "HADOOP_HOME"]
+experiment_drivers = {"ss": "spark_e2e", "sh": "spark_hive_oneway", "hs": "hive_spark_oneway"}
+value_gen_systems = {"ss": ["spark", "spark"], "sh": ["spark", "hive", "--one_way"],
+                     "hs": ["hive", "spark", "--one_way"]}
+# Steps of an experiment for one format, (session, script, log) as e2e_steps, session None drops all tables
+experiment_steps = {
+    "ss": e2e_steps,
+    "sh": [
+        (None, None, None),
+        ("sql", "w_sql_{0}", "log_w_sql_{0}"),
+        ("hql", "r_hql_{0}", "log_w_sql_r_hql_{0}"),
+        ("hql", "w_hql_{0}", "log_w_sql_w_hql_{0}"),
+        (None, None, None),
+        ("df", "w_df_{0}", "log_w_df_{0}"),
+        ("hql", "r_hql_{0}", "log_w_df_r_hql_{0}"),
+        ("hql", "w_hql_{0}", "log_w_df_w_hql_{0}"),
+    ],
+    "hs": [
+        (None, None, None),
+        ("hql", "w_hql_{0}", "log_w_hql_{0}"),
+        ("sql", "r_sql_{0}", "log_w_hql_r_sql_{0}"),
+        ("df", "r_df_{0}", "log_w_hql_r_df_{0}"),
+        ("sql", "w_sql_{0}", "log_w_hql_w_sql_{0}"),
+    ],
+}
+
+hive_version = "3.1.2"
+hive_jars = ["hive-metastore-3.1.2.jar", "hive-exec-3.1.2.jar", "hive-common-3.1.2.jar", "hive-serde-3.1.2.jar",
+             "guava-19.0.jar"]
+hive_warehouse_dir = "hdfs://localhost:9000/user/hive/warehouse"
+hms_port = 9083
+hms_startup_timeout = 300
+hms_shutdown_timeout = 30
+
+
+class Step:
+    '''
+    A node of the graph: action is called without arguments and returns whether it succeeded, it runs once all deps
+    are done. A required step that fails makes the steps depending on it, and theirs, skip. A step without action was
+    completed in an earlier run of the log directory.
+    '''
+
+    def __init__(self, experiment, name, action, deps=(), required=False):
+        self.experiment = experiment
+        self.name = name
+        self.action = action
+        self.deps = list(deps)
+        self.required = required
+        self.status = None if action is not None else "completed"
+        self.start = None
+        self.seconds = None
+
+    def run(self):
+        if self.status == "completed":
+            return self
+        if any(dep.status == "skipped" or dep.required and dep.status == "failed" for dep in self.deps):
+            self.status = "skipped"
+            return self
+        self.start = time.time()
+        try:
+            succeeded = self.action()
+        except (OSError, subprocess.SubprocessError) as e:
+            print("{0} {1}: {2}".format(self.experiment.name, self.name, e), file=sys.stderr)
+            succeeded = False
+        self.seconds = time.time() - self.start
+        self.status = "ok" if succeeded else "failed"
+        return self
+
+
+class Experiment:
+    '''
+    The log directory and the commands of the steps of one experiment.
+    '''
+
+    def __init__(self, name, log_dir, args):
+        self.name = name
+        self.log_dir = log_dir
+        self.args = args
+        self.steps = []
+        # csi_<ts>[_shard<i>]_<experiment>, the same for a resumed run, so runs sharing a metastore never share a table
+        self.database = "csi_{0}_{1}".format(re.sub(r"\W", "_", os.path.basename(log_dir)), name)
+        spark_sql = os.path.join(os.environ["SPARK_HOME_E2E"], "bin", "spark-sql")
+        spark_shell = os.path.join(os.environ["SPARK_HOME_E2E"], "bin", "spark-shell")
+        self.spark_submit = os.path.join(os.environ["SPARK_HOME_E2E"], "bin", "spark-submit")
+        # the jars of the package cache (see package_cache.py), which saves resolving the packages at every launch
+        jars = list(args.package_jars or [])
+        package_args = [] if jars else ["--packages", ",".join(default_packages)]
+        confs = []
+        if name != "ss":
+            hive_lib = os.path.join(os.environ["HIVE_HOME"], "lib")
+            # spark-submit takes a single --jars
+            jars = [os.path.join(hive_lib, jar) for jar in hive_jars] + jars
+            confs = ["--conf", "spark.sql.hive.metastore.version=" + hive_version,
+                     "--conf", "spark.sql.hive.metastore.jars=" + os.path.join(hive_lib, "*"),
+                     "--conf", "spark.sql.warehouse.dir=" + hive_warehouse_dir]
+        self.spark_args = (["--jars", ",".join(jars)] if jars else []) + confs + package_args
+        self.commands = {"sql": [spark_sql], "df": [spark_shell],
+                         # the Hive CLI talks to the metastore service, so one metastore serves the whole run
+                         "hql": [os.path.join(os.environ["HIVE_HOME"], "bin", "hive"),
+                                 "--hiveconf", "hive.metastore.uris=thrift://localhost:{0}".format(hms_port)]}
+
+    def add_step(self, name, action, deps=(), required=False):
+        step = Step(self, name, action, deps, required)
+        self.steps.append(step)
+        return step
+
+    def get_database(self, format_type):
+        # the database value_gen.py --database writes the scripts of a format for
+        return self.database + "_" + format_type
+
+    def get_env(self, session_name):
+        # Hive runs its queries on the one-way Spark, the Spark CLIs on the end-to-end one
+        env = dict(os.environ)
+        env["SPARK_HOME"] = os.environ["SPARK_HOME_ONEWAY" if session_name == "hql" else "SPARK_HOME_E2E"]
+        return env
+
+    def get_command(self, session_name, script_path, extra_args=()):
+        '''
+        The command of a step and the script to feed to its stdin, None for --df_app, which runs the compiled
+        script (see df_app.py).
+        '''
+        if session_name == "hql":
+            return self.commands["hql"], script_path
+        spark_args = self.spark_args + list(extra_args)
+        if session_name == "df" and self.args.df_app:
+            return ["python3", os.path.join(script_dir, "df_app.py"), script_path + ".scala",
+                    self.spark_submit] + spark_args, None
+        return self.commands[session_name] + spark_args, script_path
+
+    def run_cli(self, command, log_path, session_name, stdin_path=None, env=None, cwd=None):
+        # under the timeouts of step_watchdog.py
+        script = read_script(stdin_path) if stdin_path is not None else None
+        return run_watched(command, log_path, session_name, script, self.args.statement_timeout,
+                           self.args.session_timeout, env, cwd)
+
+
+def run_command(command, log_path, stdin_path=None, stdin_text=None, env=None, cwd=None):
+    with open(log_path, "w") as outfile:
+        if stdin_path is not None:
+            with open(stdin_path, "r") as infile:
+                result = subprocess.run(command, stdin=infile, stdout=outfile, stderr=subprocess.STDOUT, env=env,
+                                        cwd=cwd)
+        else:
+            result = subprocess.run(command, input=stdin_text, stdout=outfile, stderr=subprocess.STDOUT, env=env,
+                                    cwd=cwd, text=True)
+    return result.returncode == 0
+
+
+def run_logged_step(log_dir, step_name, command, run=run_command, **kwargs):
+    # the output goes to log_<step>, a step that exits with 0 is recorded as completed
+    succeeded = run(command, os.path.join(log_dir, log_prefix + step_name), **kwargs)
+    if succeeded:
+        record_step(log_dir, step_name)
+    return succeeded
+
+
+def read_script(script_path):
+    with open(script_path, "r") as infile:
+        return infile.read()
+
+
+def drop_databases(experiment):
+    # one spark-sql for all formats, the Hive CLI reads the tables Spark wrote as well
+    statements = "".join("drop database if exists {0} cascade;\n".format(experiment.get_database(format_type))
+                         for format_type in experiment_formats[experiment.name])
+    return run_command(experiment.commands["sql"] + experiment.spark_args,
+                       os.path.join(experiment.log_dir, "log_drop_databases"), stdin_text=statements,
+                       env=experiment.get_env("sql"))
+
+
+def extract_log(log_path, table_path, system, rt):
+    # in this process, starting an interpreter for every log took longer than extracting most of them
+    try:
+        extract_table(log_path, table_path, system, rt)
+    except ValueError as e:
+        print("{0}: {1}".format(log_path, e), file=sys.stderr)
+        return False
+    return True
+
+
+def add_group_steps(experiment, format_type, group, after, format_dir=None):
+    '''
+    Adds the steps of a group of one format after the steps in after, returns (the steps of the group, {log path:
+    step writing it}). With the format dir of parallel_formats.py the steps use the format's own warehouse and
+    metastore, and run one after the other.
+    '''
+    log_dir = experiment.log_dir
+    step_names = [get_step_name(log, format_type) for _, _, log in group]
+    logs = {os.path.join(log_dir, log.format(format_type)): name for (_, _, log), name in zip(group, step_names)}
+    if steps_completed(log_dir, step_names):
+        # completed in an earlier run of the log directory, see step_manifest.py
+        print("Skipping {0}, completed in an earlier run".format(" ".join(step_names)))
+        steps = [experiment.add_step(name, None, after) for name in step_names]
+        return steps, dict(zip(logs, steps))
+    steps, reads = [], []
+    write = None
+    for (session_name, script, _), step_name in zip(group, step_names):
+        script_path = os.path.join(log_dir, script.format(format_type))
+        if format_dir is None:
+            command, stdin_path = experiment.get_command(session_name, script_path)
+            kwargs = {"env": experiment.get_env(session_name)}
+        else:
+            os.makedirs(format_dir, exist_ok=True)
+            command, stdin_path = experiment.get_command(session_name, script_path, get_isolation_confs(format_dir))
+            # the working directory keeps derby.log and other per JVM files of the formats apart
+            kwargs = {"env": experiment.get_env(session_name), "cwd": format_dir}
+        action = (lambda step_name=step_name, command=command, session_name=session_name, stdin_path=stdin_path,
+                  kwargs=kwargs: run_logged_step(log_dir, step_name, command, run=experiment.run_cli,
+                                                 session_name=session_name, stdin_path=stdin_path, **kwargs))
+        # the first write of a group recreates the database of the format (see value_gen.py --database)
+        if write is None:
+            deps = after
+        elif format_dir is not None:
+            deps = [steps[-1]]
+        elif script.startswith("w_"):
+            # writes into the tables the reads before it read
+            deps = [write] + reads
+        else:
+            deps = [write]
+        step = experiment.add_step(step_name, action, deps)
+        if write is None or script.startswith("w_"):
+            write, reads = step, []
+        else:
+            reads.append(step)
+        steps.append(step)
+    return steps, dict(zip(logs, steps))
+
+
+def build_graph(experiments, args):
+    '''
+    Adds the steps of every experiment, returns whether one of them uses the shared metastore.
+    '''
+    uses_metastore = False
+    for experiment in experiments:
+        log_dir = experiment.log_dir
+        value_gen_command = ["python3", os.path.join(script_dir, "value_gen.py"), log_dir] + \
+            value_gen_systems[experiment.name] + args.value_gen_args + ["--database", experiment.database]
+        if steps_completed(log_dir, ["value_gen"]):
+            value_gen = experiment.add_step("value_gen", None, required=True)
+        else:
+            value_gen = experiment.add_step(
+                "value_gen", lambda log_dir=log_dir, command=value_gen_command: run_logged_step(log_dir, "value_gen",
+                                                                                              command),
+                required=True)
+        isolated = experiment.name == "ss" and args.parallel_formats > 0
+        uses_metastore = uses_metastore or not isolated
+        log_steps = dict()
+        if experiment.name == "ss" and args.persistent_session:
+            log_steps.update(add_session_steps(experiment, [value_gen]))
+        else:
+            for format_type in experiment_formats[experiment.name]:
+                format_dir = get_format_dir(log_dir, format_type) if isolated else None
+                # the groups of a format use the same tables, the formats have their own database
+                after = [value_gen]
+                for group in get_step_groups(experiment_steps[experiment.name]):
+                    after, group_logs = add_group_steps(experiment, format_type, group, after, format_dir)
+                    log_steps.update(group_logs)
+        engine_steps = list(log_steps.values())
+        extractions = []
+        for log, step in log_steps.items():
+            # the logs of the one-way writes into the read tables hold no table
+            log_table = get_log_table(log_dir, os.path.basename(log))
+            if log_table is not None:
+                extractions.append(experiment.add_step("extract_" + os.path.basename(log)[len(log_prefix):],
+                                                       lambda log_table=log_table: extract_log(*log_table), [step]))
+        inspect = ["python3", os.path.join(script_dir, "inspect_result.py"), log_dir + "/", experiment.name]
+        experiment.add_step("inspect_result", lambda command=inspect: subprocess.run(command).returncode == 0,
+                            extractions)
+        timing = ["python3", os.path.join(script_dir, "timing_report.py"), log_dir + "/", experiment.name]
+        experiment.add_step("timing_report", lambda command=timing: subprocess.run(command).returncode == 0,
+                            engine_steps)
+        # the tables of the run are removed at its end
+        if isolated:
+            for format_type in experiment_formats[experiment.name]:
+                experiment.add_step("delete_table_data_" + format_type,
+                                    lambda format_dir=get_format_dir(log_dir, format_type),
+                                    database_name=experiment.get_database(format_type):
+                                    delete_table_data(format_dir, database_name) or True, engine_steps)
+        else:
+            experiment.add_step("drop_databases", lambda experiment=experiment: drop_databases(experiment),
+                                engine_steps)
+    return uses_metastore
+
+
+def add_session_steps(experiment, after):
+    '''
+    --persistent_session: spark_session.py runs all Spark steps of ss, returns {log path: its step}.
+    '''
+    log_dir = experiment.log_dir
+    command = ["python3", os.path.join(script_dir, "spark_session.py"), log_dir, experiment.commands["sql"][0],
+               experiment.commands["df"][0]] + experiment.spark_args + ["--formats"] + experiment_formats["ss"]
+    session = experiment.add_step(
+        "spark_session", lambda: run_command(command, os.path.join(log_dir, "log_spark_session"),
+                                             env=experiment.get_env("sql")), after)
+    return {os.path.join(log_dir, log.format(format_type)): session
+            for format_type in experiment_formats["ss"] for _, _, log in e2e_steps if log is not None}
+
+
+def run_graph(steps, max_workers):
+    '''
+    Runs every step once its deps are done, at most max_workers at a time, in the order they were added otherwise.
+    '''
+    pending = list(steps)
+    done = set()
+    running = dict()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [step for step in pending if all(dep in done for dep in step.deps)]
+            for step in ready:
+                pending.remove(step)
+                running[executor.submit(step.run)] = step
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = future.result()
+                del running[future]
+                done.add(step)
+                if step.seconds is None:
+                    print("{0} {1}: {2}".format(step.experiment.name, step.name, step.status))
+                else:
+                    print("{0} {1}: {2}, {3:.1f} seconds".format(step.experiment.name, step.name, step.status,
+                                                                  step.seconds))
+
+
+def write_durations(experiment):
+    durations = {step.name: {"status": step.status, "start": step.start, "seconds": step.seconds}
+                 for step in experiment.steps}
+    with open(os.path.join(experiment.log_dir, durations_file), "w") as outfile:
+        json.dump(durations, outfile, indent=4)
+
+
+def get_package_jars(cache_dir):
+    # None without a package cache, every launch then resolves the packages itself
+    if not os.path.isdir(cache_dir):
+        return None
+    stale_reason = get_stale_reason(cache_dir, default_packages, os.environ["SPARK_HOME_E2E"])
+    if stale_reason is not None:
+        sys.exit("The package cache in {0} is stale: {1}. Run python3 package_cache.py resolve --cache_dir {0} "
+                 "again!".format(cache_dir, stale_reason))
+    return get_jars(cache_dir)
+
+
+def validate_environment_variables():
+    for variable in env_variables:
+        value = os.environ.get(variable, "")
+        if value == "":
+            sys.exit("Set the {0} environment variable before executing the experiments!".format(variable))
+        if not os.path.isdir(value):
+            sys.exit("Set {0} to a VALID DIRECTORY before executing the experiments! Current value: {1}".format(
+                variable, value))
+
+
+def hive_metastore_is_up():
+    try:
+        socket.create_connection(("localhost", hms_port), timeout=5).close()
+        return True
+    except OSError:
+        return False
+
+
+def start_hive_metastore(log_dirs):
+    '''
+    Starts the Hive metastore service and waits until it accepts connections, returns its process, None if one
+    is already running.
+    '''
+    if hive_metastore_is_up():
+        print("Reusing the Hive Metastore running on port {0}!".format(hms_port))
+        return None
+    start = time.time()
+    process = subprocess.Popen([os.path.join(os.environ["HIVE_HOME"], "bin", "hive"), "--service", "metastore"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    print("Waiting for the Hive Metastore to accept connections on port {0}.".format(hms_port))
+    while not hive_metastore_is_up():
+        if process.poll() is not None:
+            sys.exit("The Hive Metastore exited during startup!")
+        if time.time() - start > hms_startup_timeout:
+            stop_hive_metastore(process)
+            sys.exit("The Hive Metastore did not come up within {0} seconds!".format(hms_startup_timeout))
+        time.sleep(0.5)
+    startup_ms = int((time.time() - start) * 1000)
+    print("Hive Metastore is running with Process ID {0}, startup took {1} ms!".format(process.pid, startup_ms))
+    for log_dir in log_dirs:
+        with open(os.path.join(log_dir, "metastore_startup_ms"), "a") as outfile:
+            outfile.write("{0}\n".format(startup_ms))
+    return process
+
+
+def stop_hive_metastore(process):
+    if process is None:
+        return
+    print("Stopping Hive Metastore with Process ID {0}!".format(process.pid))
+    process.terminate()
+    try:
+        process.wait(hms_shutdown_timeout)
+    except subprocess.TimeoutExpired:
+        print("Killing Hive Metastore with Process ID {0}!".format(process.pid))
+        process.kill()
+        process.wait()
+
+
+def get_log_dirs(args, ts):
+    if args.resume is not None:
+        if len(args.experiments) != 1:
+            sys.exit("--resume continues the run of one experiment!")
+        if not os.path.isdir(args.resume):
+            sys.exit("Cannot resume {0}, it is not a log directory!".format(args.resume))
+        return [os.path.abspath(args.resume)]
+    log_dirs = []
+    for experiment in args.experiments:
+        log_dir = os.path.join(script_dir, "logs", experiment_drivers[experiment], ts)
+        if args.shard_index is not None:
+            # the shards of a run are usually started at the same time
+            log_dir += "_shard{0}".format(args.shard_index)
+        log_dirs.append(log_dir)
+    return log_dirs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(usage=__doc__.strip().split("\n\n")[-1])
+    parser.add_argument('experiments', nargs='+', choices=sorted(experiment_drivers))
+    parser.add_argument('--max_workers', type=int, default=4, help="steps run at once")
+    parser.add_argument('--persistent_session', action='store_true',
+                        help="run the Spark steps of ss through one spark-sql and spark-shell (spark_session.py)")
+    parser.add_argument('--parallel_formats', type=int, default=0, metavar='N',
+                        help="give every format of ss its own warehouse and metastore (parallel_formats.py), N "
+                             "formats at a time")
+    parser.add_argument('--df_app', action='store_true',
+                        help="run the DataFrame scripts as compiled Spark applications (df_app.py)")
+    parser.add_argument('--package_cache', type=str, default=default_cache_dir, metavar='dir',
+                        help="jars of the --packages resolved by package_cache.py resolve, used if the dir exists")
+    parser.add_argument('--resume', type=str, metavar='log_dir',
+                        help="continue an interrupted run in its log directory, skipping its completed steps")
+    parser.add_argument('--statement_timeout', type=int, default=600, metavar='S',
+                        help="restart a CLI from the next statement after S seconds without a prompt, 0 for never")
+    parser.add_argument('--session_timeout', type=int, default=10800, metavar='S',
+                        help="fail a step whose CLIs run longer than S seconds, 0 for never")
+    args, value_gen_args = parser.parse_known_args()
+    # everything else is passed on to value_gen.py, --df_app as well
+    args.value_gen_args = value_gen_args + (["--df_app"] if args.df_app else [])
+    args.shard_index = None
+    for i, arg in enumerate(value_gen_args):
+        if arg.startswith("--shard_index="):
+            args.shard_index = arg.split("=", 1)[1]
+        elif arg == "--shard_index" and i + 1 < len(value_gen_args):
+            args.shard_index = value_gen_args[i + 1]
+    if args.df_app and (args.persistent_session or args.parallel_formats):
+        parser.error("--df_app only applies to the serial run, not to --persistent_session or --parallel_formats")
+    if args.persistent_session and args.parallel_formats:
+        parser.error("--persistent_session cannot be combined with --parallel_formats")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    validate_environment_variables()
+    args.package_jars = get_package_jars(args.package_cache)
+    ts = time.strftime(ts_format)
+    experiments = []
+    for name, log_dir in zip(args.experiments, get_log_dirs(args, ts)):
+        os.makedirs(log_dir, exist_ok=True)
+        experiments.append(Experiment(name, log_dir, args))
+    uses_metastore = build_graph(experiments, args)
+    # with --parallel_formats, the formats of ss run at most that many steps at once
+    max_workers = args.parallel_formats if args.parallel_formats and args.experiments == ["ss"] else args.max_workers
+    start = time.time()
+    metastore = start_hive_metastore([e.log_dir for e in experiments]) if uses_metastore else None
+    try:
+        run_graph([step for experiment in experiments for step in experiment.steps], max_workers)
+    finally:
+        stop_hive_metastore(metastore)
+    for experiment in experiments:
+        write_durations(experiment)
+    print("All experiments: {0:.1f} seconds".format(time.time() - start))
+    if any(step.required and step.status not in ("ok", "completed")
+           for experiment in experiments for step in experiment.steps):
+        sys.exit(1)
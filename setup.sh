@@ -13,3 +13,6 @@ $HADOOP_HOME/bin/hadoop fs -mkdir /tmp
 $HADOOP_HOME/bin/hadoop fs -chmod g+w /tmp
 $HADOOP_HOME/bin/hadoop fs -mkdir -p /user/hive/warehouse
 $HADOOP_HOME/bin/hadoop fs -chmod g+w /user/hive/warehouse
+
+# Resolve the --packages of the Spark CLIs once, the experiments then pass the jars with --jars (see package_cache.py)
+python3 "$(dirname "$0")"/package_cache.py resolve
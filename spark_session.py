@@ -0,0 +1,164 @@
+'''
+Runs the Spark steps of spark_e2e.sh through one long-lived spark-sql and one long-lived spark-shell instead of
+starting a new JVM for every step. The generated w_*/r_* scripts are streamed into the sessions and the output of
+each step is split into the same log_* files the drivers tee to, so get_tables.py works on them unchanged.
+
+python3 spark_session.py <log_dir> <spark_sql> <spark_shell> --packages org.apache.spark:spark-avro_2.12:3.2.1
+python3 spark_session.py <log_dir> <spark_sql> <spark_shell> --jars <the jars of package_cache.py>
+'''
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from step_manifest import log_prefix, record_step, steps_completed
+
+# Steps of spark_e2e.sh for one format: (session, script, log), session None drops all tables
+e2e_steps = [
+    (None, None, None),
+    ("sql", "w_sql_{0}", "log_w_sql_{0}"),
+    ("sql", "r_sql_{0}", "log_w_sql_r_sql_{0}"),
+    ("df", "r_df_{0}", "log_w_sql_r_df_{0}"),
+    (None, None, None),
+    ("df", "w_df_{0}", "log_w_df_{0}"),
+    ("sql", "r_sql_{0}", "log_w_df_r_sql_{0}"),
+    ("df", "r_df_{0}", "log_w_df_r_df_{0}"),
+]
+
+table_name_regex = re.compile(r"from (\w+);")
+
+
+def get_step_groups(steps):
+    # The steps between two drops of the tables: a write and the reads of the tables it wrote
+    groups = []
+    for step in steps:
+        if step[0] is None:
+            groups.append([])
+        else:
+            groups[-1].append(step)
+    return [group for group in groups if group]
+
+
+def get_step_name(log, format_type):
+    # the name of a step in the step manifest, w_sql_orc for log_w_sql_orc
+    return log.format(format_type)[len(log_prefix):]
+
+
+class ReplSession:
+    '''
+    A spark-sql or spark-shell process kept open behind a pipe. After each script a marker statement is sent, and
+    the output up to the marker's result is the output of that script.
+    '''
+
+    def __init__(self, name, command, log_dir):
+        self.name = name
+        self.marker_count = 0
+        self.session_log = open(os.path.join(log_dir, "log_session_" + name), "w")
+        start = time.time()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self.run("")
+        print("Started {0} session in {1:.1f} seconds".format(name, time.time() - start))
+
+    def marker_statement(self, marker):
+        if self.name == "sql":
+            return "select '{0}';\n".format(marker)
+        return 'println("{0}")\n'.format(marker)
+
+    def refresh_statements(self, table_names):
+        if self.name == "sql":
+            return "".join("refresh table {0};\n".format(t) for t in table_names)
+        return "".join('scala.util.Try(spark.catalog.refreshTable("{0}"))\n'.format(t) for t in table_names)
+
+    def drop_statements(self, table_names):
+        if self.name == "sql":
+            return "".join("drop table if exists {0};\n".format(t) for t in table_names)
+        return "".join('spark.sql("drop table if exists {0};")\n'.format(t) for t in table_names)
+
+    def run(self, statements, log_path=None):
+        self.marker_count += 1
+        marker = "csi_{0}_done_{1}".format(self.name, self.marker_count)
+        if statements and not statements.endswith("\n"):
+            statements += "\n"
+        # written from another thread, the session blocks on a full stdout pipe while we are still writing
+        writer = threading.Thread(target=self._write, args=(statements + self.marker_statement(marker),))
+        writer.start()
+        log = open(log_path, "w") if log_path else self.session_log
+        for line in self.process.stdout:
+            if line.rstrip().endswith(marker):
+                break
+            if marker in line:
+                continue
+            log.write(line)
+            if log_path:
+                sys.stdout.write(line)
+        else:
+            raise RuntimeError("The {0} session exited, see its output in {1}".format(self.name, log.name))
+        writer.join()
+        if log_path:
+            log.close()
+        else:
+            log.flush()
+
+    def _write(self, statements):
+        self.process.stdin.write(statements)
+        self.process.stdin.flush()
+
+    def close(self):
+        self.process.stdin.write("quit;\n" if self.name == "sql" else ":quit\n")
+        self.process.stdin.close()
+        for line in self.process.stdout:
+            self.session_log.write(line)
+        self.process.wait()
+        self.session_log.close()
+
+
+def get_table_names(script_path):
+    with open(script_path, "r") as infile:
+        return table_name_regex.findall(infile.read())
+
+
+def run_steps(sessions, steps, log_dir, formats):
+    # groups of steps completed in an earlier run of the log directory are skipped, see step_manifest.py
+    for format_type in formats:
+        table_names = get_table_names(os.path.join(log_dir, "r_sql_" + format_type))
+        for group in get_step_groups(steps):
+            if steps_completed(log_dir, [get_step_name(log, format_type) for _, _, log in group]):
+                continue
+            sessions["sql"].run(sessions["sql"].drop_statements(table_names))
+            for session_name, script, log in group:
+                session = sessions[session_name]
+                script = script.format(format_type)
+                if script.startswith("r_"):
+                    # tables may have been rewritten by the other session since this one last read them
+                    session.run(session.refresh_statements(table_names))
+                start = time.time()
+                with open(os.path.join(log_dir, script), "r") as infile:
+                    session.run(infile.read(), os.path.join(log_dir, log.format(format_type)))
+                record_step(log_dir, get_step_name(log, format_type))
+                print("{0}: {1:.1f} seconds".format(log.format(format_type), time.time() - start))
+        sessions["sql"].run(sessions["sql"].drop_statements(table_names))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log_dir', type=str)
+    parser.add_argument('spark_sql', type=str)
+    parser.add_argument('spark_shell', type=str)
+    parser.add_argument('--packages', type=str)
+    parser.add_argument('--jars', type=str)
+    parser.add_argument('--formats', type=str, nargs='+', default=["parquet", "orc", "avro"])
+    args = parser.parse_args()
+
+    spark_args = (["--jars", args.jars] if args.jars else []) + (["--packages", args.packages] if args.packages else [])
+    sessions = {"sql": ReplSession("sql", [args.spark_sql] + spark_args, args.log_dir),
+                "df": ReplSession("df", [args.spark_shell] + spark_args, args.log_dir)}
+    try:
+        run_steps(sessions, e2e_steps, args.log_dir, args.formats)
+    finally:
+        for session in sessions.values():
+            session.close()
@@ -0,0 +1,73 @@
+'''
+Step manifest of a driver run. Every step that completes appends "<step>\t<sha256 of its log>" to
+<log_dir>/step_manifest, a step being named after its log (w_sql_orc for log_w_sql_orc, value_gen for
+log_value_gen). A step counts as completed as long as its log still has the recorded checksum.
+
+run_experiments.py and spark_session.py skip a group of steps, a write and the reads of the tables it wrote, if all of
+its steps are completed, and re-run the whole group otherwise, since the reads need the tables of the write. So a run
+resumed with --resume=<log_dir> only re-runs what is missing.
+
+python3 step_manifest.py record <log_dir> <step>
+python3 step_manifest.py completed <log_dir> <step> ... exits with 0 if all steps are completed
+'''
+
+import argparse
+import hashlib
+import os
+import sys
+
+manifest_file = "step_manifest"
+log_prefix = "log_"
+
+
+def get_log_path(log_dir, step):
+    return os.path.join(log_dir, log_prefix + step)
+
+
+def get_log_checksum(log_dir, step):
+    checksum = hashlib.sha256()
+    with open(get_log_path(log_dir, step), "rb") as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def record_step(log_dir, step):
+    # a single short append, so the steps run concurrently by run_experiments.py can record their steps concurrently
+    record = "{0}\t{1}\n".format(step, get_log_checksum(log_dir, step))
+    with open(os.path.join(log_dir, manifest_file), "a") as outfile:
+        outfile.write(record)
+
+
+def get_recorded_steps(log_dir):
+    # {step: checksum}, the last record of a step wins
+    recorded_steps = dict()
+    manifest_path = os.path.join(log_dir, manifest_file)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as infile:
+            for line in infile:
+                step, _, checksum = line.rstrip("\n").partition("\t")
+                recorded_steps[step] = checksum
+    return recorded_steps
+
+
+def steps_completed(log_dir, steps):
+    recorded_steps = get_recorded_steps(log_dir)
+    return all(step in recorded_steps and os.path.exists(get_log_path(log_dir, step)) and
+               get_log_checksum(log_dir, step) == recorded_steps[step] for step in steps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=["record", "completed"])
+    parser.add_argument('log_dir', type=str)
+    parser.add_argument('steps', type=str, nargs='+')
+    args = parser.parse_args()
+
+    if args.command == "record":
+        for step in args.steps:
+            record_step(args.log_dir, step)
+    elif steps_completed(args.log_dir, args.steps):
+        print("Skipping {0}, completed in an earlier run".format(" ".join(args.steps)))
+    else:
+        sys.exit(1)
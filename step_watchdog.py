@@ -0,0 +1,195 @@
+'''
+Runs the CLI of a step under a watchdog. The script is fed to the CLI's stdin and the output, written to the step's
+log, is watched for the prompt the CLI echoes every command after (spark-sql>, scala>, hive>). A command followed by
+no prompt within the statement timeout hangs: the CLI is killed, a "csi_timeout:" line is written to the log after
+the command's output, and a new CLI continues with the command after it, running the set/use statements (the imports
+and spark.sql("use ...") of spark-shell) of the script again first. A step running longer than the session timeout,
+restarts included, is killed and fails. inspect_result.py reports the rows of a timed out statement apart from the
+ones that found an exception.
+
+python3 step_watchdog.py <log> <sql|df|hql> <script> [--statement_timeout S] [--session_timeout S] -- <command> ...
+e.g. python3 step_watchdog.py logs/x/log_w_sql_orc sql logs/x/w_sql_orc --statement_timeout 600 -- spark-sql
+'''
+
+import argparse
+import re
+import subprocess
+import sys
+import threading
+import time
+
+timeout_marker = "csi_timeout:"
+prompt_regex = re.compile(r"^(?:spark-sql|scala|hive)> ?(?P<echo>.*)$")
+# commands that set the session up rather than belong to a row, they run again in a restarted CLI
+setup_regexes = {"sql": re.compile(r"^(?:set|use|add jar) ", re.IGNORECASE),
+                 "hql": re.compile(r"^(?:set|use|add jar) ", re.IGNORECASE),
+                 "df": re.compile(r'^(?:import |spark\.sql\("use |spark\.conf\.set\()')}
+poll_seconds = 0.5
+
+
+def split_commands(script, session_name):
+    '''
+    Splits a script into the commands the CLI reads one at a time: the lines up to one ending with ';' for spark-sql
+    and the Hive CLI, every line that is not empty for spark-shell.
+    '''
+    commands, buffer = [], ""
+    for line in script.splitlines(keepends=True):
+        if not line.endswith("\n"):
+            line += "\n"
+        if session_name == "df":
+            if line.strip():
+                commands.append(line)
+            continue
+        buffer += line
+        if line.strip().endswith(";"):
+            commands.append(buffer)
+            buffer = ""
+    if buffer.strip():
+        commands.append(buffer)
+    return commands
+
+
+def get_echo(command):
+    # the line the CLI echoes after its prompt
+    return command.strip().split("\n")[0].strip()
+
+
+class WatchedCli:
+    '''
+    One launch of the CLI on a list of commands. The output is copied to the log from a reader thread, which notes
+    when the last prompt showed and which command it echoed.
+    '''
+
+    def __init__(self, command, commands, log, env=None, cwd=None):
+        self.commands = commands
+        self.echoes = [get_echo(c) for c in commands]
+        # the index of the command the last prompt echoed, None before the first
+        self.current = None
+        self.after_current = False
+        self.last_prompt = time.time()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, env=env, cwd=cwd)
+        # written from another thread, the CLI blocks on a full stdout pipe while we are still writing
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.reader = threading.Thread(target=self._read, args=(log,), daemon=True)
+        self.writer.start()
+        self.reader.start()
+
+    def _write(self):
+        try:
+            for command in self.commands:
+                self.process.stdin.write(command.encode())
+            self.process.stdin.close()
+        except OSError:
+            # the CLI exited or was killed before reading all of it
+            pass
+
+    def _read(self, log):
+        for line in self.process.stdout:
+            line = line.decode(errors="replace")
+            log.write(line)
+            match = prompt_regex.match(line)
+            if match is not None:
+                self.last_prompt = time.time()
+                self._advance(match.group("echo").strip())
+                log.flush()
+        log.flush()
+
+    def _advance(self, echo):
+        start = 0 if self.current is None else self.current + 1
+        try:
+            self.current = self.echoes.index(echo, start)
+            self.after_current = False
+        except ValueError:
+            # the prompt after the last command, or an echo that does not match the script
+            self.after_current = True
+
+    def finished_commands(self):
+        # whether the CLI prompted again after echoing its last command, a hang is then on its way out
+        return self.after_current and self.current == len(self.commands) - 1
+
+    def wait(self, statement_timeout, deadline):
+        '''
+        Waits for the CLI to exit, returns None if it did, "statement" or "session" if it was killed for hanging on
+        a command or for running past the deadline.
+        '''
+        timeout = None
+        while timeout is None:
+            try:
+                self.process.wait(poll_seconds)
+                break
+            except subprocess.TimeoutExpired:
+                now = time.time()
+                if deadline is not None and now > deadline:
+                    timeout = "session"
+                elif statement_timeout and now - self.last_prompt > statement_timeout:
+                    timeout = "statement"
+        if timeout is not None:
+            self.process.kill()
+            self.process.wait()
+        self.reader.join()
+        self.writer.join()
+        return timeout
+
+
+def run_watched(command, log_path, session_name, script=None, statement_timeout=0, session_timeout=0, env=None,
+                cwd=None):
+    '''
+    Runs command on the script (None for a command that reads no stdin) and writes its output to log_path, returns
+    whether the last CLI exited with 0 and the step ran within the session timeout. Timeouts of 0 do not apply.
+    '''
+    commands = split_commands(script, session_name) if script is not None else []
+    setup = [c for c in commands if setup_regexes[session_name].match(c.strip())]
+    start = time.time()
+    deadline = start + session_timeout if session_timeout else None
+    position = 0
+    with open(log_path, "w") as log:
+        while True:
+            replayed = setup if position > 0 else []
+            cli = WatchedCli(command, replayed + commands[position:], log, env, cwd)
+            timeout = cli.wait(statement_timeout, deadline)
+            if timeout is None:
+                return cli.process.returncode == 0
+            if timeout == "session":
+                log.write("{0} session timed out after {1} seconds, the statements after it did not run\n".format(
+                    timeout_marker, session_timeout))
+                print("{0}: session timed out after {1} seconds".format(log_path, session_timeout), file=sys.stderr)
+                return False
+            if cli.finished_commands():
+                # all commands ran, the CLI hung on exiting
+                return True
+            if cli.current is None or cli.current < len(replayed):
+                # no command of the script started, restarting would hang the same way
+                log.write("{0} no prompt within {1} seconds of starting the CLI\n".format(timeout_marker,
+                                                                                        statement_timeout))
+                print("{0}: the CLI did not start within {1} seconds".format(log_path, statement_timeout),
+                      file=sys.stderr)
+                return False
+            position += cli.current - len(replayed) + 1
+            restart = position < len(commands)
+            log.write("{0} statement timed out after {1} seconds{2}\n".format(
+                timeout_marker, statement_timeout, ", restarted the CLI from the next statement" if restart else ""))
+            log.flush()
+            print("{0}: statement {1} timed out after {2} seconds".format(
+                log_path, get_echo(cli.commands[cli.current]), statement_timeout), file=sys.stderr)
+            if not restart:
+                return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log', type=str)
+    parser.add_argument('session', choices=sorted(setup_regexes))
+    parser.add_argument('script', type=str)
+    parser.add_argument('--statement_timeout', type=int, default=0, metavar='S')
+    parser.add_argument('--session_timeout', type=int, default=0, metavar='S')
+    # the command of the CLI follows --
+    if "--" not in sys.argv[:-1]:
+        parser.error("the command of the CLI is missing, give it after --")
+    split = sys.argv.index("--")
+    args = parser.parse_args(sys.argv[1:split])
+    command = sys.argv[split + 1:]
+    with open(args.script, "r") as infile:
+        script = infile.read()
+    sys.exit(0 if run_watched(command, args.log, args.session, script, args.statement_timeout,
+                              args.session_timeout) else 1)
@@ -3,14 +3,8 @@
 import argparse
 import re
 
-equivalence_classes = [
-    {"NULL", "null"},
-    {'{"12831273.24":3.141592653589793E-305}', '{12831273.24->3.141592653589793E-305}',
-     '{12831273.243.141592653589793E-305'},
-    {'{-2147483648->{12831273.24->3.141592653589793E-305}}', '{-2147483648:{12831273.243.141592653589793E-305',
-     '{-2147483648:{"12831273.24":3.141592653589793E-305}}'}
-
-]
+from canonical_value import is_equivalent
+from get_tables import parse_json_row
 
 wr_fp = [
     (117, "spark"),
@@ -29,10 +23,15 @@ def by_tag(filename):
     m = {}
     with open(filename, 'r') as rf:
         for line in rf:
+            if line.startswith("{"):
+                idx, val = parse_json_row(line)
+                m[int(idx)] = val
+                continue
             elements = re.split('\||\t', line.replace('\n', ''))
             elements = [x for x in elements if x != ""]
             idx = int(elements[0])
-            m[idx] = ''.join(elements[1:])
+            # keep a separator between the split parts, e.g. between the key and value of a Hive map
+            m[idx] = ' '.join(elements[1:])
     return m
 
 
@@ -45,15 +44,10 @@ def get_diff(m1, m2, first):
             if first == 0:
                 m1_clean = rm_whitespace(m1[k])
                 m2_clean = rm_whitespace(m2[k])
-                if m1_clean != m2_clean:
-                    in_same_equiv = False
-                    for c in equivalence_classes:
-                        if m1_clean in c and m2_clean in c:
-                            in_same_equiv = True
-                    if not in_same_equiv:
-                        wr.append('{0} {1} || {2}'.format(k, m1[k], first))
-                        wr.append('{0} {1} || {2}'.format(k, m2[k], 1-first))
-                        stats["wr"] += 1
+                if m1_clean != m2_clean and not is_equivalent(m1[k], m2[k]):
+                    wr.append('{0} {1} || {2}'.format(k, m1[k], first))
+                    wr.append('{0} {1} || {2}'.format(k, m2[k], 1-first))
+                    stats["wr"] += 1
         else:
             if first == 0:
                 if (k, m1[k]) not in wr_fp:
@@ -0,0 +1,166 @@
+'''
+Per-statement latencies of a run. spark-sql and the Hive CLI print "Time taken: X seconds" after every statement
+(spark-shell prints nothing alike, so df steps are not timed); each of those lines is attributed to the statement it
+follows: its kind (drop, create, insert, select, other), the row it belongs to (wsN, or the row of a
+"select (N, ...)" / batched row insert) or the batched table (wsbN, see value_gen.py --batched), and the type of the
+row (t_original.json).
+
+Writes next to the *_results.json files of inspect_result.py:
+<log_dir><interface>_timings.csv, one line per timed statement
+<log_dir><interface>_timings.json, the seconds per step, and the distribution (count, total, mean, p50, p90, max) per
+format, interface of the step, type and statement kind
+
+python3 timing_report.py logs_dir (with \) interface
+e.g. python3 timing_report.py logs/2022.04.16-15.36.49/ ss
+'''
+
+import argparse
+import csv
+import json
+import math
+import os
+import re
+from collections import defaultdict
+
+original_table_file, batches_file = "t_original.json", "t_batches.json"
+timings_csv_suffix, timings_json_suffix = "_timings.csv", "_timings.json"
+# log_w_<write interface>_<format>, log_w_<write interface>_r_<read interface>_<format> or, for the one way runs,
+# log_w_<write interface>_w_<write interface>_<format>; the step runs on the interface named last
+log_step_regex = re.compile(r"^log_(w_(sql|df|hql)(?:_[rw]_(sql|df|hql))?_([a-z]+))$")
+prompt_regex = re.compile(r"(?:spark-sql|hive)> ")
+time_taken_regex = re.compile(r"^Time taken: (?P<seconds>[\d.]+) seconds")
+statement_kind_regex = re.compile(r"^(?:(?P<drop>drop )|(?P<create>create )"
+                                  r"|(?P<insert>insert |from \(select 1\) dual insert )|(?P<select>select ))",
+                                  re.IGNORECASE)
+# the leftmost match wins: the row of a write-side select or of a batched row insert, else the table
+statement_row_regex = re.compile(r"^select \((?P<select_row>\d+), "
+                                 r"|^insert into (?P<insert_table>wsb\d+) select (?P<insert_row>\d+), "
+                                 r"|\bws(?P<row>\d+)\b|\b(?P<table>wsb\d+)\b")
+csv_columns = ["step", "format", "interface", "kind", "table", "row", "type", "seconds"]
+percentiles = {"p50": 0.5, "p90": 0.9}
+
+
+def get_statement_kind(statement):
+    match = statement_kind_regex.match(statement)
+    return "other" if match is None else match.lastgroup
+
+
+def get_statement_target(statement):
+    '''
+    Returns (table, row) of a statement, row being None for the statements of a batched table, table being None if
+    only the row is named and both None for statements that belong to no input.
+    '''
+    match = statement_row_regex.search(statement)
+    if match is None:
+        return None, None
+    if match.lastgroup == "table":
+        return match.group("table"), None
+    return match.group("insert_table"), match.group(match.lastgroup)
+
+
+def iter_log_timings(logfile):
+    '''
+    Yields (statement, seconds) for every timed statement of a log. A statement that failed prints no timing and is
+    dropped at the next prompt.
+    '''
+    statement = None
+    with open(logfile, "r", errors="replace") as infile:
+        for line in infile:
+            prompts = prompt_regex.split(line)
+            if len(prompts) > 1:
+                statement = prompts[-1].strip() or None
+                continue
+            match = time_taken_regex.match(line)
+            if match is not None and statement is not None:
+                yield statement, float(match.group("seconds"))
+                statement = None
+
+
+def load_row_types(log_dir):
+    # {row: type}, {batched table: type of its rows, "mixed" if they differ} and {row: batched table}
+    row_types, row_tables = dict(), dict()
+    if os.path.exists(log_dir + original_table_file):
+        with open(log_dir + original_table_file, "r") as infile:
+            row_types = {row: entry["type"] for row, entry in json.load(infile).items()}
+    table_types = dict()
+    if os.path.exists(log_dir + batches_file):
+        with open(log_dir + batches_file, "r") as infile:
+            for table, rows in json.load(infile).items():
+                row_tables.update((str(row), table) for row in rows)
+                types = {row_types.get(str(row)) for row in rows} - {None}
+                table_types[table] = types.pop() if len(types) == 1 else "mixed" if types else None
+    return row_types, table_types, row_tables
+
+
+def get_timings(log_dir):
+    row_types, table_types, row_tables = load_row_types(log_dir)
+    timings = []
+    for log_file in sorted(os.listdir(log_dir)):
+        match = log_step_regex.match(log_file)
+        if match is None:
+            continue
+        step, write_interface, other_interface, format_type = match.groups()
+        for statement, seconds in iter_log_timings(log_dir + log_file):
+            table, row = get_statement_target(statement)
+            if table is None and row is not None:
+                table = row_tables.get(row, "ws" + row)
+            timings.append({
+                "step": step,
+                "format": format_type,
+                "interface": other_interface or write_interface,
+                "kind": get_statement_kind(statement),
+                "table": table,
+                "row": row,
+                "type": row_types.get(row) if row is not None else table_types.get(table),
+                "seconds": seconds
+            })
+    return timings
+
+
+def get_distribution(seconds):
+    seconds = sorted(seconds)
+    distribution = {"count": len(seconds), "total": round(sum(seconds), 6),
+                    "mean": round(sum(seconds) / len(seconds), 6)}
+    for name, fraction in percentiles.items():
+        # nearest rank
+        distribution[name] = seconds[max(math.ceil(fraction * len(seconds)) - 1, 0)]
+    distribution["max"] = seconds[-1]
+    return distribution
+
+
+def summarize_timings(timings):
+    step_seconds = defaultdict(list)
+    group_seconds = defaultdict(list)
+    for timing in timings:
+        step_seconds[timing["step"]].append(timing["seconds"])
+        key = (timing["format"], timing["interface"], timing["type"] or "", timing["kind"])
+        group_seconds[key].append(timing["seconds"])
+    return {
+        "steps": {step: {"count": len(seconds), "total": round(sum(seconds), 6)}
+                  for step, seconds in sorted(step_seconds.items())},
+        "statements": [dict(zip(["format", "interface", "type", "kind"], key), **get_distribution(seconds))
+                       for key, seconds in sorted(group_seconds.items())]
+    }
+
+
+def write_timing_report(log_dir, interface):
+    timings = get_timings(log_dir)
+    with open(log_dir + interface + timings_csv_suffix, "w", newline="") as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=csv_columns)
+        writer.writeheader()
+        writer.writerows(timings)
+    summary = summarize_timings(timings)
+    with open(log_dir + interface + timings_json_suffix, "w") as outfile:
+        json.dump(summary, outfile, indent=4)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log_dir', type=str)
+    parser.add_argument('interface', type=str, choices=["ss", "sh", "hs"])
+    args = parser.parse_args()
+
+    summary = write_timing_report(args.log_dir, args.interface)
+    for step, step_summary in summary["steps"].items():
+        print("{0}: {1} statements, {2:.2f} seconds".format(step, step_summary["count"], step_summary["total"]))
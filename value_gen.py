@@ -2,7 +2,18 @@ from enum import Enum
 import json
 import argparse
 import os
+import datetime
+import itertools
+import math
 import random
+import struct
+from contextlib import ExitStack
+from decimal import Decimal
+from functools import lru_cache
+
+import result_cache
+from df_app import write_app
+from get_tables import json_row_tag
 
 
 class Type:
@@ -78,6 +89,19 @@ def get_expected_val(gen, interface):
     return get_expected(gen).values[interface].value
 
 
+@lru_cache(maxsize=None)
+def get_gen_values(gen_fn, interface, *type_args):
+    '''
+    Returns the values of a generator as a tuple. They are built on the first call per (generator, interface, type
+    arguments) and shared by all later callers, e.g. the map and array generators reuse the string and double values.
+    '''
+    return tuple(gen_fn(*type_args, interface))
+
+
+def get_gen_count(gen_fn, interface, *type_args):
+    return len(get_gen_values(gen_fn, interface, *type_args))
+
+
 # TODO can refactor to combine this and make_type functions
 def operator_str(op, interface):
     if interface in [Interface.SQL, Interface.HQL]:
@@ -328,14 +352,14 @@ def gen_valid_varchar(size, interface):
         val = get_val(gen, interface)
         return '"' + val[1:min(len(val) - 1, size + 1)] + '"'
 
-    keys = list(map(gen2varchar, gen_valid_string(interface)))
+    keys = list(map(gen2varchar, get_gen_values(gen_valid_string, interface)))
     ret = [([k], ExpectedValues(expr(k[1:-1]))) for k in keys]
     ret.append((['"{0}"'.format('a'*size)], ExpectedValues(expr('a'*size))))
     return ret
 
 
 def gen_valid_char(size, interface):
-    m = gen_valid_varchar(size, interface)
+    m = get_gen_values(gen_valid_varchar, interface, size)
     return [([get_val(gen, interface)],
              ExpectedValues(expr(get_expected_val(gen, interface) +
                                  " " * (size - len(get_expected_val(gen, interface)))))) for gen in m]
@@ -371,21 +395,24 @@ def gen_invalid_varchar(size, interface):
     ]
 
 
-def gen_valid_binary(interface):
-    def get_binary(n):
-        return n.to_bytes((n.bit_length() + 7) // 8, 'big', signed=True) or b'\0'
+def _get_binary(n):
+    # the bytes of BigInt(n).toByteArray, the shortest two's complement of n
+    return n.to_bytes((n if n >= 0 else ~n).bit_length() // 8 + 1, 'big', signed=True)
 
-    def make_binary(x):
-        if interface == Interface.SQL:
-            return ["X'" + str(get_binary(int(x))).replace("\\x", "").replace("b'", "")]
-        if interface == Interface.HQL:
-            return ['"' + str(get_binary(int(x))).replace("\\x", "").replace("b'", "").replace("'", "") + '"']
-        if interface == Interface.DF:
-            return ['BigInt("'+x+'").toByteArray']
 
+def _make_binary(x, interface):
+    if interface == Interface.SQL:
+        return ["X'" + _get_binary(int(x)).hex() + "'"]
+    if interface == Interface.HQL:
+        return ['"' + _get_binary(int(x)).hex() + '"']
+    if interface == Interface.DF:
+        return ['BigInt("'+x+'").toByteArray']
+
+
+def gen_valid_binary(interface):
     valid_bin = ["-2147483648", "-1", "0", "1", "2147483647"]
 
-    return [(make_binary(k), ExpectedValues(expr(None))) for k in valid_bin]
+    return [(_make_binary(k, interface), ExpectedValues(expr(None))) for k in valid_bin]
 
 
 def gen_invalid_binary(interface):
@@ -825,8 +852,8 @@ def input_array2str(a, interface):
 
 def gen_valid_map2(interface):
     # only inserts with single element for now to avoid implementing equivalence checker
-    inner_key_options = gen_valid_string(interface)
-    inner_val_options = gen_valid_double(interface)
+    inner_key_options = get_gen_values(gen_valid_string, interface)
+    inner_val_options = get_gen_values(gen_valid_double, interface)
     outer_val_options = []
     outer_val_expected = []
     ret = []
@@ -840,7 +867,7 @@ def gen_valid_map2(interface):
             inner_expected[get_expected_val(key_picked, interface)] = get_expected_val(val_picked, interface)
         outer_val_options.append(input_map2str(inner_map, interface))
         outer_val_expected.append(expected_map2str(inner_expected, True, False))
-    outer_key_options = gen_valid_int(interface)
+    outer_key_options = get_gen_values(gen_valid_int, interface)
     key_picked = outer_key_options[0]
     outer_map = {}
     outer_expected = {}
@@ -855,8 +882,8 @@ def gen_valid_map2(interface):
 
 def gen_valid_map1(interface):
     # only inserts with single element for now to avoid implementing equivalence checker
-    inner_key_options = gen_valid_string(interface)
-    inner_val_options = gen_valid_double(interface)
+    inner_key_options = get_gen_values(gen_valid_string, interface)
+    inner_val_options = get_gen_values(gen_valid_double, interface)
     outer_val_options = []
     outer_val_expected = []
     ret = []
@@ -878,7 +905,7 @@ def gen_valid_map1(interface):
 def gen_valid_array(interface):
     outer_array = []
     outer_expected = []
-    val_options = gen_valid_double(interface)
+    val_options = get_gen_values(gen_valid_double, interface)
     for i in range(2):
         picked = val_options[:i+1]
         inner_array = [get_val(v, interface) for v in picked]
@@ -908,9 +935,9 @@ def gen_valid_struct(interface):
     f12_name = (['"f12"'], ExpectedValues(expr("f12")))
     f1_name = (['"f1"'], ExpectedValues(expr("f1")))
     f2_name = (['"f2"'], ExpectedValues(expr("f2")))
-    f11_options = gen_valid_string(interface)
-    f12_options = gen_valid_double(interface)
-    f2_options = gen_valid_boolean(interface)
+    f11_options = get_gen_values(gen_valid_string, interface)
+    f12_options = get_gen_values(gen_valid_double, interface)
+    f2_options = get_gen_values(gen_valid_boolean, interface)
 
     f11_picked = f11_options[0]
     f12_picked = f12_options[0]
@@ -956,10 +983,10 @@ def input_union2str(tag, vals, interface):
 
 
 def gen_valid_union(interface):
-    int_options = gen_valid_int(interface)
-    map_options = gen_valid_map1(interface)
-    array_options = gen_valid_array(interface)
-    ts_options = gen_valid_timestamp(interface)
+    int_options = get_gen_values(gen_valid_int, interface)
+    map_options = get_gen_values(gen_valid_map1, interface)
+    array_options = get_gen_values(gen_valid_array, interface)
+    ts_options = get_gen_values(gen_valid_timestamp, interface)
 
     int_picked = int_options[0]
     map_picked = map_options[0]
@@ -984,6 +1011,322 @@ def gen_empty(interface):
     return []
 
 
+# Seeded random generators (value_gen.py --random N --seed S). Each yields N inputs of its type as (render,
+# ExpectedValues), where render(interface) gives the operators of the input like the gen_valid_* lists do. The Random
+# is seeded with the seed and the type, not the interface, so the Spark SQL, DataFrame and Hive scripts get the same
+# inputs and a seed always gives the same corpus.
+random_invalid_rate = 0.1
+random_max_width = 8
+random_string_length = 24
+random_key_length = 8
+# Code point ranges of the random strings, each drawn from as often: ASCII, Latin-1, Greek, combining marks, Hebrew,
+# CJK and emoji. Quotes, backslashes, ";" and "$" are left out, the CLIs would end, escape or substitute the
+# statement at them.
+random_string_ranges = [(0x20, 0x7e), (0xa1, 0xff), (0x391, 0x3c9), (0x300, 0x36f), (0x5d0, 0x5ea), (0x4e00, 0x9fff),
+                        (0x1f600, 0x1f64f)]
+random_string_excluded = frozenset('"\\;$')
+# also left out of the strings inside maps, arrays and structs: their separators in the CLIs' renderings (, { } [ ] :
+# and the -> of .show) would split the element when the value is parsed back, see canonical_value.py
+random_element_excluded = random_string_excluded | frozenset(",{}[]:>")
+random_date_edges = [datetime.date(1, 1, 1), datetime.date(1582, 10, 4), datetime.date(1582, 10, 15),
+                     datetime.date(1899, 12, 31), datetime.date(1900, 1, 1), datetime.date(1969, 12, 31),
+                     datetime.date(1970, 1, 1), datetime.date(2000, 2, 29), datetime.date(2038, 1, 19),
+                     datetime.date(9999, 12, 31)]
+
+
+def get_random(seed, *key):
+    return random.Random("/".join(str(x) for x in (seed,) + key))
+
+
+@lru_cache(maxsize=None)
+def get_random_alphabet(excluded=random_string_excluded):
+    # (characters, cumulative weights) for Random.choices
+    chars, cum_weights = [], []
+    for low, high in random_string_ranges:
+        range_chars = [chr(c) for c in range(low, high + 1) if chr(c) not in excluded]
+        for char in range_chars:
+            chars.append(char)
+            cum_weights.append((cum_weights[-1] if cum_weights else 0) + 1 / len(range_chars))
+    return chars, cum_weights
+
+
+def float_digits(text):
+    # ("1234", 2) for "123.40", the significant digits and the exponent of the first one
+    mantissa, _, exponent = text.partition("e")
+    integer, _, fraction = mantissa.partition(".")
+    digits = integer + fraction
+    stripped = digits.lstrip("0")
+    return stripped.rstrip("0"), int(exponent or 0) + len(integer) - 1 - (len(digits) - len(stripped))
+
+
+def java_float_str(x, single=False):
+    '''
+    Renders a float like Java's Double.toString (Float.toString if single): the shortest digits (at least 2) that
+    read back to the value, in plain notation from 1e-3 to 1e7 and as d.dddE<n> otherwise.
+    '''
+    if math.isnan(x):
+        return "NaN"
+    if math.isinf(x):
+        return "Infinity" if x > 0 else "-Infinity"
+    if x == 0:
+        return "-0.0" if math.copysign(1, x) < 0 else "0.0"
+    sign = "-" if x < 0 else ""
+    text = repr(abs(x))
+    if single:
+        for precision in range(9):
+            text = "{0:.{1}e}".format(abs(x), precision)
+            try:
+                if struct.unpack("f", struct.pack("f", float(text)))[0] == abs(x):
+                    break
+            except OverflowError:
+                # rounded past the largest float
+                continue
+    digits, point = float_digits(text)
+    if len(digits) == 1:
+        # Java picks the closest of the decimals with up to 2 digits, e.g. 4.9E-324 rather than 5.0E-324
+        digits, point = float_digits("{0:.1e}".format(abs(x)))
+    if -3 <= point < 7:
+        if point < 0:
+            return sign + "0." + "0" * (-point - 1) + digits
+        digits = digits.ljust(point + 1, "0")
+        return sign + digits[:point + 1] + "." + (digits[point + 1:] or "0")
+    return sign + digits[0] + "." + (digits[1:] or "0") + "E" + str(point)
+
+
+def random_integral(rng, bits):
+    # boundaries, values around a power of two and uniform values
+    low, high = -2 ** (bits - 1), 2 ** (bits - 1) - 1
+    pick = rng.random()
+    if pick < 0.4:
+        return rng.choice((low, low + 1, -1, 0, 1, high - 1, high))
+    if pick < 0.7:
+        return max(low, min(high, rng.choice((-1, 1)) * 2 ** rng.randrange(bits - 1) + rng.randint(-1, 1)))
+    return rng.randint(low, high)
+
+
+def random_digits(rng, n, leading_zero=True):
+    if n == 0:
+        return ""
+    return str(rng.randrange(10 ** n) if leading_zero else rng.randrange(10 ** (n - 1), 10 ** n)).zfill(n)
+
+
+def gen_random_integral(rng, count, bits, make_fn, hive_min_valid):
+    for _ in range(count):
+        if rng.random() < random_invalid_rate:
+            # out of range, inserted as a plain number like the gen_invalid_* values
+            x = str(rng.choice((-2 ** (bits - 1) - 1 - rng.randrange(2 ** bits),
+                                2 ** (bits - 1) + rng.randrange(2 ** bits))))
+            yield (lambda interface, x=x: [x]), ExpectedValues(exn(""), v3=exn(""))
+            continue
+        x = random_integral(rng, bits)
+        # Hive reads -128Y as -(128Y), which is out of range, see gen_valid_byte
+        hive_valid = hive_min_valid or x != -2 ** (bits - 1)
+        yield (lambda interface, x=str(x): make_fn(x, interface)), \
+            ExpectedValues(expr(str(x)), v3=None if hive_valid else exn(""))
+
+
+def gen_random_byte(count, seed):
+    return gen_random_integral(get_random(seed, "byte"), count, 8, _make_byte, False)
+
+
+def gen_random_short(count, seed):
+    return gen_random_integral(get_random(seed, "short"), count, 16, _make_short, False)
+
+
+def gen_random_int(count, seed):
+    return gen_random_integral(get_random(seed, "int"), count, 32, lambda x, _: [x], True)
+
+
+def gen_random_long(count, seed):
+    return gen_random_integral(get_random(seed, "long"), count, 64, _make_long, False)
+
+
+def random_float(rng, single=False):
+    '''
+    A finite float (a float32 value if single), biased towards subnormals, the largest and smallest normal
+    exponents, signed zeros and short decimals.
+    '''
+    exponent_bits, mantissa_bits, bits_format, float_format = (8, 23, "<I", "<f") if single else (11, 52, "<Q", "<d")
+    pick = rng.random()
+    if pick < 0.05:
+        return rng.choice((0.0, -0.0))
+    if pick < 0.15:
+        x = rng.randint(-10 ** 6, 10 ** 6) / rng.choice((1, 2, 4, 10, 100, 1000))
+        return struct.unpack("f", struct.pack("f", x))[0] if single else x
+    if pick < 0.35:
+        exponent = 0
+    elif pick < 0.5:
+        exponent = 2 ** exponent_bits - 2
+    elif pick < 0.6:
+        exponent = 1
+    else:
+        exponent = rng.randrange(1, 2 ** exponent_bits - 1)
+    bits = (rng.getrandbits(1) << (exponent_bits + mantissa_bits)) | (exponent << mantissa_bits) | \
+        rng.getrandbits(mantissa_bits)
+    return struct.unpack(float_format, struct.pack(bits_format, bits))[0]
+
+
+def float_literal(x):
+    # a literal all interfaces read as this double, with an exponent so Spark and Hive do not read a decimal
+    literal = repr(x)
+    return literal if "e" in literal else literal + "e0"
+
+
+def gen_random_float(count, seed):
+    rng = get_random(seed, "float")
+    for _ in range(count):
+        x = random_float(rng, single=True)
+        yield (lambda interface, x=float_literal(x): _make_float([x], interface)), \
+            ExpectedValues(expr(java_float_str(x, single=True)))
+
+
+def gen_random_double(count, seed):
+    rng = get_random(seed, "double")
+    for _ in range(count):
+        x = random_float(rng)
+        yield (lambda interface, x=float_literal(x): [x]), ExpectedValues(expr(java_float_str(x)))
+
+
+def gen_random_decimal(count, seed, precision, scale):
+    # Values with every number of integer and fraction digits the column allows, and overflowing ones
+    rng = get_random(seed, "decimal", precision, scale)
+    for _ in range(count):
+        invalid = rng.random() < random_invalid_rate
+        if invalid:
+            integer_digits = precision - scale + 1 + rng.randrange(3)
+        else:
+            integer_digits = rng.randint(0, precision - scale)
+        integer = random_digits(rng, integer_digits, leading_zero=False)
+        fraction = random_digits(rng, rng.randint(0, scale))
+        literal = rng.choice(("", "-")) + (integer or "0") + "." + fraction
+        if invalid:
+            expected = ExpectedValues(exn(""))
+        else:
+            # str of a Decimal renders like Java's BigDecimal.toString, which has no negative zero
+            value = Decimal(literal).quantize(Decimal(1).scaleb(-scale))
+            expected = ExpectedValues(expr(str(value.copy_abs() if value == 0 else value)))
+        yield (lambda interface, x=literal: [_make_decimal(x, precision, scale, interface)]), expected
+
+
+def random_string(rng, max_length=random_string_length, excluded=random_string_excluded):
+    length = rng.randint(0, max_length) if rng.random() < 0.95 else rng.randint(max_length, 8 * max_length)
+    chars, cum_weights = get_random_alphabet(excluded)
+    return "".join(rng.choices(chars, cum_weights=cum_weights, k=length))
+
+
+def gen_random_string(count, seed):
+    rng = get_random(seed, "string")
+    for _ in range(count):
+        s = random_string(rng)
+        yield (lambda interface, x='"' + s + '"': [x]), ExpectedValues(expr(s))
+
+
+def gen_random_varchar(count, seed, size):
+    rng = get_random(seed, "varchar", size)
+    for _ in range(count):
+        if rng.random() < random_invalid_rate:
+            s = '"' + random_string(rng, size + 5).ljust(size + 1, "b") + '"'
+            yield (lambda interface, x=s: _make_varchar(x, size, interface)), ExpectedValues(exn(""))
+            continue
+        s = random_string(rng, size)[:size]
+        yield (lambda interface, x='"' + s + '"': [x]), ExpectedValues(expr(s))
+
+
+def gen_random_char(count, seed, size):
+    rng = get_random(seed, "char", size)
+    for _ in range(count):
+        if rng.random() < random_invalid_rate:
+            s = '"' + random_string(rng, size + 5).ljust(size + 1, "b") + '"'
+            yield (lambda interface, x=s: _make_char(x, size, interface)), ExpectedValues(exn(""))
+            continue
+        s = random_string(rng, size)[:size]
+        yield (lambda interface, x='"' + s + '"': [x]), ExpectedValues(expr(s.ljust(size)))
+
+
+def gen_random_binary(count, seed):
+    rng = get_random(seed, "binary")
+    for _ in range(count):
+        x = str(random_integral(rng, 8 * rng.randint(1, 16)))
+        yield (lambda interface, x=x: _make_binary(x, interface)), ExpectedValues(expr(None))
+
+
+def gen_random_boolean(count, seed):
+    rng = get_random(seed, "boolean")
+    for _ in range(count):
+        x = rng.choice(("true", "false"))
+        yield (lambda interface, x=x: [x]), ExpectedValues(expr(x))
+
+
+def random_date(rng):
+    if rng.random() < 0.3:
+        return rng.choice(random_date_edges)
+    return datetime.date.fromordinal(rng.randint(1, datetime.date.max.toordinal()))
+
+
+def gen_random_date(count, seed):
+    rng = get_random(seed, "date")
+    for _ in range(count):
+        date = random_date(rng).isoformat()
+        yield (lambda interface, x=date: _make_date(x, interface)), ExpectedValues(expr(date))
+
+
+def gen_random_timestamp(count, seed):
+    rng = get_random(seed, "timestamp")
+    for _ in range(count):
+        if rng.random() < 0.3:
+            time = rng.choice(("00:00:00", "23:59:59"))
+        else:
+            time = "{0:02d}:{1:02d}:{2:02d}".format(rng.randrange(24), rng.randrange(60), rng.randrange(60))
+        timestamp = random_date(rng).isoformat() + " " + time
+        fraction = random_digits(rng, rng.randint(0, 6))
+        # the CLIs print the fraction of a second without trailing zeros
+        expected = timestamp + ("." + fraction.rstrip("0") if fraction.rstrip("0") else "")
+        timestamp += "." + fraction if fraction else ""
+        yield (lambda interface, x=timestamp: _make_timestamp(x, interface)), ExpectedValues(expr(expected))
+
+
+def random_double_map(rng):
+    # ({key literal: value literal}, expected) of a MAP<STRING, DOUBLE> with up to random_max_width entries
+    values, expected = dict(), dict()
+    for _ in range(rng.randint(1, random_max_width)):
+        key, x = random_string(rng, random_key_length, random_element_excluded), random_float(rng)
+        values['"' + key + '"'], expected[key] = float_literal(x), java_float_str(x)
+    return values, expected_map2str(expected, True, False)
+
+
+def gen_random_map1(count, seed):
+    rng = get_random(seed, "map1")
+    for _ in range(count):
+        values, expected = random_double_map(rng)
+        yield (lambda interface, x=values: [input_map2str(x, interface)]), ExpectedValues(expr(expected))
+
+
+def gen_random_map2(count, seed):
+    rng = get_random(seed, "map2")
+    for _ in range(count):
+        values, expected = dict(), dict()
+        for _ in range(rng.randint(1, random_max_width)):
+            key = str(random_integral(rng, 32))
+            values[key], expected[key] = random_double_map(rng)
+
+        def render(interface, values=values):
+            return [input_map2str({k: input_map2str(v, interface) for k, v in values.items()}, interface)]
+        yield render, ExpectedValues(expr(expected_map2str(expected, False, False)))
+
+
+def gen_random_array(count, seed):
+    rng = get_random(seed, "array")
+    for _ in range(count):
+        values = [[random_float(rng) for _ in range(rng.randint(1, random_max_width))]
+                  for _ in range(rng.randint(1, random_max_width))]
+        expected = expected_array2str([expected_array2str([java_float_str(x) for x in inner]) for inner in values])
+        values = [[float_literal(x) for x in inner] for inner in values]
+
+        def render(interface, values=values):
+            return [input_array2str([input_array2str(inner, interface) for inner in values], interface)]
+        yield render, ExpectedValues(expr(expected))
+
+
 def sqltype2sparktype(type_obj):
     def get_argstr():
         return str(tuple(type_obj.args)).replace(",)", ")")
@@ -1186,13 +1529,40 @@ interface2invalid_gen_fn = {
     Interface.HQL: hqltype2invalid_gen_fn
 }
 
+sqltype2random_gen_fn = {
+    "BYTE": gen_random_byte,
+    "SHORT": gen_random_short,
+    "INT": gen_random_int,
+    "LONG": gen_random_long,
+    "FLOAT": gen_random_float,
+    "DOUBLE": gen_random_double,
+    "DECIMAL": gen_random_decimal,
+    "STRING": gen_random_string,
+    "VARCHAR": gen_random_varchar,
+    "CHAR": gen_random_char,
+    "BINARY": gen_random_binary,
+    "BOOLEAN": gen_random_boolean,
+    "TIMESTAMP": gen_random_timestamp,
+    "DATE": gen_random_date,
+    "MAP<STRING, DOUBLE>": gen_random_map1,
+    "MAP<INT, MAP<STRING, DOUBLE>>": gen_random_map2,
+    "ARRAY<ARRAY<DOUBLE>>": gen_random_array
+}
+
+hqltype2random_gen_fn = {hql_type: sqltype2random_gen_fn[sql_type] for hql_type, sql_type in hql2sqltypes.items()}
+
+interface2random_gen_fn = {
+    Interface.SQL: sqltype2random_gen_fn,
+    Interface.HQL: hqltype2random_gen_fn
+}
+
 
 def get_stats(interface):
     stats = {"total": {"valid": 0, "invalid": 0}}
     for key in interface2valid_gen_fn[interface].keys():
         t = gen_type(key)
-        stats[key] = {"valid": len(interface2valid_gen_fn[interface][key](*t.args, interface)),
-                      "invalid": len(interface2invalid_gen_fn[interface][key](*t.args, interface))}
+        stats[key] = {"valid": get_gen_count(interface2valid_gen_fn[interface][key], interface, *t.args),
+                      "invalid": get_gen_count(interface2invalid_gen_fn[interface][key], interface, *t.args)}
     for key in interface2valid_gen_fn[interface].keys():
         stats["total"]["valid"] += stats[key]["valid"]
         stats["total"]["invalid"] += stats[key]["invalid"]
@@ -1216,32 +1586,37 @@ def expand_types(type_names):
     return expanded_types
 
 
-def gen_entries(ql_interface, dry_run=False):
+def iter_entries(ql_interface, dry_run=False, random_count=0, seed=0):
+    '''
+    Yields (column types, row, expected row) for every input of the QL interface, one input at a time. Each column of
+    the row packs its QL and DataFrame value (see pack_input). random_count seeded random inputs are added per type.
+    '''
     types = list(interface2valid_gen_fn[ql_interface].keys())
     if dry_run:
         # Choose a random type, since we do not need to test for all inputs for a dry run.
         types = [random.choice(types)]
-    type_list = expand_types(types)
-    type_objs = []
-    entries = []
-    expected_entries = []
     row_idx = 0
-    for i in range(len(type_list)):
-        ql_gen = interface2valid_gen_fn[ql_interface][type_list[i].name](*type_list[i].args, ql_interface) + \
-            interface2invalid_gen_fn[ql_interface][type_list[i].name](*type_list[i].args, ql_interface)
-        df_gen = interface2valid_gen_fn[Interface.DF][ql_interface][type_list[i].name](*type_list[i].args, Interface.DF) + \
-            interface2invalid_gen_fn[Interface.DF][ql_interface][type_list[i].name](*type_list[i].args, Interface.DF)
-        for j in range(len(ql_gen)):
-            type_objs.append([gen_type("INT"), type_list[i]])
+    for type_obj in expand_types(types):
+        ql_gen = get_gen_values(interface2valid_gen_fn[ql_interface][type_obj.name], ql_interface, *type_obj.args) + \
+            get_gen_values(interface2invalid_gen_fn[ql_interface][type_obj.name], ql_interface, *type_obj.args)
+        df_gen = get_gen_values(interface2valid_gen_fn[Interface.DF][ql_interface][type_obj.name], Interface.DF,
+                                *type_obj.args) + \
+            get_gen_values(interface2invalid_gen_fn[Interface.DF][ql_interface][type_obj.name], Interface.DF,
+                           *type_obj.args)
+        values = zip(ql_gen, df_gen)
+        if random_count:
+            # a random input is drawn once and rendered for both interfaces
+            random_gen = interface2random_gen_fn[ql_interface][type_obj.name](random_count, seed, *type_obj.args)
+            values = itertools.chain(values, (((render(ql_interface), expected), (render(Interface.DF), expected))
+                                              for render, expected in random_gen))
+        for ql_value, df_value in values:
             row = [pack_input(ql_interface, str(row_idx), str(row_idx)),
-                pack_input(ql_interface, get_val(ql_gen[j], ql_interface),
-                        get_val(df_gen[j], Interface.DF))]
+                   pack_input(ql_interface, get_val(ql_value, ql_interface),
+                              get_val(df_value, Interface.DF))]
             expected_row = [ExpectedValues(expr(str(row_idx))),
-                            get_expected(ql_gen[j])]
-            entries.append(row)
-            expected_entries.append(expected_row)
+                            get_expected(ql_value)]
+            yield [gen_type("INT"), type_obj], row, expected_row
             row_idx += 1
-    return type_objs, entries, expected_entries
 
 
 def get_rt(exp):
@@ -1254,157 +1629,427 @@ def get_rt(exp):
         return ""
 
 
-def write_original(cols, tables, expected_values, wql_interface):
-    num_tables = len(tables)
-    original_dict = dict()
-    for i in range(num_tables):
-        if all (e.name != 'INTERVAL' for e in cols[wql_interface][i]):
-            original_dict[i] = {
-                "value": tables[i][1],
-                "type": cols[wql_interface][i][1].name + cols[wql_interface][i][1].get_argstr(),
-                "valid": True if not expected_values[i][1].kind == Kind.EXCEPTION else False
-            }
-    with open(os.path.join(args.log_dir, 't_original.json'), 'w') as wf:
-        json.dump(original_dict, wf, indent=4)
+def write_rt_row(wf, expected_row):
+    # t_expected only holds the inputs expected to be written without an exception
+    if all(x.kind != Kind.EXCEPTION for x in expected_row):
+        tb_vals = [get_rt(x) for x in expected_row]
+        wf.write("\t".join(tb_vals)+"\n")
 
 
-def write_ql(cols, tables_per_ifc, expected_values_per_ifc, format_type, interoperability_test):
+def get_original_entry(row_cols, row_values, expected_row):
+    # The t_original.json entry of an input, None for inputs with an INTERVAL column
+    if any(e.name == 'INTERVAL' for e in row_cols):
+        return None
+    return {
+        "value": row_values[1],
+        "type": row_cols[1].name + row_cols[1].get_argstr(),
+        "valid": True if not expected_row[1].kind == Kind.EXCEPTION else False
+    }
+
+
+def json_entry(key, value):
+    # One entry of a dict written by json.dump(..., indent=4), so that t_original.json is written an input at a time
+    return json.dumps({key: value}, indent=4)[2:-2]
+
+
+def is_complex_type(type_obj):
+    return "<" in type_obj.name
+
+
+def read_ql_statement(ifc, table_name, type_obj):
+    if not args.json_rows:
+        return "select * from %s;\n" % table_name
+    # One tagged JSON line per row, see get_tables.py. Primitive values are cast to strings so they keep the CLI
+    # rendering, maps and arrays stay JSON.
+    if ifc == Interface.HQL:
+        # Hive has no to_json and cannot cast maps and arrays to strings, those are read as usual
+        if is_complex_type(type_obj):
+            return "select * from %s;\n" % table_name
+        return ("select concat('%s{\"c0\":', c0, ',\"c1_base64\":', "
+                "coalesce(concat('\"', base64(cast(cast(c1 as string) as binary)), '\"'), 'null'), '}') from %s;\n"
+                % (json_row_tag, table_name))
+    value = "c1" if is_complex_type(type_obj) else "cast(c1 as string)"
+    return "select concat('%s', to_json(named_struct('c0', c0, 'c1', %s))) from %s;\n" % (json_row_tag, value,
+                                                                                          table_name)
+
+
+def read_df_statement(table_name, type_obj, show='show(false)'):
+    if not args.json_rows:
+        return 'spark.sql("select * from {0};").{1}\n'.format(table_name, show)
+    value = 'col("c1")' if is_complex_type(type_obj) else 'col("c1").cast("string").as("c1")'
+    return ('spark.sql("select * from {0};").select(to_json(struct(col("c0"), {1}))).as[String].collect'
+            '.foreach(r => println("{2}" + r))\n'.format(table_name, value, json_row_tag))
+
+
+def write_ql_header(wf, ifc):
+    # This extra classpath is required when Spark is used as Hive's execution engine.
+    if ifc == Interface.HQL:
+        hive_exec_jar_path = os.path.join(os.environ.get('HIVE_HOME'), 'lib', 'hive-exec-3.1.2.jar')
+        wf.write("set spark.driver.extraClassPath=%s;\n" % hive_exec_jar_path)
+        wf.write("set spark.executor.extraClassPath=%s;\n" % hive_exec_jar_path)
+        if args.batched:
+            # The batched tables hold a few hundred rows, run their jobs locally instead of on the cluster
+            wf.write("set hive.exec.mode.local.auto=true;\n")
+            wf.write("set spark.master=local[*];\n")
+
+
+def write_df_header(wf):
+    wf.write("import org.apache.spark.sql.{Row, SparkSession}\n")
+    wf.write("import org.apache.spark.sql.types._\n")
+    wf.write("import scala.math.BigInt\n")
+
+
+def write_database_header(wf, ifc, database, fresh):
+    # The scripts of a format run in the database of the run, a write starting a group of steps recreates it so its
+    # tables start empty, and run_experiments.py drops it at the end of the run.
+    statements = ["use default", "drop database if exists %s cascade" % database,
+                  "create database %s" % database] if fresh else []
+    for statement in statements + ["use %s" % database]:
+        wf.write('spark.sql("%s;")\n' % statement if ifc == Interface.DF else statement + ";\n")
+
+
+def open_script(stack, name, format_type):
+    return stack.enter_context(open(os.path.join(args.log_dir, name + "_" + format_type), 'w'))
+
+
+def open_scripts(stack, format_type):
+    '''
+    Opens the scripts of a format on the ExitStack and writes their headers: {"w_sql": file, "r_df": file, ...}
+    '''
+    scripts = dict()
+    for ifc in system_interface.values():
+        scripts["w_" + ifc.name.lower()] = wf = open_script(stack, "w_" + ifc.name.lower(), format_type)
+        write_ql_header(wf, ifc)
+    for ifc in {rql_interface, wql_interface}:
+        scripts["r_" + ifc.name.lower()] = open_script(stack, "r_" + ifc.name.lower(), format_type)
+    for name in ["w_df", "r_df"]:
+        scripts[name] = wf = open_script(stack, name, format_type)
+        write_df_header(wf)
+    if args.database is not None:
+        for name, wf in scripts.items():
+            ifc = Interface.DF if name.endswith("_df") else Interface[name[2:].upper()]
+            write_database_header(wf, ifc, args.database + "_" + format_type,
+                                  name in ["w_" + wql_interface.name.lower(), "w_df"])
+    return scripts
+
+
+def write_hql_batch_insert(wf, table_name, row_cols, rows):
+    # Hive runs every branch of a multi-insert as its own stage, a UNION ALL of the rows is a single job. Each row
+    # casts its value to the column type, as the insert of a single row would (Hive cannot cast maps and arrays, so
+    # those keep the type of their constructor).
+    if not is_complex_type(row_cols[1]):
+        rows = [[row[0], "cast(%s as %s)" % (row[1], row_cols[1].name + row_cols[1].get_argstr())] for row in rows]
+    wf.write("insert into %s select * from (%s) batch_rows; \n" % (
+        table_name, " union all ".join("select %s" % ", ".join(row) for row in rows)))
+
+
+def write_ql(scripts, table_name, rows, format_type, interoperability_test):
+    # The statements of one input (rows holds its (i, cols, tables, expected)) in every QL script of the format.
     ql_interfaces = system_interface.values()
-    num_tables = len(tables_per_ifc[wql_interface])
-    primary_write_interface_tables = list()
-    with open(os.path.join(args.log_dir, 'w_'+wql_interface.name.lower()+"_"+format_type), 'w') as wf:
-        # This extra classpath is required when Spark is used as Hive's execution engine.
-        if wql_interface == Interface.HQL:
-            hive_exec_jar_path = os.path.join(os.environ.get('HIVE_HOME'), 'lib', 'hive-exec-3.1.2.jar')
-            wf.write("set spark.driver.extraClassPath=%s;\n" % hive_exec_jar_path)
-            wf.write("set spark.executor.extraClassPath=%s;\n" % hive_exec_jar_path)
-        for i, table_values in enumerate(tables_per_ifc[wql_interface]):
-            table_name = "ws" + str(i)
-            # For the test's write interface, only write commands corresponding to an input in the following cases:
-            # a) If it is not an interoperability test (which means it's an E2E test)
-            # b) If it is an interoperability test and the input is valid (Use valid inputs for
-            #    interoperability tests)
-            if not interoperability_test or (interoperability_test
-                                             and expected_values_per_ifc[wql_interface][i][1].kind == Kind.EXPRESSION):
-                primary_write_interface_tables.append(i)
-                wf.write('drop table if exists %s;\n' % table_name)
-                wf.write("select (%s);\n" % ", ".join(table_values))
-                if all(e.name != 'INTERVAL' for e in cols[wql_interface][i]):
-                    columns = ["c%s %s" % (idx, col.name + col.get_argstr()) for idx, col
-                               in enumerate(cols[wql_interface][i])]
-                    wf.write("create table %s(%s) %s;\n" % (table_name, ", ".join(columns),
-                                                            format2str(format_type)))
-                    wf.write("insert into %s select %s; \n" % (table_name, ", ".join(table_values)))
-                else:
-                    wf.write("create table %s as select %s" % (table_name, table_values))
+    _, cols, tables, expected_values = rows[0]
+    # For the test's write interface, only write commands corresponding to an input in the following cases:
+    # a) If it is not an interoperability test (which means it's an E2E test)
+    # b) If it is an interoperability test and the input is valid (Use valid inputs for
+    #    interoperability tests)
+    if not interoperability_test or (interoperability_test
+                                     and expected_values[wql_interface][1].kind == Kind.EXPRESSION):
+        table_values = tables[wql_interface]
+        wf = scripts['w_'+wql_interface.name.lower()]
+        wf.write('drop table if exists %s;\n' % table_name)
+        wf.write("select (%s);\n" % ", ".join(table_values))
+        if all(e.name != 'INTERVAL' for e in cols[wql_interface]):
+            columns = ["c%s %s" % (idx, col.name + col.get_argstr()) for idx, col
+                       in enumerate(cols[wql_interface])]
+            wf.write("create table %s(%s) %s;\n" % (table_name, ", ".join(columns),
+                                                    format2str(format_type)))
+            wf.write("insert into %s select %s; \n" % (table_name, ", ".join(table_values)))
+        else:
+            wf.write("create table %s as select %s" % (table_name, table_values))
+
+        for ifc in ql_interfaces:
+            # This is for the Write-Write test, we only need to consider interfaces that are not the primary write
+            # interface. For example, for a Spark-Hive test, the primary QL interface is SparkSQL. This loop should
+            # only deal with Hive's QL interface (HiveCLI). Only try to insert into tables that are created from the
+            # primary write interface.
+            if ifc == wql_interface:
+                continue
+            if expected_values[ifc][1].kind == Kind.EXPRESSION:
+                wf = scripts['w_'+ifc.name.lower()]
+                wf.write("insert into %s select %s; \n" % (table_name, ", ".join(tables[ifc])))
+                wf.write("select * from %s;\n" % table_name)
+
+    for ifc in {rql_interface, wql_interface}:
+        scripts['r_'+ifc.name.lower()].write(read_ql_statement(ifc, table_name, cols[wql_interface][1]))
+
+
+def write_df(scripts, table_name, rows, format_type, interoperability_test):
+    # The statements of one input in the DataFrame scripts of the format, see write_ql.
+    i, cols, tables, expected = rows[0]
+    cols, table, expected = cols[Interface.DF], tables[Interface.DF][:], expected[Interface.DF]
+    if not interoperability_test or (interoperability_test and expected[1].kind == Kind.EXPRESSION):
+        wf = scripts["w_df"]
+        wf.write('spark.sql("drop table if exists {0};")\n'.format(table_name))
+        wf.write("val rdd{0} = sc.parallelize(Seq(Row(".format(i))
+        isInterval = False
+        if isinstance(table[1], list): # convert list back to string and store interval
+            isInterval = True
+            interval, table[1] = table[1][1], table[1][0]
+        wf.write(", ".join(table))
+        wf.write(")))\n")
+        wf.write("val schema{0} = new StructType()".format(i))
+        for j in range(len(cols)):
+            wf.write('.add(StructField("c{0}", {1}, true))'
+                     .format(j, sqltype2sparktype(cols[j])))
+        wf.write('\nval df{0} = spark.createDataFrame(rdd{1}, schema{2})\n'.format(i, i, i))
+        if isInterval:
+            if 'toDF("Date")' in table[1]:
+                wf.write('val df{0}_ = df{1}.withColumn("c1", (df{2}("c1")'
+                         ' + expr("{3}")).cast(DateType))\n'.format(i, i, i, interval))
+            else:
+                wf.write('val df{0}_ = df{1}.withColumn("c1", df{2}("c1")'
+                         ' + expr("{3}"))\n'.format(i, i, i, interval))
+            wf.write('df{0}_.show(false)\n'.format(i))
+            wf.write('df{0}_.write.mode("overwrite").format("{1}").saveAsTable("{2}")\n'
+                     .format(i, format_type, table_name))
+        else:
+            wf.write('df{0}.show(false)\n'.format(i))
+            wf.write('df{0}.write.mode("overwrite").format("{1}").saveAsTable("{2}")\n'
+                     .format(i, format_type, table_name))
+    scripts["r_df"].write(read_df_statement(table_name, cols[1]))
+
+
+def iter_tables(inputs):
+    # Every input gets its own table: ("ws0", [(0, cols, tables, expected)]), ("ws1", [...]), ...
+    for i, row in inputs:
+        yield "ws" + str(i), [(i,) + row]
+
+
+def iter_batches(inputs, shards=1, shard_index=0):
+    '''
+    Groups consecutive inputs sharing a column schema into one table per type:
+    ("wsb0", [(0, cols, tables, expected), ..., (8, ...)]), ("wsb1", [(9, ...), ...]), ...
+    The tables of a shard are numbered shard_index, shard_index + shards, ... so shards never share a table name.
+    '''
+    def get_schema(row):
+        return [col.name + col.get_argstr() for col in row[1][0][wql_interface]]
+
+    for n, (_, rows) in enumerate(itertools.groupby(inputs, key=get_schema)):
+        yield "wsb" + str(n * shards + shard_index), [(i,) + row for i, row in rows]
+
+
+def iter_shard(inputs, shards=1, shard_index=0):
+    # (row id, input) of the inputs of one shard, row ids stay those of the whole corpus
+    for i, row in enumerate(inputs):
+        if i % shards == shard_index:
+            yield i, row
+
+
+def write_ql_batched(scripts, table_name, rows, format_type, interoperability_test):
+    # Same statements as write_ql, but every row of a type lives in one table (row id in c0). Inputs that are
+    # expected to be valid are inserted with a single multi-insert statement (a UNION ALL in Hive, see
+    # write_hql_batch_insert), so each branch keeps the cast of a per-row insert; invalid inputs keep their own
+    # insert so their exceptions stay attributable.
+    ql_interfaces = system_interface.values()
+    for ifc in {rql_interface, wql_interface}:
+        scripts['r_'+ifc.name.lower()].write(read_ql_statement(ifc, table_name, rows[0][1][wql_interface][1]))
+    rows = [row for row in rows if not interoperability_test or row[3][wql_interface][1].kind == Kind.EXPRESSION]
+    if not rows:
+        return
+    valid_rows = [row for row in rows if row[3][wql_interface][1].kind == Kind.EXPRESSION]
+    invalid_rows = [row for row in rows if row[3][wql_interface][1].kind == Kind.EXCEPTION]
+    wf = scripts['w_'+wql_interface.name.lower()]
+    wf.write('drop table if exists %s;\n' % table_name)
+    for _, _, tables, _ in rows:
+        wf.write("select (%s);\n" % ", ".join(tables[wql_interface]))
+    row_cols = rows[0][1][wql_interface]
+    columns = ["c%s %s" % (idx, col.name + col.get_argstr()) for idx, col in enumerate(row_cols)]
+    wf.write("create table %s(%s) %s;\n" % (table_name, ", ".join(columns), format2str(format_type)))
+    if valid_rows and wql_interface == Interface.HQL:
+        write_hql_batch_insert(wf, table_name, row_cols, [tables[wql_interface] for _, _, tables, _ in valid_rows])
+    elif valid_rows:
+        wf.write("from (select 1) dual %s; \n" % " ".join(
+            "insert into %s select %s" % (table_name, ", ".join(tables[wql_interface]))
+            for _, _, tables, _ in valid_rows))
+    for _, _, tables, _ in invalid_rows:
+        wf.write("insert into %s select %s; \n" % (table_name, ", ".join(tables[wql_interface])))
 
     for ifc in ql_interfaces:
-        # This is for the Write-Write test, we only need to consider interfaces that are not the primary write interface
-        # For example, for a Spark-Hive test, the primary QL interface is SparkSQL. This loop should only deal with
-        # Hive's QL interface (HiveCLI).
+        # Write-Write test, see write_ql
         if ifc == wql_interface:
             continue
-        tables = tables_per_ifc[ifc]
-        expected_values = expected_values_per_ifc[ifc]
-        with open(os.path.join(args.log_dir, 'w_'+ifc.name.lower()+"_"+format_type), 'w') as wf:
-            # This extra classpath is required when Spark is used as Hive's execution engine.
-            if ifc == Interface.HQL:
-                hive_exec_jar_path = os.path.join(os.environ.get('HIVE_HOME'), 'lib', 'hive-exec-3.1.2.jar')
-                wf.write("set spark.driver.extraClassPath=%s;\n" % hive_exec_jar_path)
-                wf.write("set spark.executor.extraClassPath=%s;\n" % hive_exec_jar_path)
-            # Only try to insert into tables that are created from the primary write interface
-            for i in primary_write_interface_tables:
-                if expected_values[i][1].kind == Kind.EXPRESSION:
-                    table_name = "ws" + str(i)
-                    wf.write("insert into %s select %s; \n" % (table_name, ", ".join(tables[i])))
-                    wf.write("select * from %s;\n" % table_name)
-    with open(os.path.join(args.log_dir, 'r_'+rql_interface.name.lower()+"_"+format_type), 'w') as wf:
-        for i in range(num_tables):
-            table_name = "ws"+str(i)
-            wf.write("select * from %s;\n" % table_name)
-    
-    if wql_interface != rql_interface:
-        with open(os.path.join(args.log_dir, 'r_'+wql_interface.name.lower()+"_"+format_type), 'w') as wf:
-            for i in range(num_tables):
-                table_name = "ws" + str(i)
-                wf.write("select * from {0};\n".format(table_name))
-
-
-def write_rt(tables):
-    num_tables = len(tables)
-    with open(os.path.join(args.log_dir, "t_expected"), 'w') as wf:
-        for i in range(num_tables):
-            for j in range(len(tables[i])):
-                has_exn = False
-                if tables[i][j].kind == Kind.EXCEPTION:
-                    has_exn = True
-            if not has_exn:
-                tb_vals = [get_rt(x) for x in tables[i]]
-                wf.write("\t".join(tb_vals)+"\n")
-
-
-def write_df(cols, tables, expected, format_type, interoperability_test):
-    num_tables = len(tables)
-    tables_ = [row[:] for row in tables] # deep copy to avoid changing tables in-place
-    with open(os.path.join(args.log_dir, "w_df_"+format_type), 'w') as wf:
-        wf.write("import org.apache.spark.sql.{Row, SparkSession}\n")
-        wf.write("import org.apache.spark.sql.types._\n")
-        wf.write("import scala.math.BigInt\n")
-        for i in range(num_tables):
-            if not interoperability_test or (interoperability_test and expected[i][1].kind == Kind.EXPRESSION):
-                table_name = "ws" + str(i)
-                wf.write('spark.sql("drop table if exists {0};")\n'.format(table_name))
-                wf.write("val rdd{0} = sc.parallelize(Seq(Row(".format(i))
-                isInterval = False
-                if isinstance(tables_[i][1], list): # convert list back to string and store interval
-                    isInterval = True
-                    interval, tables_[i][1] = tables_[i][1][1], tables_[i][1][0]
-                wf.write(", ".join(tables_[i]))
-                wf.write(")))\n")
-                wf.write("val schema{0} = new StructType()".format(i))
-                for j in range(len(cols[i])):
-                    wf.write('.add(StructField("c{0}", {1}, true))'
-                             .format(j, sqltype2sparktype(cols[i][j])))
-                wf.write('\nval df{0} = spark.createDataFrame(rdd{1}, schema{2})\n'.format(i, i, i))
-                if isInterval:
-                    if 'toDF("Date")' in tables_[i][1]:
-                        wf.write('val df{0}_ = df{1}.withColumn("c1", (df{2}("c1")'
-                                 ' + expr("{3}")).cast(DateType))\n'.format(i, i, i, interval))
-                    else:
-                        wf.write('val df{0}_ = df{1}.withColumn("c1", df{2}("c1")'
-                                 ' + expr("{3}"))\n'.format(i, i, i, interval))
-                    wf.write('df{0}_.show(false)\n'.format(i))
-                    wf.write('df{0}_.write.mode("overwrite").format("{1}").saveAsTable("{2}")\n'
-                         .format(i, format_type, table_name))
-                else:
-                    wf.write('df{0}.show(false)\n'.format(i))
-                    wf.write('df{0}.write.mode("overwrite").format("{1}").saveAsTable("{2}")\n'
-                         .format(i, format_type, table_name))
-    with open(os.path.join(args.log_dir, "r_df_"+format_type), 'w') as wf:
-        wf.write("import org.apache.spark.sql.{Row, SparkSession}\n")
-        wf.write("import org.apache.spark.sql.types._\n")
-        wf.write("import scala.math.BigInt\n")
-        for i in range(num_tables):
-            table_name = "ws" + str(i)
-            wf.write('spark.sql("select * from {0};").show(false)\n'.format(table_name))
+        ifc_rows = [row for row in rows if row[3][ifc][1].kind == Kind.EXPRESSION]
+        if not ifc_rows:
+            continue
+        wf = scripts['w_'+ifc.name.lower()]
+        if ifc == Interface.HQL:
+            write_hql_batch_insert(wf, table_name, ifc_rows[0][1][ifc], [tables[ifc] for _, _, tables, _ in ifc_rows])
+        else:
+            for _, _, tables, _ in ifc_rows:
+                wf.write("insert into %s select %s; \n" % (table_name, ", ".join(tables[ifc])))
+        wf.write("select * from %s;\n" % table_name)
+
+
+def get_df_interval_expr(value, interval):
+    # c1 of a row whose timestamp / date gets an interval added, see write_df
+    if 'toDF("Date")' in value:
+        return '(col("c1") + expr("{0}")).cast(DateType)'.format(interval)
+    return 'col("c1") + expr("{0}")'.format(interval)
+
+
+def write_df_batched(scripts, table_name, rows, format_type, interoperability_test):
+    # Same statements as write_df, but every row of a type is written to one table (row id in c0). Inputs that are
+    # expected to be valid are built into one DataFrame, shown once and saved with a single saveAsTable; invalid
+    # inputs keep their own DataFrame appended to the table, so their exceptions stay attributable.
+    cols = rows[0][1][Interface.DF]
+    scripts["r_df"].write(read_df_statement(table_name, cols[1], 'show(Int.MaxValue, false)'))
+    tables_, intervals = dict(), dict()
+    for i, _, tables, expected in rows:
+        if not interoperability_test or expected[Interface.DF][1].kind == Kind.EXPRESSION:
+            tables_[i] = tables[Interface.DF][:] # copy to avoid changing tables in-place
+            if isinstance(tables_[i][1], list): # convert list back to string and store interval
+                intervals[i], tables_[i][1] = tables_[i][1][1], tables_[i][1][0]
+    if not tables_:
+        return
+    valid_rows = [i for i, _, _, expected in rows
+                  if i in tables_ and expected[Interface.DF][1].kind == Kind.EXPRESSION]
+    invalid_rows = [i for i, _, _, expected in rows
+                    if i in tables_ and expected[Interface.DF][1].kind == Kind.EXCEPTION]
+    schema = "new StructType()" + "".join('.add(StructField("c{0}", {1}, true))'
+                                          .format(j, sqltype2sparktype(col)) for j, col in enumerate(cols))
+    wf = scripts["w_df"]
+    wf.write('spark.sql("drop table if exists {0};")\n'.format(table_name))
+    if valid_rows:
+        wf.write("val rdd_{0} = sc.parallelize(Seq({1}))\n".format(
+            table_name, ", ".join("Row({0})".format(", ".join(tables_[i])) for i in valid_rows)))
+        wf.write("val schema_{0} = {1}\n".format(table_name, schema))
+        wf.write('val df_{0} = spark.createDataFrame(rdd_{0}, schema_{0})\n'.format(table_name))
+        df_name = "df_" + table_name
+        interval_rows = [i for i in valid_rows if i in intervals]
+        if interval_rows:
+            # each row adds its own interval
+            wf.write('val {0}_ = {0}.withColumn("c1", {1}.otherwise(col("c1")))\n'.format(
+                df_name, ".".join('when(col("c0") === {0}, {1})'.format(
+                    i, get_df_interval_expr(tables_[i][1], intervals[i])) for i in interval_rows)))
+            df_name += "_"
+        wf.write('{0}.show(Int.MaxValue, false)\n'.format(df_name))
+        wf.write('{0}.write.mode("append").format("{1}").saveAsTable("{2}")\n'
+                 .format(df_name, format_type, table_name))
+    for i in invalid_rows:
+        wf.write("val rdd{0} = sc.parallelize(Seq(Row(".format(i))
+        wf.write(", ".join(tables_[i]))
+        wf.write(")))\n")
+        wf.write("val schema{0} = {1}\n".format(i, schema))
+        wf.write('val df{0} = spark.createDataFrame(rdd{1}, schema{2})\n'.format(i, i, i))
+        df_name = "df{0}".format(i)
+        if i in intervals:
+            wf.write('val df{0}_ = df{1}.withColumn("c1", {2})\n'.format(
+                i, i, get_df_interval_expr(tables_[i][1], intervals[i])))
+            df_name += "_"
+        wf.write('{0}.show(false)\n'.format(df_name))
+        wf.write('{0}.write.mode("append").format("{1}").saveAsTable("{2}")\n'
+                 .format(df_name, format_type, table_name))
+
+
+def get_statement(cols, values):
+    # What the scripts hold of an input but its row id: the column types and values through every interface
+    return [[ifc.name, [col.name + col.get_argstr() for col in cols[ifc]], values[ifc][1:]]
+            for ifc in sorted(cols, key=lambda ifc: ifc.name)]
+
+
+def get_uncached_rows(cache, format_type, rows):
+    '''
+    Records the result cache key of every row in the format's part of t_cache.json and returns the rows the cache
+    has no entry for.
+    '''
+    format_cache = cache["formats"][format_type]
+    uncached_rows = []
+    for row in rows:
+        i, cols, values, _ = row
+        key = result_cache.get_key(cache["engine_versions"], format_type, cache["systems"], cache["options"],
+                                   get_statement(cols, values))
+        format_cache["keys"][str(i)] = key
+        if result_cache.has_entry(cache["cache_dir"], key):
+            format_cache["hits"].append(str(i))
+        else:
+            uncached_rows.append(row)
+    return uncached_rows
+
+
+def write_scripts(inputs, format_types, interoperability_test):
+    '''
+    Writes the scripts of every format, t_expected, t_original.json and, when batched, t_batches.json in a single
+    pass over the inputs. Only the inputs of the table being written (one input, or one type when batched) are
+    held at a time, so the size of the corpus is not bounded by memory. With --shards only the inputs of the shard
+    are written, with --cache only the inputs of each format the result cache has no entry for.
+    '''
+    inputs = iter_shard(inputs, args.shards, args.shard_index)
+    if args.batched:
+        tables = iter_batches(inputs, args.shards, args.shard_index)
+        ql_writer, df_writer = write_ql_batched, write_df_batched
+    else:
+        tables, ql_writer, df_writer = iter_tables(inputs), write_ql, write_df
+    batches = dict()
+    cache = None
+    if args.cache is not None:
+        cache = {"cache_dir": os.path.abspath(args.cache), "engine_versions": result_cache.get_engine_versions(),
+                 "systems": args.wsys[0] + args.rsys[0],
+                 "options": [option for option in cache_options if getattr(args, option)],
+                 "formats": {format_type: {"keys": dict(), "hits": []} for format_type in format_types}}
+    with ExitStack() as stack:
+        scripts = {format_type: open_scripts(stack, format_type) for format_type in format_types}
+        rt_file = stack.enter_context(open(os.path.join(args.log_dir, "t_expected"), 'w'))
+        original_file = stack.enter_context(open(os.path.join(args.log_dir, 't_original.json'), 'w'))
+        separator = "{\n"
+        for table_name, rows in tables:
+            for format_type in format_types:
+                format_rows = rows if cache is None else get_uncached_rows(cache, format_type, rows)
+                if not format_rows:
+                    continue
+                ql_writer(scripts[format_type], table_name, format_rows, format_type, interoperability_test)
+                df_writer(scripts[format_type], table_name, format_rows, format_type, interoperability_test)
+            for i, cols, values, expected in rows:
+                write_rt_row(rt_file, expected[wql_interface])
+                entry = get_original_entry(cols[wql_interface], values[wql_interface], expected[wql_interface])
+                if entry is not None:
+                    original_file.write(separator + json_entry(i, entry))
+                    separator = ",\n"
+            batches[table_name] = [i for i, _, _, _ in rows]
+        original_file.write("{}" if separator == "{\n" else "\n}")
+    if args.batched:
+        with open(os.path.join(args.log_dir, 't_batches.json'), 'w') as wf:
+            json.dump(batches, wf, indent=4)
+    if args.shards > 1:
+        with open(os.path.join(args.log_dir, 't_shard.json'), 'w') as wf:
+            json.dump({"shards": args.shards, "shard_index": args.shard_index}, wf, indent=4)
+    if cache is not None:
+        with open(os.path.join(args.log_dir, result_cache.cache_file), 'w') as wf:
+            json.dump(cache, wf, indent=4)
+        for format_type, format_cache in cache["formats"].items():
+            print("{0}: {1} of {2} inputs cached".format(format_type, len(format_cache["hits"]),
+                                                        len(format_cache["keys"])))
 
 
 def pack_input(interface, v1, v2):
     return {interface: v1, Interface.DF: v2}
 
 
-def gen_tables(dry_run=False):
-    type_interface, tables_interface, expected_interface = {}, {}, {}
+def iter_inputs(dry_run=False, random_count=0, seed=0):
+    '''
+    Yields (cols, tables, expected) of every input, each {interface: [column 0, column 1]}. The interfaces of a
+    system share the entries of its first interface, e.g. the DataFrame values come with the Spark SQL ones.
+    '''
+    system_entries = []
     for system in SystemUnderTest:
-        type_objs, entries, expected_entries = None, None, None
-        for interface in system_under_test_to_interfaces[system]:
-            if not all([type_objs, entries, expected_entries]):
-                type_objs, entries, expected_entries = gen_entries(interface, dry_run)
-            type_interface[interface] = type_objs
-            tables_interface[interface] = [[x[interface] for x in y] for y in entries]
-            expected_interface[interface] = [[x.values[interface] for x in y] for y in expected_entries]
-
-    return type_interface, tables_interface, expected_interface
+        interfaces = system_under_test_to_interfaces[system]
+        system_entries.append((interfaces, iter_entries(interfaces[0], dry_run, random_count, seed)))
+    for entries in zip(*[entries for _, entries in system_entries]):
+        type_interface, tables_interface, expected_interface = {}, {}, {}
+        for (interfaces, _), (type_objs, row, expected_row) in zip(system_entries, entries):
+            for interface in interfaces:
+                type_interface[interface] = type_objs
+                tables_interface[interface] = [x[interface] for x in row]
+                expected_interface[interface] = [x.values[interface] for x in expected_row]
+        yield type_interface, tables_interface, expected_interface
 
 
 system_interface = {
@@ -1430,28 +2075,43 @@ def format2str(x):
     return format_str[x]
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument('log_dir', type=str)
-parser.add_argument('wsys', type=str)
-parser.add_argument('rsys', type=str)
-parser.add_argument('--stats', action='store_true')
-parser.add_argument('--dry_run', action='store_true')
-parser.add_argument('--one_way', action='store_true')
-args = parser.parse_args()
-
-# TODO: change args.system to using args.wsys or args.rsys
-wql_interface = sys2interface(args.wsys)
-rql_interface = sys2interface(args.rsys)
-if args.stats:
-    stats = get_stats(wql_interface)
-    for k in stats.keys():
-        print(k, "valid:", stats[k]["valid"], "invalid:", stats[k]["invalid"])
-    print("total", stats["total"]["valid"] + stats["total"]["invalid"])
-else:
-    cols, tables, expected = gen_tables(args.dry_run)
-    for _format in format_str.keys():
-        write_ql(cols, tables, expected, _format, args.one_way)
-        write_rt(expected[wql_interface])
-        write_df(cols[Interface.DF], tables[Interface.DF], expected[Interface.DF], _format, args.one_way)
-    
-    write_original(cols, tables[wql_interface], expected[wql_interface], wql_interface)
+# options changing what the scripts do with the same inputs, part of the result cache keys
+cache_options = ["one_way", "batched", "json_rows", "df_app"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log_dir', type=str)
+    parser.add_argument('wsys', type=str)
+    parser.add_argument('rsys', type=str)
+    parser.add_argument('--stats', action='store_true')
+    parser.add_argument('--dry_run', action='store_true')
+    parser.add_argument('--one_way', action='store_true')
+    parser.add_argument('--batched', action='store_true')
+    parser.add_argument('--json_rows', action='store_true')
+    parser.add_argument('--df_app', action='store_true')
+    parser.add_argument('--random', type=int, default=0, help="seeded random inputs to add per type")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shards', type=int, default=1, help="split the inputs by row id into this many shards")
+    parser.add_argument('--shard_index', type=int, default=0, help="the shard to write, 0 to shards - 1")
+    parser.add_argument('--cache', type=str, help="result cache directory, cached inputs are left out of the scripts")
+    parser.add_argument('--database', type=str,
+                        help="database prefix of the run, the scripts of a format use the database <prefix>_<format>")
+    args = parser.parse_args()
+    if not 0 <= args.shard_index < args.shards:
+        parser.error("--shard_index must be between 0 and --shards - 1")
+
+    # TODO: change args.system to using args.wsys or args.rsys
+    wql_interface = sys2interface(args.wsys)
+    rql_interface = sys2interface(args.rsys)
+    if args.stats:
+        stats = get_stats(wql_interface)
+        for k in stats.keys():
+            print(k, "valid:", stats[k]["valid"], "invalid:", stats[k]["invalid"])
+        print("total", stats["total"]["valid"] + stats["total"]["invalid"])
+    else:
+        write_scripts(iter_inputs(args.dry_run, args.random, args.seed), list(format_str.keys()), args.one_way)
+        if args.df_app:
+            for _format in format_str.keys():
+                for df_script in ["w_df_", "r_df_"]:
+                    write_app(os.path.join(args.log_dir, df_script + _format))